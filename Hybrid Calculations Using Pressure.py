@@ -1,13 +1,17 @@
 import math
+import os
 
 import matplotlib.pyplot as plt
 
 import numpy as np
 from matplotlib.pyplot import xlabel, ylabel
-from rocketcea.cea_obj import add_new_fuel, add_new_oxidizer
-from rocketcea.cea_obj_w_units import CEA_Obj
 from scipy.cluster.hierarchy import average
 
+from common.cea_cache import CachedCEA
+from common.cea_tables import CeaTable, make_cea
+from common.constants import G0
+from common.hybrid_pressure_model import HybridDesign, simulate
+
 ## Input parameters
 # System Properties
 pressureRunTank = 50 # Pressure of the run tank in Bar
@@ -42,125 +46,89 @@ lenFuel = 0.15 # Length of fuel grain in M
 rhoOx = 800 # Density of oxidiser in kg/m^3
 
 # Create fuels and oxidisers for CEA
-card_str = """
+fuel_cards = {}
+oxidizer_cards = {}
+
+fuel_cards['paraffin'] = """
 fuel paraffin   C 32 H 66   wt%=100
 h,cal=-224200     t(k)=298.15   rho=.924
 """
-add_new_fuel( 'paraffin', card_str )
 
-card_str = """
+fuel_cards['polyethylene'] = """
 fuel polyethylene   C 20 H 40   wt%=100
 h,cal=-12700     t(k)=298.15   rho=.96
 """
-add_new_fuel( 'polyethylene', card_str )
 
-card_str = """
+oxidizer_cards['N20'] = """
 oxid N20   N 2 O 1   wt%=100
 h,cal=15500     t(k)=298.15    rho=.793
 """
-add_new_oxidizer( 'N20', card_str )
 
 fuel_name = 'polyethylene'
 oxidizer_name = 'N20'
 
-# Make CEA into useful units
-cea_obj = CEA_Obj(propName='', oxName=oxidizer_name, fuelName=fuel_name, pressure_units='Bar', cstar_units='m/s',
-                  temperature_units='K', sonic_velocity_units='m/s', enthalpy_units='J/kg', density_units='kg/m^3',
-                  specific_heat_units='J/kg-K', viscosity_units='poise', thermal_cond_units='W/cm-degC')
+# 'table': CEA is tabulated once over chamber pressure (bar), O/F and area ratio,
+# and interpolated during the burn. The table is rebuilt when the propellants or grid change.
+# 'cached': live CEA, with calls at nearly the same state served from a cache. The
+# solver sees it interpolated between cache points, so it takes more CEA runs than 'table'
+CEA_MODE = 'table'
+CEA_TABLE = f'output/cea_tables/{oxidizer_name}_{fuel_name}_eps{expRatio}.npz'
+CEA_PC = np.geomspace(1, 80, 40)
+CEA_MR = np.arange(0.5, 20.01, 0.25)
+# Worker processes for building the table, a pool needs this script to be
+# guarded by __name__ == '__main__' on platforms that spawn processes
+CEA_PROCESSES = 1
+
+# Cache tolerances (bar, O/F, area ratio) and the store shared between runs
+CEA_TOLERANCES = (0.05, 0.01, 0.01)
+CEA_CACHE = 'output/cea_tables/cea_cache.sqlite'
+
+if CEA_MODE == 'table':
+    cea_obj = CeaTable.load_or_build(CEA_TABLE, oxidizer_name, fuel_name, CEA_PC, CEA_MR, np.array([expRatio]),
+                                     ox_card=oxidizer_cards[oxidizer_name], fuel_card=fuel_cards[fuel_name], processes=CEA_PROCESSES)
+else:
+    os.makedirs(os.path.dirname(CEA_CACHE), exist_ok=True)
+    cea_obj = CachedCEA(make_cea(oxidizer_name, fuel_name, oxidizer_cards[oxidizer_name], fuel_cards[fuel_name]),
+                        *CEA_TOLERANCES, store_path=CEA_CACHE, namespace=oxidizer_cards[oxidizer_name] + fuel_cards[fuel_name])
 
 ## Design Calculations
-mFuelDot = 0 # Sets inital mass flow rate of the fuel
-radiusPort = radiusInitPort # Sets the inital port radius
-presChamb = pressureAtmosphere # Sets the inital pressure
-areaThroat = np.pi*radiusThroat**2
-mOx = rhoOx*(volOx * 0.001)
-moxInit = mOx
-time = 0
-i = 0
-forcePlot = []
-pressurePlot = []
-oxPlot = []
-ofPlot = []
-portPlot = []
-timePlot = []
-mPropDotPlot = []
-dPresChambdtplot = []
-
-## Looped Solution
-while mOx > 0 :
-    # Change time step to be shorter at start
-    if time < 1:
-        timeStep = 0.0005
-    else:
-        timeStep = 0.002
-
-    # Oxidiser Mass flow rate (can be a product of time)
-    mOxDot = 0.059# Oxidiser mass flow rate in Kg/s
-
-    # Propellant Mass flow rate
-    mPropDot = mOxDot + mFuelDot # Mass flow rate of the propellant (fuel and oxidiser)
-    mPropDotPlot.append(mPropDot)
-
-    # calculate a value from a_0, not needed if given a directly
-    a=a_0/math.pow((1+(mFuelDot/mOxDot)),n) # Eq 3.50
-
-    # Regression Rate
-    rDot = a*math.pow((mPropDot/(np.pi*(radiusPort*radiusPort))),n) # Eq 3.51, assuming m=0
-
-    # Burning Area
-    areaBurn = 2*np.pi*radiusPort*lenFuel
-
-    # Calculate Fuel Mass Flow Rate
-    mFuelDot = rhoFuel*areaBurn*rDot
-
-    # Oxidiser fuel Ratio
-    ratioO_F = mOxDot/mFuelDot # For simplicity, the O/f of the propellant being added to the combustion chamber at each time step is used.
-    ofPlot.append(ratioO_F)
-
-    # Chamber Volume
-    volChamber = np.pi*(radiusPort**2)*lenFuel + volPre + volPost # Eq 3.78
-
-    #CEA analasys
-    outputCEA = cea_obj.get_IvacCstrTc_ChmMwGam(Pc=presChamb/100000, MR=ratioO_F, eps=expRatio)
-    CF = outputCEA[0]
-    CStar = outputCEA[1]
-    tempChamb = outputCEA[2]
-    massMol = outputCEA[3]
-    gammaChamb = outputCEA[4]
-
-    # Specific gas constant
-    Cp = cea_obj.get_Chamber_Cp(Pc=presChamb/100000, MR=ratioO_F, eps=expRatio, frozen=0)
-    Cv = Cp/gammaChamb
-    R = Cp-Cv
-
-    # Calculate mass leaving the chamber
-    mOutDot = ((gammaChamb*coeffDis*areaThroat*presChamb)/(efficencyComb*math.sqrt(gammaChamb*R*tempChamb)))*math.pow((2/(gammaChamb+1)),(gammaChamb+1)/(2*(gammaChamb-1))) # Ee 3.73
-
-    # Chamber Pressure Change
-    dPresChambdt = ((R*tempChamb)/volChamber)*((areaBurn*rDot*(rhoFuel-(presChamb/(R*tempChamb)))) + mOxDot - mOutDot) # Eq 3.76
-    dPresChambdtplot.append(mPropDot)
-
-    # Calculate Thrust
-    force = mOutDot*CStar*efficencyComb*coeffDis*efficencyNoz
-    forcePlot.append(force)
-
-    # Calculate new port radius
-    radiusPort = radiusPort + rDot* timeStep
-    portPlot.append(radiusPort)
-
-    # Calculate new chamber pressure
-    presChamb = presChamb + dPresChambdt*timeStep
-    pressurePlot.append(presChamb/100000)
-
-    # Calculate remaining oxidiser
-    mOx = mOx - mOxDot * timeStep
-    if i%500 == 0:
-        print("Oxidiser Mass remaining",mOx)
-    oxPlot.append(mOx)
-
-    time = time + timeStep
-    timePlot.append(time)
-    i = i + 1
+mOxDot = 0.059 # Oxidiser mass flow rate in Kg/s
+moxInit = rhoOx*(volOx * 0.001)
+
+design = HybridDesign(
+    ox_mass=moxInit,
+    ox_mass_flow=mOxDot,
+    a_0=a_0,
+    n=n,
+    fuel_density=rhoFuel,
+    fuel_length=lenFuel,
+    initial_port_radius=radiusInitPort,
+    throat_radius=radiusThroat,
+    pre_volume=volPre,
+    post_volume=volPost,
+    expansion_ratio=expRatio,
+    combustion_efficiency=efficencyComb,
+    discharge_coefficient=coeffDis,
+    nozzle_efficiency=efficencyNoz,
+    initial_pressure=pressureAtmosphere,
+)
+
+## Solution, integrated with a stiff solver until the oxidiser runs out
+OUTPUT_DT = 0.01 # Time between output points in s
+result = simulate(design, cea_obj, output_dt=OUTPUT_DT)
+print("Solver steps", result.solver_steps, "derivative evaluations", result.rhs_evaluations)
+
+timePlot = result.time
+pressurePlot = result.chamber_pressure/100000
+forcePlot = result.thrust
+oxPlot = result.ox_mass
+ofPlot = result.of_ratio
+portPlot = result.port_radius
+mPropDotPlot = result.prop_mass_flow
+
+time = result.burn_time
+radiusPort = result.port_radius[-1]
+tempChamb = result.chamber_temperature[-1]
 
 
 plt.figure(figsize=(18,12))
@@ -215,12 +183,12 @@ print("Post Combustion Chamber length", volPost/(np.pi*(radiusPort**2)) * 1000,
 massFuel = (np.pi*(radiusPort**2)-np.pi*(radiusInitPort**2)) * lenFuel * rhoFuel
 print("Mass of Fuel Burned:", massFuel, "kg")
 print("Mass of Oxidiser Burned:", moxInit, "kg")
-print("Average O/F ratio:", sum(ofPlot)/len(ofPlot))
+print("Average O/F ratio:", np.mean(ofPlot))
 print("Burn Time", time, "Seconds")
 print("Max Thrust", max(forcePlot), "N")
-impulse = (sum(forcePlot)/len(forcePlot))*time
+impulse = result.total_impulse
 print("Impulse", impulse, "Ns")
-print("Average ISP", impulse/((massFuel+moxInit)*9.81), "s")
+print("Average ISP", impulse/((massFuel+moxInit)*G0), "s")
 print("Number of holes in shower head injector needed ", numHoles)
 
 ##Calculate Mechainical Properties
@@ -228,4 +196,7 @@ hoopStress = (pressureMax * 100000 * 0.0063) / wallThickness
 safetyFactor = wallYieldStrength/hoopStress
 print("Wall Safety factor", safetyFactor)
 
+if CEA_MODE == 'cached':
+    print("CEA cache", cea_obj.stats())
+
 plt.show()
\ No newline at end of file
@@ -0,0 +1,171 @@
+import json
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import nitrous_engine_sim
+
+from common.calibration import Calibrator, Parameter, Target
+from common.engine_harness import prepare_sim
+from common.hotfire_columnar import open_hotfire
+from common.replay_driver import pressure_replay
+from common.signal_conditioning import Conditioning, fir_lowpass
+
+# Fits the pressure replay of simualte_test_fire_press.py to the measured
+# thrust and chamber pressure, instead of tuning it by hand
+
+OUT_DIR = 'output/hotfire_sims/'
+# Either the HDF5 recording or its converted columnar directory (see convert_hotfire.py)
+HOTFIRE_FILE = 'data/Aberdeen_5_HOTFIRE.h5'
+TYPE = 'VAPOUR' #  'LIQUID'
+TIME_START = 50.5
+TIME_END = 72
+# Simulations already run, delete it after changing the engine, DT or the targets
+CACHE_FILE = f'{OUT_DIR}/calibration_{TYPE}.cache.jsonl'
+RESULT_FILE = f'{OUT_DIR}/calibration_{TYPE}.json'
+
+# Coarser than the 0.1ms of the replay script, calibration runs hundreds of simulations
+DT = 0.001
+RESULT_PERIOD = 10
+MAX_ITERATIONS = 200000
+# 'least_squares' from the initial values or 'differential_evolution' over the bounds
+METHOD = 'least_squares'
+PROCESSES = None
+
+THRUST_CHANNEL = 'THRUST_STAND_LC1_CALIBRATED'
+CHAMBER_PRESSURE_CHANNEL = 'R2S_PT_1'
+ATMOSPHERE_BAR = 1.01325
+
+# Knots of the fitted nitrous density curve, their values are calibrated
+DENSITY_T = np.array([0,  7.5,  8, 9.03, 9.2, 9.5, 11, 17, 23])
+DENSITY_V = np.array([20, 20,  55, 32,   75,  75,  12, 5,  3.5])*2.5
+
+PARAMETERS = [
+    Parameter('regression_a', 0.00003, 0.0004, 0.000116),
+    Parameter('regression_n', 0.2, 0.8, 0.336),
+] + [Parameter(f'density_{k}', 1, 400, v) for k, v in enumerate(DENSITY_V)]
+
+
+with open_hotfire(HOTFIRE_FILE) as dataset:
+
+    start_index, end_index = dataset.index_range(TIME_START, TIME_END)
+
+    time = dataset.time[start_index:end_index]
+    time_zero = time[0]
+    time = time - time_zero
+    dt = time[1] - time[0]
+
+    pressure_values = dataset.channel('NITROUS_PT_4', start_index, end_index)
+    temp_values = dataset.channel('NITROUS_TT_4', start_index, end_index)
+    chamber_pressure_values = dataset.channel(CHAMBER_PRESSURE_CHANNEL, start_index, end_index)
+
+    # The load cell can be sampled at its own rate
+    thrust_dt = np.diff(dataset.own_time(THRUST_CHANNEL)[:2])[0]
+    thrust_conditioning = Conditioning(tare_window=(TIME_START - 2, TIME_START), taps=fir_lowpass(1/thrust_dt, 10))
+    thrust_time, thrust_values = thrust_conditioning.apply_channel(dataset, THRUST_CHANNEL, TIME_START, TIME_END)
+    thrust_time = thrust_time - time_zero
+
+
+def build_engine():
+    '''
+    The test engine as configured in simualte_test_fire_press.py
+    '''
+
+    engine = nitrous_engine_sim.Cengines()
+    nitrous_engine_sim.load_default_engine(engine, 'Nitrous_HDPE')
+
+    engine.ox_tank_volume = 0.8/1000
+    engine.ox_orifice_number = 2
+    engine.ox_orifice_diameter = 0.001
+
+    engine.fuel_orifice_number = 0
+
+    engine.solid_propellant_density = 960
+
+    engine.charge_length = 0.15
+    engine.charge_radius = 0.03
+    engine.centre_port_radius = 0.015
+    engine.port_max_radius = engine.charge_radius
+
+    engine.pre_comb_chamber_length = 0.06
+    engine.post_comb_chamber_length = 0.04
+
+    engine.nozzle_efficiency = 1
+    engine.nozzle_throat_rdot = 0
+    engine.nozzle_area_ratio = 3
+    engine.nozzle_throat_diameter = 0.003*2
+
+    engine.ox_feed_model = 2
+    engine.ox_status = 0 if TYPE == 'LIQUID' else 1
+    engine.ox_initial_tank_pressure_bar = 30
+    engine.ox_tank_pressure_bar = 30
+    engine.ox_initial_temp_C = 30
+
+    return engine
+
+
+def simulate(params: dict[str, float]) -> dict[str, np.ndarray]:
+
+    engine = build_engine()
+    engine.regression_a = params['regression_a']
+    engine.regression_n = params['regression_n']
+    engine.regression_m = 0
+
+    density = np.array([params[f'density_{k}'] for k in range(len(DENSITY_T))])
+
+    prepare_sim(engine, DT)
+    replay = pressure_replay(time, pressure_values, temp_values, (DENSITY_T, density), DT)
+    burn = replay.run(engine, max_iterations=MAX_ITERATIONS, result_period=RESULT_PERIOD, report_faults=False)
+
+    df = pd.DataFrame(burn.results)
+
+    return {
+        'time': df['time'].to_numpy(),
+        'thrust': df['thrust'].to_numpy(),
+        'chamber_pressure_bar_g': df['chamber_pressure_bar'].to_numpy() - ATMOSPHERE_BAR,
+    }
+
+
+if __name__ == '__main__':
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    targets = [
+        Target('thrust', thrust_time, thrust_values),
+        Target('chamber_pressure_bar_g', time, chamber_pressure_values),
+    ]
+
+    calibrator = Calibrator(simulate, PARAMETERS, targets, processes=PROCESSES, cache_path=CACHE_FILE)
+    result = calibrator.fit(METHOD)
+
+    print(f'Simulations run: {result.evaluations}, cache hits: {result.cache_hits}')
+    print(f'Cost: {result.cost:.5f}')
+    for name, value in result.params.items():
+        print(f'{name}: {value:.6g}')
+
+    with open(RESULT_FILE, 'w') as f:
+        json.dump({'params': result.params, 'cost': result.cost, 'density_t': DENSITY_T.tolist()}, f, indent=1)
+
+    fitted = simulate(result.params)
+
+    plt.figure(figsize=(12, 5))
+
+    plt.subplot(1, 2, 1)
+    plt.title('Thrust')
+    plt.plot(thrust_time, thrust_values, '-', label='Experimental')
+    plt.plot(fitted['time'], fitted['thrust'], '-', label='Calibrated simulation')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Thrust (N)')
+    plt.legend()
+
+    plt.subplot(1, 2, 2)
+    plt.title('Chamber pressure')
+    plt.plot(time, chamber_pressure_values, '-', label='Experimental')
+    plt.plot(fitted['time'], fitted['chamber_pressure_bar_g'], '-', label='Calibrated simulation')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Pressure (bar(g))')
+    plt.legend()
+
+    plt.savefig(f'{OUT_DIR}/calibration_{TYPE}.png', dpi=300, bbox_inches='tight')
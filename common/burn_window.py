@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class BurnEvents():
+    '''
+    Event times (s) of a hotfire, None where an event wasn't found
+    '''
+
+    ignition: float | None = None
+
+    steady: float | None = None
+
+    ox_cutoff: float | None = None
+
+    burnout: float | None = None
+
+
+def moving_average(x: np.ndarray, window: int) -> np.ndarray:
+    '''
+    Centred moving average with edge samples averaged over the part of the window that exists
+    '''
+
+    if window <= 1:
+        return np.asarray(x, dtype=float)
+
+    c = np.concatenate([[0], np.cumsum(x, dtype=float)])
+    i = np.arange(len(x))
+    lo = np.maximum(i - window//2, 0)
+    hi = np.minimum(i + window - window//2, len(x))
+
+    return (c[hi] - c[lo])/(hi - lo)
+
+
+def hysteresis(x: np.ndarray, on_level: float, off_level: float) -> np.ndarray:
+    '''
+    True from where x rises above on_level until it next falls below off_level
+    '''
+
+    marks = np.zeros(len(x), dtype=np.int8)
+    marks[x > on_level] = 1
+    marks[x < off_level] = -1
+
+    # Carry the last decisive mark forward over the samples in between the levels
+    idx = np.where(marks != 0, np.arange(len(x)), 0)
+    np.maximum.accumulate(idx, out=idx)
+
+    return marks[idx] == 1
+
+
+def normalise(x: np.ndarray, baseline_samples: int, peak_percentile=99) -> np.ndarray:
+    '''
+    Scales x so the pre-fire baseline is 0 and the burn level is 1
+    '''
+
+    baseline = np.median(x[:baseline_samples])
+    peak = np.percentile(x, peak_percentile)
+
+    return (x - baseline)/(peak - baseline) if peak != baseline else np.zeros(len(x))
+
+
+def _segments(state: np.ndarray) -> list[tuple[int, int]]:
+    edges = np.diff(state.astype(np.int8), prepend=0, append=0)
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_burn_events(time: np.ndarray, thrust: np.ndarray, chamber_pressure: np.ndarray, ox_signal: np.ndarray | None = None,
+                       baseline_time=10.0, smooth_time=0.05, on_level=0.3, off_level=0.1, start_level=0.05,
+                       steady_time=0.5, steady_tolerance=0.03, cutoff_level=0.97) -> BurnEvents:
+    '''
+    Finds ignition, steady state, oxidizer cutoff and burnout from the thrust,
+    chamber pressure and (optionally) an oxidizer flow or feed pressure channel,
+    all on the same time base. Every step is a vectorised pass over the samples.
+
+    Each signal is normalised between its pre-fire baseline (median of the
+    first baseline_time seconds) and its burn level (99th percentile), and
+    lightly smoothed. The burn is the longest stretch where chamber pressure
+    and thrust together stay on by hysteresis (on above on_level, off below off_level):
+      - ignition: last sample before the burn below start_level
+      - burnout: first sample after the burn below start_level
+      - steady: first time after ignition the chamber pressure varies less than
+        steady_tolerance over steady_time
+      - ox cutoff: first time after steady the oxidizer signal falls below
+        cutoff_level of its steady value
+    '''
+
+    events = BurnEvents()
+
+    dt = np.median(np.diff(time))
+    baseline_samples = max(int(baseline_time/dt), 1)
+    smooth = max(int(smooth_time/dt), 1)
+
+    pc = moving_average(normalise(chamber_pressure, baseline_samples), smooth)
+    f = moving_average(normalise(thrust, baseline_samples), smooth)
+    combined = (pc + f)/2
+
+    segments = _segments(hysteresis(combined, on_level, off_level))
+    if not segments:
+        return events
+
+    on, off = max(segments, key=lambda s: s[1] - s[0])
+
+    below = np.flatnonzero(combined[:on] < start_level)
+    ignition = below[-1] if len(below) else on
+    events.ignition = float(time[ignition])
+
+    below = np.flatnonzero(combined[off:] < start_level)
+    burnout = off + below[0] if len(below) else len(time) - 1
+    events.burnout = float(time[burnout])
+
+    # Rolling spread of chamber pressure over steady_time
+    window = max(int(steady_time/dt), 2)
+    mean = moving_average(pc, window)
+    spread = np.sqrt(np.maximum(moving_average(pc**2, window) - mean**2, 0))
+
+    steady_candidates = np.flatnonzero((spread[ignition:off] < steady_tolerance) & (pc[ignition:off] > on_level))
+    steady = ignition + steady_candidates[0] if len(steady_candidates) else None
+    if steady is not None:
+        events.steady = float(time[steady])
+
+    if ox_signal is not None:
+        ox = moving_average(normalise(ox_signal, baseline_samples), smooth)
+        start = steady if steady is not None else on
+        level = np.median(ox[start:off]) if off > start else 0
+
+        falling = np.flatnonzero(ox[start:burnout] < cutoff_level*level)
+        if level > 0 and len(falling):
+            events.ox_cutoff = float(time[start + falling[0]])
+
+    return events
+
+
+def detect_dataset_events(dataset, thrust='THRUST_STAND_LC1_CALIBRATED', chamber_pressure='R2S_PT_1', ox_signal: str | None = 'NITROUS_PT_4', **kwargs) -> BurnEvents:
+    '''
+    detect_burn_events on the channels of a HotfireDataset / ColumnarHotfire
+    '''
+
+    return detect_burn_events(dataset.time, dataset.channel(thrust), dataset.channel(chamber_pressure),
+                              dataset.channel(ox_signal) if ox_signal is not None else None, **kwargs)
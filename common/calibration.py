@@ -0,0 +1,227 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import json
+import os
+from typing import Callable
+
+import numpy as np
+import scipy.optimize
+
+# Residual of every sample of a simulation that failed to run
+FAILED_RESIDUAL = 10.0
+
+
+@dataclass
+class Parameter():
+    '''
+    A calibrated input of the simulation, bounded to [lower, upper]
+    '''
+
+    name: str
+
+    lower: float
+
+    upper: float
+
+    initial: float
+
+
+@dataclass
+class Target():
+    '''
+    A measured channel the simulation has to match
+    '''
+
+    column: str
+    '''
+    Column of the simulation results compared against the measurement
+    '''
+
+    time: np.ndarray
+    '''
+    Measurement time, relative to the start of the simulation
+    '''
+
+    values: np.ndarray
+
+    weight: float = 1.0
+
+
+@dataclass
+class CalibrationResult():
+
+    params: dict[str, float]
+
+    cost: float
+    '''
+    Sum of squared residuals at params
+    '''
+
+    evaluations: int
+    '''
+    Simulations actually run, cache hits aren't counted
+    '''
+
+    cache_hits: int
+
+    history: list[tuple[dict[str, float], float]] = field(default_factory=list)
+    '''
+    (params, cost) of every simulation run, in order
+    '''
+
+
+def residual(results: dict[str, np.ndarray], targets: list[Target]) -> np.ndarray:
+    '''
+    Difference between simulated and measured channels at the measurement
+    times. Each channel is scaled by its measured peak and by the square root
+    of its sample count, so channels of different units and lengths weigh
+    the same. The simulation counts as 0 after it ended.
+    '''
+
+    parts = list()
+
+    for target in targets:
+        sim = np.interp(target.time, results['time'], results[target.column], right=0)
+        scale = np.max(np.abs(target.values))*np.sqrt(len(target.values))
+        parts.append(target.weight*(sim - target.values)/scale)
+
+    return np.concatenate(parts)
+
+
+def _evaluate(simulate: Callable[[dict[str, float]], dict[str, np.ndarray]], params: dict[str, float], targets: list[Target]) -> np.ndarray | None:
+    try:
+        return residual(simulate(params), targets)
+    except Exception as e:
+        print(f'Simulation failed for {params}: {e}')
+        return None
+
+
+class Calibrator():
+    '''
+    Fits simulation parameters to measured channels.
+
+    simulate(params) runs the simulation for a {name: value} dict and returns
+    its result columns (including 'time') as arrays. It has to be picklable
+    (a module level function) as candidates are run in a process pool.
+
+    Every residual vector is memoized on the rounded parameter values, and
+    optionally appended to cache_path (JSON lines) so a later run of the
+    same calibration starts with all earlier simulations for free.
+    '''
+
+    def __init__(self, simulate: Callable[[dict[str, float]], dict[str, np.ndarray]], parameters: list[Parameter], targets: list[Target],
+                 processes: int | None = None, cache_path: str | None = None, diff_step=1e-3):
+
+        self.simulate = simulate
+        self.parameters = parameters
+        self.targets = targets
+        self.processes = processes
+        self.cache_path = cache_path
+        self.diff_step = diff_step
+
+        self.lower = np.array([p.lower for p in parameters])
+        self.upper = np.array([p.upper for p in parameters])
+
+        self.size = sum(len(t.values) for t in targets)
+        self.cache: dict[tuple, np.ndarray] = dict()
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.history: list[tuple[dict[str, float], float]] = list()
+
+        self._pool = None
+
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.cache[tuple(entry['x'])] = np.array(entry['r'])
+
+    def _key(self, x: np.ndarray) -> tuple:
+        return tuple(float(f'{v:.10g}') for v in x)
+
+    def params(self, x: np.ndarray) -> dict[str, float]:
+        return {p.name: float(v) for p, v in zip(self.parameters, x)}
+
+    def evaluate_many(self, xs: list[np.ndarray]) -> list[np.ndarray]:
+        '''
+        Residual vectors of many candidates, running the ones not cached in parallel
+        '''
+
+        keys = [self._key(x) for x in xs]
+        todo = list(dict.fromkeys(k for k in keys if k not in self.cache))
+        self.cache_hits += len(keys) - len(todo)
+
+        if todo:
+            if self._pool is not None and len(todo) > 1:
+                futures = [self._pool.submit(_evaluate, self.simulate, self.params(k), self.targets) for k in todo]
+                results = [f.result() for f in futures]
+            else:
+                results = [_evaluate(self.simulate, self.params(k), self.targets) for k in todo]
+
+            for k, r in zip(todo, results):
+                r = np.full(self.size, FAILED_RESIDUAL) if r is None else r
+                self.cache[k] = r
+                self.evaluations += 1
+                self.history.append((self.params(k), float(np.sum(r**2))))
+
+                if self.cache_path is not None:
+                    with open(self.cache_path, 'a') as f:
+                        f.write(json.dumps({'x': list(k), 'r': r.tolist()}) + '\n')
+
+        return [self.cache[k] for k in keys]
+
+    def residuals(self, x: np.ndarray) -> np.ndarray:
+        return self.evaluate_many([x])[0]
+
+    def cost(self, x: np.ndarray) -> float:
+        return float(np.sum(self.residuals(x)**2))
+
+    def jacobian(self, x: np.ndarray) -> np.ndarray:
+        '''
+        Forward difference Jacobian with all perturbed simulations run at once.
+        The step is diff_step of each parameter's range (stepping backwards
+        at the upper bound), large enough to stay clear of time step noise.
+        '''
+
+        h = self.diff_step*(self.upper - self.lower)
+        h = np.where(x + h > self.upper, -h, h)
+
+        points = [x]
+        for i in range(len(x)):
+            p = x.copy()
+            p[i] += h[i]
+            points.append(p)
+
+        r = self.evaluate_many(points)
+
+        return np.column_stack([(r[i + 1] - r[0])/h[i] for i in range(len(x))])
+
+    def _map(self, func, xs):
+        # differential_evolution workers, the objective is always cost()
+        return [float(np.sum(r**2)) for r in self.evaluate_many([np.asarray(x) for x in xs])]
+
+    def fit(self, method='least_squares', **kwargs) -> CalibrationResult:
+        '''
+        method 'least_squares': bounded trust region reflective fit from the
+        initial values, the Jacobian evaluated in parallel.
+        method 'differential_evolution': global search of the bounds, each
+        generation evaluated in parallel. Extra kwargs go to the scipy optimizer.
+        '''
+
+        x0 = np.array([p.initial for p in self.parameters])
+
+        with ProcessPoolExecutor(max_workers=self.processes) as self._pool:
+
+            if method == 'least_squares':
+                fit = scipy.optimize.least_squares(self.residuals, x0, jac=self.jacobian, bounds=(self.lower, self.upper),
+                                                   x_scale=self.upper - self.lower, **kwargs)
+            elif method == 'differential_evolution':
+                kwargs.setdefault('polish', False)
+                fit = scipy.optimize.differential_evolution(self.cost, list(zip(self.lower, self.upper)), x0=x0,
+                                                            workers=self._map, updating='deferred', **kwargs)
+            else:
+                raise Exception(f'Unknown calibration method {method}')
+
+        self._pool = None
+
+        return CalibrationResult(self.params(fit.x), self.cost(fit.x), self.evaluations, self.cache_hits, self.history)
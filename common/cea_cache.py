@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import json
+import sqlite3
+
+UNIT_ATTRIBUTES = ['isp_units', 'cstar_units', 'pressure_units', 'temperature_units', 'sonic_velocity_units', 'enthalpy_units',
+                   'density_units', 'specific_heat_units', 'viscosity_units', 'thermal_cond_units']
+
+
+class CachedCEA():
+    '''
+    Memoizing wrapper around a rocketcea CEA_Obj. Pc, MR and eps are
+    snapped to multiples of pc_tol, mr_tol and eps_tol, CEA is run at the
+    snapped point and the result is kept in a bounded LRU (max_entries).
+
+    With store_path, results also go into an sqlite file that can be shared
+    by any number of processes and runs. Entries are separated by the
+    propellants and units of the wrapped CEA_Obj, so one store can hold
+    several propellant pairs. Custom propellant cards aren't part of that,
+    pass them as namespace so editing a card doesn't reuse old results.
+
+    Any CEA_Obj method taking (Pc, MR, eps) can be called on the wrapper,
+    e.g. get_IvacCstrTc_ChmMwGam(Pc=..., MR=..., eps=...).
+    '''
+
+    def __init__(self, cea, pc_tol=0.01, mr_tol=0.001, eps_tol=0.01, max_entries=100000, store_path: str | None = None, namespace=''):
+
+        self.cea = cea
+        self.tolerances = (pc_tol, mr_tol, eps_tol)
+        self.max_entries = max_entries
+
+        self.namespace = json.dumps([getattr(cea, 'desc', ''), [getattr(cea, a, '') for a in UNIT_ATTRIBUTES], namespace])
+
+        self.cache: OrderedDict[tuple, object] = OrderedDict()
+
+        self.hits = 0
+        '''
+        Served from memory
+        '''
+
+        self.store_hits = 0
+        '''
+        Served from the sqlite store
+        '''
+
+        self.misses = 0
+        '''
+        CEA actually ran
+        '''
+
+        self.store = None
+        if store_path is not None:
+            self.store = sqlite3.connect(store_path, timeout=60)
+            self.store.execute('PRAGMA journal_mode=WAL')
+            self.store.execute('PRAGMA synchronous=NORMAL')
+            self.store.execute('CREATE TABLE IF NOT EXISTS cea (namespace TEXT, key TEXT, value TEXT, PRIMARY KEY (namespace, key))')
+            self.store.commit()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def hit_rate(self) -> float:
+        calls = self.hits + self.store_hits + self.misses
+        return (self.hits + self.store_hits)/calls if calls else 0.0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'store_hits': self.store_hits, 'misses': self.misses, 'entries': len(self.cache), 'hit_rate': self.hit_rate}
+
+    def call(self, method: str, Pc: float, MR: float, eps: float, **kwargs):
+        '''
+        cea.<method>(Pc, MR, eps, **kwargs) at the snapped point, cached
+        '''
+
+        q = tuple(round(v/tol) for v, tol in zip((Pc, MR, eps), self.tolerances))
+        key = (method, q, tuple(sorted(kwargs.items())))
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return self.cache[key]
+
+        value = None
+        store_key = json.dumps(key)
+
+        if self.store is not None:
+            row = self.store.execute('SELECT value FROM cea WHERE namespace = ? AND key = ?', (self.namespace, store_key)).fetchone()
+            if row is not None:
+                value = json.loads(row[0])
+                value = tuple(value) if isinstance(value, list) else value
+                self.store_hits += 1
+
+        if value is None:
+            pc, mr, e = (n*tol for n, tol in zip(q, self.tolerances))
+            value = getattr(self.cea, method)(Pc=pc, MR=mr, eps=e, **kwargs)
+            self.misses += 1
+
+            if self.store is not None:
+                self.store.execute('INSERT OR REPLACE INTO cea VALUES (?, ?, ?)', (self.namespace, store_key, json.dumps(value)))
+                self.store.commit()
+
+        self.cache[key] = value
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+        return value
+
+    def __getattr__(self, method: str):
+
+        # Only proxy what the wrapped CEA_Obj has, so hasattr() on the wrapper stays truthful
+        if method.startswith('_') or not hasattr(self.cea, method):
+            raise AttributeError(method)
+
+        def cached(Pc: float, MR: float, eps: float, **kwargs):
+            return self.call(method, Pc, MR, eps, **kwargs)
+
+        return cached
@@ -0,0 +1,202 @@
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Units the hybrid scripts use for CEA_Obj
+CEA_UNITS = dict(pressure_units='Bar', cstar_units='m/s', temperature_units='K', sonic_velocity_units='m/s',
+                 enthalpy_units='J/kg', density_units='kg/m^3', specific_heat_units='J/kg-K', viscosity_units='poise',
+                 thermal_cond_units='W/cm-degC')
+
+FIELDS = ['isp_vac', 'cstar', 'tc', 'mw', 'gamma', 'cp']
+
+
+def make_cea(ox_name: str, fuel_name: str, ox_card: str | None = None, fuel_card: str | None = None):
+    '''
+    CEA_Obj in CEA_UNITS, adding custom propellant cards first. Has to be done
+    in every process, rocketcea keeps the cards in module state.
+    '''
+
+    from rocketcea.cea_obj import add_new_fuel, add_new_oxidizer
+    from rocketcea.cea_obj_w_units import CEA_Obj
+
+    if ox_card is not None:
+        add_new_oxidizer(ox_name, ox_card)
+    if fuel_card is not None:
+        add_new_fuel(fuel_name, fuel_card)
+
+    return CEA_Obj(propName='', oxName=ox_name, fuelName=fuel_name, **CEA_UNITS)
+
+
+def _pc_plane(propellants: tuple, pc: float, mr: np.ndarray, eps: np.ndarray) -> np.ndarray:
+
+    cea = make_cea(*propellants)
+    plane = np.empty((len(mr), len(eps), len(FIELDS)))
+
+    for j, m in enumerate(mr):
+        for k, e in enumerate(eps):
+            isp_vac, cstar, tc, mw, gamma = cea.get_IvacCstrTc_ChmMwGam(Pc=pc, MR=m, eps=e)
+            cp = cea.get_Chamber_Cp(Pc=pc, MR=m, eps=e, frozen=0)
+            plane[j, k] = (isp_vac, cstar, tc, mw, gamma, cp)
+
+    return plane
+
+
+def _table_key(propellants: tuple, pc: np.ndarray, mr: np.ndarray, eps: np.ndarray) -> str:
+    h = hashlib.sha1()
+    h.update(json.dumps(propellants).encode())
+    for axis in (pc, mr, eps):
+        h.update(np.asarray(axis, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+class CeaTable():
+    '''
+    Equilibrium chamber and nozzle properties tabulated over a
+    (chamber pressure (bar), O/F, area ratio) grid and interpolated
+    trilinearly. Queries outside the grid are clamped to its edges.
+
+    get_IvacCstrTc_ChmMwGam and get_Chamber_Cp take the same arguments as
+    on CEA_Obj, so a table can stand in for it.
+    '''
+
+    def __init__(self, pc: np.ndarray, mr: np.ndarray, eps: np.ndarray, data: np.ndarray, key=''):
+        self.pc = np.asarray(pc, dtype=float)
+        self.mr = np.asarray(mr, dtype=float)
+        self.eps = np.asarray(eps, dtype=float)
+        self.data = np.asarray(data, dtype=float)
+        self.key = key
+
+        # Plain Python copies for the scalar lookup, much cheaper than indexing numpy per call
+        self._axes = [self.pc.tolist(), self.mr.tolist(), self.eps.tolist()]
+        self._rows = self.data.tolist()
+
+    @classmethod
+    def build(cls, ox_name: str, fuel_name: str, pc: np.ndarray, mr: np.ndarray, eps: np.ndarray,
+              ox_card: str | None = None, fuel_card: str | None = None, processes: int | None = None) -> 'CeaTable':
+        '''
+        Runs CEA on every grid point, one chamber pressure per process pool
+        task. processes=1 builds in this process, without a pool.
+        '''
+
+        propellants = (ox_name, fuel_name, ox_card, fuel_card)
+
+        if processes == 1:
+            planes = [_pc_plane(propellants, p, mr, eps) for p in pc]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                planes = list(pool.map(_pc_plane, [propellants]*len(pc), pc, [mr]*len(pc), [eps]*len(pc)))
+
+        return cls(pc, mr, eps, np.stack(planes), _table_key(propellants, pc, mr, eps))
+
+    def save(self, path: str):
+        np.savez(path, pc=self.pc, mr=self.mr, eps=self.eps, data=self.data, key=self.key, fields=FIELDS)
+
+    @classmethod
+    def load(cls, path: str) -> 'CeaTable':
+        with np.load(path) as f:
+            return cls(f['pc'], f['mr'], f['eps'], f['data'], str(f['key']))
+
+    @classmethod
+    def load_or_build(cls, path: str, ox_name: str, fuel_name: str, pc: np.ndarray, mr: np.ndarray, eps: np.ndarray,
+                      ox_card: str | None = None, fuel_card: str | None = None, processes: int | None = None) -> 'CeaTable':
+        '''
+        Loads the table at path if it was built for the same propellants and
+        grid, otherwise builds and saves it
+        '''
+
+        key = _table_key((ox_name, fuel_name, ox_card, fuel_card), pc, mr, eps)
+
+        if os.path.exists(path):
+            table = cls.load(path)
+            if table.key == key:
+                return table
+
+        table = cls.build(ox_name, fuel_name, pc, mr, eps, ox_card, fuel_card, processes)
+
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        table.save(path)
+
+        return table
+
+    def lookup(self, pc: float, mr: float, eps: float) -> list[float]:
+        '''
+        All FIELDS at one point
+        '''
+
+        index = list()
+        for axis, x in zip(self._axes, (pc, mr, eps)):
+            if len(axis) == 1 or x <= axis[0]:
+                index.append((0, 0, 0.0))
+            elif x >= axis[-1]:
+                index.append((len(axis) - 1, len(axis) - 1, 0.0))
+            else:
+                i = bisect_right(axis, x) - 1
+                index.append((i, i + 1, (x - axis[i])/(axis[i + 1] - axis[i])))
+
+        (i0, i1, wi), (j0, j1, wj), (k0, k1, wk) = index
+        rows = self._rows
+
+        out = [0.0]*len(FIELDS)
+        for i, w_i in ((i0, 1 - wi), (i1, wi)):
+            if w_i == 0:
+                continue
+            for j, w_j in ((j0, 1 - wj), (j1, wj)):
+                if w_j == 0:
+                    continue
+                for k, w_k in ((k0, 1 - wk), (k1, wk)):
+                    w = w_i*w_j*w_k
+                    if w == 0:
+                        continue
+                    for f, v in enumerate(rows[i][j][k]):
+                        out[f] += w*v
+
+        return out
+
+    def lookup_many(self, pc: np.ndarray, mr: np.ndarray, eps: np.ndarray) -> np.ndarray:
+        '''
+        Vectorised lookup, returns (points, FIELDS)
+        '''
+
+        pc, mr, eps = np.broadcast_arrays(np.asarray(pc, dtype=float), np.asarray(mr, dtype=float), np.asarray(eps, dtype=float))
+
+        lo, hi, w = list(), list(), list()
+        for axis, x in zip((self.pc, self.mr, self.eps), (pc.ravel(), mr.ravel(), eps.ravel())):
+            if len(axis) == 1:
+                i = np.zeros(len(x), dtype=int)
+                lo.append(i)
+                hi.append(i)
+                w.append(np.zeros(len(x)))
+                continue
+
+            x = np.clip(x, axis[0], axis[-1])
+            i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+            lo.append(i)
+            hi.append(i + 1)
+            w.append((x - axis[i])/(axis[i + 1] - axis[i]))
+
+        out = np.zeros((len(w[0]), len(FIELDS)))
+        for ci in (0, 1):
+            for cj in (0, 1):
+                for ck in (0, 1):
+                    weight = (w[0] if ci else 1 - w[0])*(w[1] if cj else 1 - w[1])*(w[2] if ck else 1 - w[2])
+                    out += weight[:, None]*self.data[(hi if ci else lo)[0], (hi if cj else lo)[1], (hi if ck else lo)[2]]
+
+        return out.reshape(pc.shape + (len(FIELDS),))
+
+    def field(self, name: str, pc, mr, eps) -> np.ndarray:
+        return self.lookup_many(pc, mr, eps)[..., FIELDS.index(name)]
+
+    def get_IvacCstrTc_ChmMwGam(self, Pc: float, MR: float, eps: float) -> tuple[float, float, float, float, float]:
+        isp_vac, cstar, tc, mw, gamma, _ = self.lookup(Pc, MR, eps)
+        return isp_vac, cstar, tc, mw, gamma
+
+    def get_Chamber_Cp(self, Pc: float, MR: float, eps: float, frozen=0) -> float:
+        if frozen:
+            raise Exception('The table only holds equilibrium Cp')
+        return self.lookup(Pc, MR, eps)[5]
@@ -0,0 +1,2 @@
+# Standard gravity (m/s^2), the g0 of every Isp computed in this repo
+G0 = 9.80665
@@ -0,0 +1,150 @@
+from dataclasses import dataclass, field
+import math
+
+from common.nitrous_properties import liquid_density
+
+P_AMBIENT_BAR = 1.01325
+
+
+@dataclass
+class FeasibilityLimits():
+    '''
+    Bounds used by check_feasibility. The defaults are loose on purpose, they
+    should only reject designs that have no chance of a steady burn.
+    '''
+
+    injector_cd: float = 0.65
+
+    c_star: float = 1500
+    '''
+    Assumed characteristic velocity (m/s) for the chamber pressure estimate
+    '''
+
+    min_pressure_ratio: float = 2.0
+    '''
+    Minimum chamber to ambient pressure ratio for the nozzle to stay choked
+    '''
+
+    min_injector_drop: float = 0.05
+    '''
+    Minimum injector pressure drop as a fraction of tank pressure, below it the feed couples to the chamber
+    '''
+
+    min_ox_flux: float = 5
+    '''
+    Oxidizer mass flux range (kg/(m^2 s)) at the initial port. Wider than the
+    ranges the regression laws were fitted over, which most designs leave early in the burn
+    '''
+
+    max_ox_flux: float = 3000
+
+    min_port_l_d: float = 2
+    '''
+    Bounds on the grain length over initial port diameter
+    '''
+
+    max_port_l_d: float = 60
+
+    min_of_ratio: float = 0.5
+
+    max_of_ratio: float = 20
+
+
+@dataclass
+class Feasibility():
+
+    feasible: bool
+
+    reasons: list[str] = field(default_factory=list)
+
+    chamber_pressure_bar: float = 0
+
+    ox_mass_flow: float = 0
+
+    ox_mass_flux: float = 0
+
+    of_ratio: float = 0
+
+    margin: float = 0
+    '''
+    Smallest relative distance to any limit, negative when a limit is violated.
+    Use it to order candidates, e.g. to try the most comfortable designs first.
+    '''
+
+
+def _balance(pc, tank_pressure, ox_rho, injector_area, throat_area, port_radius, burn_area, fuel_density, a, n, c_star):
+    '''
+    Returns (mass in - mass out, ox mass flow, fuel mass flow) at chamber pressure pc (Pa)
+    '''
+
+    mdot_ox = injector_area*math.sqrt(2*ox_rho*max(tank_pressure - pc, 0))
+    g_ox = mdot_ox/(math.pi*port_radius**2)
+    mdot_fuel = fuel_density*burn_area*a*g_ox**n
+    mdot_out = pc*throat_area/c_star
+
+    return mdot_ox + mdot_fuel - mdot_out, mdot_ox, mdot_fuel
+
+
+def check_feasibility(engine, limits: FeasibilityLimits | None = None) -> Feasibility:
+    '''
+    Quick analytic check of an engine configured for a sim (before initialize_engine).
+    Solves the steady choked-flow balance between injector inflow plus fuel
+    regression and nozzle outflow for the chamber pressure, then checks that
+    against the tank pressure, the oxidizer flux against the regression law's
+    range and the grain L/D.
+    '''
+
+    limits = limits if limits is not None else FeasibilityLimits()
+
+    tank_pressure = engine.ox_initial_tank_pressure_bar*1e5
+    ox_rho = liquid_density(engine.ox_initial_temp_C)
+
+    injector_area = limits.injector_cd*engine.ox_orifice_number*math.pi*(engine.ox_orifice_diameter/2)**2
+    throat_area = math.pi*(engine.nozzle_throat_diameter/2)**2
+    port_radius = engine.centre_port_radius
+    burn_area = 2*math.pi*port_radius*engine.charge_length
+
+    args = (tank_pressure, ox_rho, injector_area, throat_area, port_radius, burn_area,
+            engine.solid_propellant_density, engine.regression_a, engine.regression_n, limits.c_star)
+
+    # Inflow falls and outflow rises with chamber pressure so the balance has a single root
+    lo = 0
+    hi = tank_pressure
+    for _ in range(50):
+        mid = (lo + hi)/2
+        if _balance(mid, *args)[0] > 0:
+            lo = mid
+        else:
+            hi = mid
+
+    pc = (lo + hi)/2
+    _, mdot_ox, mdot_fuel = _balance(pc, *args)
+
+    res = Feasibility(True)
+    res.chamber_pressure_bar = pc/1e5
+    res.ox_mass_flow = mdot_ox
+    res.ox_mass_flux = mdot_ox/(math.pi*port_radius**2)
+    res.of_ratio = mdot_ox/mdot_fuel if mdot_fuel > 0 else math.inf
+
+    port_l_d = engine.charge_length/(2*port_radius)
+
+    # (relative margin, reason if violated)
+    margins = [
+        (res.chamber_pressure_bar/P_AMBIENT_BAR/limits.min_pressure_ratio - 1, 'nozzle not choked, throat too large for the injector'),
+        ((tank_pressure - pc)/tank_pressure/limits.min_injector_drop - 1, 'injector pressure drop too small, throat too small for the injector'),
+        (res.ox_mass_flux/limits.min_ox_flux - 1, 'oxidizer mass flux below regression law range'),
+        (1 - res.ox_mass_flux/limits.max_ox_flux, 'oxidizer mass flux above regression law range'),
+        (port_l_d/limits.min_port_l_d - 1, 'port L/D too small'),
+        (1 - port_l_d/limits.max_port_l_d, 'port L/D too large'),
+        (res.of_ratio/limits.min_of_ratio - 1, 'O/F ratio too fuel rich'),
+        (1 - res.of_ratio/limits.max_of_ratio, 'O/F ratio too oxidizer rich'),
+    ]
+
+    for m, reason in margins:
+        if m < 0:
+            res.feasible = False
+            res.reasons.append(reason)
+
+    res.margin = min(m for m, _ in margins)
+
+    return res
@@ -0,0 +1,248 @@
+from dataclasses import dataclass, field
+from enum import IntEnum
+import time
+
+import nitrous_engine_sim
+from nitrous_engine_sim.result_helper import get_running_results
+
+from common.engine_profiler import EngineProfiler
+
+MAX_ITERATIONS = 200000
+
+
+class BurnPhase(IntEnum):
+    IGNITION = 0
+    STEADY = 1
+    LIQUID_DEPLETION = 2
+    TAIL_OFF = 3
+
+
+@dataclass
+class DtSchedule():
+    '''
+    Time step to use in each phase of a burn. The defaults keep the ignition
+    transient and the liquid to vapour change at the resolution the study
+    scripts used everywhere (0.5-1ms) and coarsen the rest of the burn.
+    '''
+
+    ignition_dt: float = 0.0005
+
+    steady_dt: float = 0.005
+
+    depletion_dt: float = 0.001
+
+    tail_off_dt: float = 0.002
+
+    min_ignition_time: float = 0.05
+    '''
+    Minimum time (s) spent on the ignition step before looking for steady state
+    '''
+
+    steady_slope_threshold: float = 2.0
+    '''
+    Chamber pressure slope (bar/s) below which the chamber counts as settled
+    '''
+
+    steady_hold_time: float = 0.05
+    '''
+    Time (s) the slope has to stay below the threshold before switching to the steady step
+    '''
+
+    depletion_hold_time: float = 0.1
+    '''
+    Time (s) to stay on the depletion step after ox_status changes
+    '''
+
+    tail_off_fraction: float = 0.8
+    '''
+    Fraction of the steady chamber pressure below which the burn counts as tailing off
+    '''
+
+
+class DtScheduler():
+    '''
+    Changes engine.delta_time when the burn moves between phases.
+    Call update() once after every simulate_engine() step.
+    '''
+
+    def __init__(self, schedule: DtSchedule | None = None):
+        self.schedule = schedule if schedule is not None else DtSchedule()
+
+    def reset(self, engine):
+
+        self.phase = BurnPhase.IGNITION
+        self.phase_start = engine.burn_time
+        self.settled_since = None
+        self.steady_pressure = 0
+        self.last_pressure = engine.chamber_pressure_bar
+        self.last_time = engine.burn_time
+        self.last_ox_status = engine.ox_status
+        self.transitions = [(engine.burn_time, BurnPhase.IGNITION)]
+
+        engine.delta_time = self.schedule.ignition_dt
+
+    def _enter(self, engine, phase: BurnPhase, dt: float):
+        self.phase = phase
+        self.phase_start = engine.burn_time
+        self.transitions.append((engine.burn_time, phase))
+        engine.delta_time = dt
+
+    def update(self, engine) -> BurnPhase:
+
+        s = self.schedule
+        t = engine.burn_time
+        pressure = engine.chamber_pressure_bar
+        ox_status = engine.ox_status
+
+        step = t - self.last_time
+        slope = (pressure - self.last_pressure)/step if step > 0 else 0
+
+        self.last_time = t
+        self.last_pressure = pressure
+
+        # Liquid running out is a transient regardless of what phase we are in
+        if ox_status != self.last_ox_status:
+            self.last_ox_status = ox_status
+            if self.phase != BurnPhase.TAIL_OFF:
+                self._enter(engine, BurnPhase.LIQUID_DEPLETION, s.depletion_dt)
+            return self.phase
+
+        if self.phase == BurnPhase.IGNITION:
+
+            if t - self.phase_start < s.min_ignition_time or abs(slope) > s.steady_slope_threshold:
+                self.settled_since = None
+            elif self.settled_since is None:
+                self.settled_since = t
+            elif t - self.settled_since >= s.steady_hold_time:
+                self.steady_pressure = pressure
+                self._enter(engine, BurnPhase.STEADY, s.steady_dt)
+
+        elif self.phase == BurnPhase.STEADY:
+
+            self.steady_pressure = max(self.steady_pressure, pressure)
+
+            if pressure < s.tail_off_fraction*self.steady_pressure:
+                self._enter(engine, BurnPhase.TAIL_OFF, s.tail_off_dt)
+
+        elif self.phase == BurnPhase.LIQUID_DEPLETION:
+
+            if t - self.phase_start >= s.depletion_hold_time:
+                self._enter(engine, BurnPhase.TAIL_OFF, s.tail_off_dt)
+
+        return self.phase
+
+
+@dataclass
+class BurnResult():
+
+    results: list[dict] = field(default_factory=list)
+
+    iterations: int = 0
+
+    total_impulse: float = 0
+
+    total_thrust: float = 0
+
+    phases: list[tuple[float, BurnPhase]] = field(default_factory=list)
+    '''
+    (burn time, phase) for every phase change when a dt scheduler was used
+    '''
+
+
+def prepare_sim(engine, dt):
+    engine.delta_time = dt
+
+    engine.burn_status = 0
+    engine.initialize_engine()
+
+    engine.burn_status = 1
+    engine.ignition = True
+
+    engine.surpress_mixture_out_of_range = True
+
+
+def _no_clock() -> float:
+    return 0.0
+
+
+def _no_record(*args):
+    pass
+
+
+def run_burn(engine, max_iterations=MAX_ITERATIONS, dt_schedule: DtSchedule | None = None, result_period=1, report_faults=True, profiler: EngineProfiler | None = None) -> BurnResult:
+    '''
+    Steps a prepared engine until burn_status drops or max_iterations is reached.
+    With a dt_schedule the time step follows the burn phases, every result
+    row then carries the 'delta_time' it was taken with. With a profiler every
+    section of the step is timed, without one the clock and record calls are no-ops.
+    '''
+
+    if profiler is not None:
+        clock = time.perf_counter
+        record = profiler.record
+        record_step = profiler.record_step
+        profiler.start()
+    else:
+        clock = _no_clock
+        record = record_step = _no_record
+
+    res = BurnResult()
+    last_fault = 0
+
+    scheduler = None
+    if dt_schedule is not None:
+        scheduler = DtScheduler(dt_schedule)
+        scheduler.reset(engine)
+
+    i = 0
+    while engine.burn_status == 1 and i < max_iterations:
+
+        t0 = clock()
+        dt = engine.delta_time
+        t1 = clock()
+        engine.simulate_engine()
+        t2 = clock()
+        thrust = engine.thrust
+        fault = engine._fault
+        t3 = clock()
+
+        res.total_impulse += thrust*dt
+        res.total_thrust += thrust
+        t4 = clock()
+
+        record('attribute_access', (t1 - t0) + (t3 - t2))
+        record('simulate_engine', t2 - t1)
+
+        if i % result_period == 0:
+            rr = get_running_results(engine)
+            rr['delta_time'] = dt
+            res.results.append(rr)
+        t5 = clock()
+
+        if scheduler is not None:
+            scheduler.update(engine)
+        t6 = clock()
+
+        record('get_running_results', t5 - t4)
+        record('bookkeeping', (t4 - t3) + (t6 - t5))
+
+        if report_faults and fault != last_fault:
+            if fault > 0:
+                print(f'New engine fault at {engine.burn_time:.3f}s: {nitrous_engine_sim.get_error_msg(fault)}')
+            else:
+                print(f'All faults cleared at {engine.burn_time:.3f}s')
+            last_fault = fault
+            record('fault_report', clock() - t6)
+
+        record_step(clock() - t0)
+
+        i += 1
+
+    if profiler is not None:
+        profiler.stop()
+
+    res.iterations = i
+    if scheduler is not None:
+        res.phases = scheduler.transitions
+
+    return res
@@ -0,0 +1,145 @@
+import cProfile
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Not available on windows, peak RSS is then simply not reported
+    resource = None
+
+HIST_MIN_DECADE = -7  # 100ns
+HIST_MAX_DECADE = 0   # 1s
+HIST_BINS_PER_DECADE = 10
+
+
+class EngineProfiler():
+    '''
+    Opt-in instrumentation for run_burn. Pass an instance as profiler= to
+    collect per-phase wall time, steps per second, a per-step latency histogram
+    and peak memory. With profile=True the whole run is also recorded with
+    cProfile so it can be opened in snakeviz / flameprof.
+    '''
+
+    def __init__(self, track_memory=False, profile=False):
+        self.track_memory = track_memory
+        self.profile = profile
+
+        self.phase_time: dict[str, float] = dict()
+        self.phase_calls: dict[str, int] = dict()
+        self.step_histogram = np.zeros((HIST_MAX_DECADE - HIST_MIN_DECADE)*HIST_BINS_PER_DECADE + 2, dtype=np.int64)
+        self.steps = 0
+        self.wall_time = 0
+        self.peak_traced_memory = 0
+        self.peak_rss = 0
+
+        self._profiler = None
+        self._start = 0
+
+    def start(self):
+
+        if self.track_memory:
+            tracemalloc.start()
+
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+        self._start = time.perf_counter()
+
+    def stop(self):
+
+        self.wall_time += time.perf_counter() - self._start
+
+        if self._profiler is not None:
+            self._profiler.disable()
+
+        if self.track_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_traced_memory = max(self.peak_traced_memory, peak)
+            tracemalloc.stop()
+
+        if resource is not None:
+            # ru_maxrss is in kB on linux
+            self.peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+    def record(self, phase: str, seconds: float):
+        self.phase_time[phase] = self.phase_time.get(phase, 0) + seconds
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def record_step(self, seconds: float):
+
+        self.steps += 1
+
+        if seconds <= 0:
+            self.step_histogram[0] += 1
+            return
+
+        i = int((math.log10(seconds) - HIST_MIN_DECADE)*HIST_BINS_PER_DECADE) + 1
+        self.step_histogram[min(max(i, 0), len(self.step_histogram) - 1)] += 1
+
+    @property
+    def steps_per_second(self):
+        return self.steps/self.wall_time if self.wall_time > 0 else 0
+
+    def histogram_edges(self):
+        '''
+        Bin edges (s) of step_histogram. The first and last bins catch everything
+        below and above the range.
+        '''
+        inner = np.logspace(HIST_MIN_DECADE, HIST_MAX_DECADE, (HIST_MAX_DECADE - HIST_MIN_DECADE)*HIST_BINS_PER_DECADE + 1)
+        return np.concatenate([[0], inner, [np.inf]])
+
+    def step_percentile(self, q: float):
+        '''
+        Approximate step latency (s) at percentile q (0-100) from the histogram
+        '''
+        if self.steps == 0:
+            return 0
+
+        edges = self.histogram_edges()
+        cumulative = np.cumsum(self.step_histogram)
+        i = int(np.searchsorted(cumulative, q/100*self.steps))
+
+        return edges[min(i + 1, len(edges) - 2)]
+
+    def print_report(self):
+
+        print(f'    Steps: {self.steps} in {self.wall_time:.3f} s ({self.steps_per_second:.0f} steps/s)')
+
+        for phase, t in sorted(self.phase_time.items(), key=lambda x: -x[1]):
+            share = t/self.wall_time*100 if self.wall_time > 0 else 0
+            print(f'    {phase:<22} {t:8.3f} s {share:5.1f}% ({self.phase_calls[phase]} calls)')
+
+        print(f'    Step latency p50/p90/p99: {self.step_percentile(50)*1e6:.1f}/{self.step_percentile(90)*1e6:.1f}/{self.step_percentile(99)*1e6:.1f} us')
+
+        if self.track_memory:
+            print(f'    Peak traced python memory: {self.peak_traced_memory/1e6:.2f} MB')
+        if self.peak_rss > 0:
+            print(f'    Peak RSS: {self.peak_rss/1e6:.1f} MB')
+
+    def write_folded(self, path: str, root='run_burn'):
+        '''
+        Writes the phase times as collapsed stacks (one "stack count" line per phase,
+        counts in microseconds), the input format of flamegraph.pl and speedscope
+        '''
+
+        accounted = sum(self.phase_time.values())
+
+        with open(path, 'w') as f:
+            for phase, t in self.phase_time.items():
+                f.write(f'{root};{phase} {int(t*1e6)}\n')
+            f.write(f'{root};other {int(max(self.wall_time - accounted, 0)*1e6)}\n')
+
+    def dump_stats(self, path: str):
+        '''
+        Writes the cProfile stats of the run (requires profile=True)
+        '''
+
+        if self._profiler is None:
+            raise Exception('Profiler was created without profile=True')
+
+        self._profiler.dump_stats(path)
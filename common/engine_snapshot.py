@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+import copy
+from typing import Any, Callable, TypeVar
+
+import numpy as np
+
+T = TypeVar('T')
+
+# Result channels compared by verify_restore
+VERIFY_CHANNELS = ['thrust', 'chamber_pressure_bar']
+
+STATE_TYPES = (bool, int, float, str, np.ndarray, np.generic)
+
+
+@dataclass
+class EngineSnapshot():
+    '''
+    Copy of every plain data attribute of a Cengines instance at one step.
+    Restore it into an engine built by the same factory (propellant loaded,
+    parameters assigned, prepare_sim done) to continue the burn from that point.
+    '''
+
+    state: dict[str, Any]
+
+    burn_time: float
+
+    verified: bool = field(default=False, compare=False)
+    '''
+    Set by verify_restore once restoring at this burn time has been checked
+    '''
+
+
+def _is_state(value) -> bool:
+
+    if isinstance(value, STATE_TYPES):
+        return True
+
+    if isinstance(value, (list, tuple)):
+        return all(isinstance(v, STATE_TYPES) for v in value)
+
+    return False
+
+
+def snapshot_engine(engine) -> EngineSnapshot:
+
+    state = dict()
+
+    for name in dir(engine):
+
+        if name.startswith('__'):
+            continue
+
+        try:
+            value = getattr(engine, name)
+        except Exception:
+            continue
+
+        if callable(value) or not _is_state(value):
+            continue
+
+        state[name] = copy.deepcopy(value)
+
+    return EngineSnapshot(state, engine.burn_time)
+
+
+def restore_engine(engine, snapshot: EngineSnapshot):
+    '''
+    Writes the snapshot back into engine. Read-only attributes are skipped.
+    Setting some attributes can recompute others, so anything that does not
+    read back as written gets a second pass.
+    '''
+
+    writable = list()
+
+    for name, value in snapshot.state.items():
+        try:
+            setattr(engine, name, copy.deepcopy(value))
+            writable.append(name)
+        except (AttributeError, TypeError):
+            pass
+
+    for name in writable:
+        value = snapshot.state[name]
+        current = getattr(engine, name)
+        if isinstance(value, np.ndarray):
+            same = np.array_equal(current, value)
+        else:
+            same = current == value
+        if not same:
+            setattr(engine, name, copy.deepcopy(value))
+
+
+def _check_running(engine):
+    if engine.burn_status != 1:
+        raise Exception('The engine factory has to return an engine ready to step (prepare_sim done), '
+                        f'got burn_status {engine.burn_status}')
+
+
+def _advance(engine, burn_time: float):
+    '''
+    Steps engine until it reaches burn_time, raises if the burn ends first
+    '''
+
+    while engine.burn_time < burn_time - 1e-9:
+        if engine.burn_status != 1:
+            raise Exception(f'Burn ended at {engine.burn_time:.4f}s, before the snapshot at {burn_time:.4f}s')
+        engine.simulate_engine()
+
+
+def _trace(engine, steps: int) -> np.ndarray:
+    from nitrous_engine_sim.result_helper import get_running_results
+
+    trace = np.full((steps, len(VERIFY_CHANNELS)), np.nan)
+    for i in range(steps):
+        if engine.burn_status != 1:
+            break
+        engine.simulate_engine()
+        rr = get_running_results(engine)
+        trace[i] = [rr[c] for c in VERIFY_CHANNELS]
+
+    return trace
+
+
+def verify_restore(factory: Callable[[], Any], snapshot: EngineSnapshot, compare_steps=200, rtol=1e-6, atol=1e-9):
+    '''
+    Checks that a snapshot taken at the burn time of snapshot captures
+    everything the engine needs to continue. factory builds an engine ready
+    to step (prepare_sim done). One engine is stepped to the snapshot's burn
+    time, snapshotted there and run on for compare_steps, a fresh engine
+    restored from that snapshot runs the same steps. Raises unless their
+    thrust and chamber pressure traces agree, or if the burn wasn't running
+    to compare. Marks snapshot as verified when it passes.
+
+    Only attributes visible to Python are snapshotted, any state held inside
+    the C extension (integrator, table position, faults) is not, so this has
+    to pass before forked burns can be trusted.
+    '''
+
+    reference = factory()
+    _check_running(reference)
+    _advance(reference, snapshot.burn_time)
+    if reference.burn_status != 1:
+        raise Exception(f'Burn is no longer running at the snapshot ({snapshot.burn_time:.4f}s), nothing to verify the restore against')
+    fork = snapshot_engine(reference)
+    expected = _trace(reference, compare_steps)
+
+    restored = factory()
+    restore_engine(restored, fork)
+    actual = _trace(restored, compare_steps)
+
+    if not np.isfinite(expected).all(axis=1).any():
+        raise Exception(f'The burn did not run on after {snapshot.burn_time:.4f}s, nothing to verify the restore against')
+
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True):
+        worst = np.nanmax(np.abs(actual - expected)/np.maximum(np.abs(expected), atol), axis=0)
+        raise Exception('Restoring an engine snapshot does not reproduce the unforked burn, relative error '
+                        + ', '.join(f'{c} {w:.3g}' for c, w in zip(VERIFY_CHANNELS, worst)))
+
+    snapshot.verified = True
+
+
+def _run_continuation(factory: Callable[[], Any], snapshot: EngineSnapshot, continuation: Callable[[Any], T]) -> T:
+    engine = factory()
+    restore_engine(engine, snapshot)
+    return continuation(engine)
+
+
+def fork_burns(snapshot: EngineSnapshot, factory: Callable[[], Any], continuations: list[Callable[[Any], T]], processes: int | None = 1) -> list[T]:
+    '''
+    Runs every continuation on its own engine restored from snapshot and
+    returns their results in order. factory builds an engine ready to step
+    (same propellant and parameters as the one the snapshot was taken from,
+    prepare_sim done).
+
+    With processes != 1 the continuations run in a process pool (None uses
+    all cores); factory and continuations then have to be picklable, i.e.
+    module level functions or functools.partial of them.
+
+    The first time a snapshot is forked verify_restore is run on factory at
+    the snapshot's burn time, it raises if restoring can't be confirmed to
+    reproduce an unforked burn of this engine.
+    '''
+
+    if not snapshot.verified:
+        verify_restore(factory, snapshot)
+
+    if processes == 1:
+        return [_run_continuation(factory, snapshot, c) for c in continuations]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_run_continuation, factory, snapshot, c) for c in continuations]
+        return [f.result() for f in futures]
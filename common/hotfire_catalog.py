@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from common.burn_window import detect_dataset_events
+from common.constants import G0
+from common.hotfire_dataset import HotfireDataset
+from common.spectral import spectral_metrics
+
+THRUST_CHANNEL = 'THRUST_STAND_LC1_CALIBRATED'
+CHAMBER_PRESSURE_CHANNEL = 'R2S_PT_1'
+NITROUS_FLOW_CHANNEL = 'NITROUS_FT_1'
+
+# Time (s) kept before detected ignition and after detected burnout
+WINDOW_MARGIN = (0.5, 2.0)
+# Time (s) before the window used to tare the load cell
+TARE_TIME = 2.0
+# Bumped whenever test_metrics changes, so cataloged tests get reprocessed
+METRICS_VERSION = 2
+
+
+def content_hash(path: str, chunk=1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def test_metrics(path: str, fuel_mass=0.0) -> dict:
+    '''
+    Per-test summary of a hotfire file: burn events, total impulse, nitrous
+    mass, Isp, chamber pressure and the dominant oscillations of chamber
+    pressure and thrust (see spectral_metrics). fuel_mass (kg) is added to the nitrous
+    mass for Isp, as it isn't measured by the DAQ.
+    '''
+
+    with HotfireDataset(path) as dataset:
+
+        events = detect_dataset_events(dataset)
+
+        row = {
+            'test': dataset.attrs.get('summary', os.path.basename(path)),
+            'file_datetime': dataset.attrs.get('file_datetime', ''),
+            'ignition': events.ignition,
+            'steady': events.steady,
+            'ox_cutoff': events.ox_cutoff,
+            'burnout': events.burnout,
+        }
+
+        if events.ignition is None or events.burnout is None:
+            return row
+
+        start, end = dataset.index_range(events.ignition - WINDOW_MARGIN[0], events.burnout + WINDOW_MARGIN[1])
+        tare_start = dataset.index(events.ignition - WINDOW_MARGIN[0] - TARE_TIME)
+
+        time = dataset.time[start:end]
+        dt = np.median(np.diff(time))
+
+        thrust = dataset.channel(THRUST_CHANNEL, start, end) - np.median(dataset.channel(THRUST_CHANNEL, tare_start, start + 1))
+        nitrous_flow = dataset.channel(NITROUS_FLOW_CHANNEL, start, end)
+
+        burn_start, burn_end = dataset.index_range(events.ignition, events.burnout)
+        chamber_pressure = dataset.channel(CHAMBER_PRESSURE_CHANNEL, burn_start, burn_end)
+
+        # Combustion oscillations over the burn itself
+        row.update(spectral_metrics(dataset, events.ignition, events.burnout))
+
+    total_impulse = np.sum(thrust*dt)
+    nitrous_mass = np.sum(nitrous_flow*dt)
+
+    row['burn_time'] = events.burnout - events.ignition
+    row['total_impulse'] = total_impulse
+    row['nitrous_mass'] = nitrous_mass
+    row['isp'] = total_impulse/((nitrous_mass + fuel_mass)*G0)
+    row['peak_chamber_pressure'] = float(np.max(chamber_pressure))
+    row['average_chamber_pressure'] = float(np.mean(chamber_pressure))
+
+    return row
+
+
+def _process(path: str, fuel_mass: float) -> dict:
+    row = test_metrics(path, fuel_mass)
+    row['content_hash'] = content_hash(path)
+    row['metrics_version'] = METRICS_VERSION
+    return row
+
+
+def update_catalog(data_dir: str, catalog_path: str, fuel_mass=0.0, processes: int | None = None) -> pd.DataFrame:
+    '''
+    Scans data_dir for hotfire .h5 files and brings the catalog table at
+    catalog_path (CSV indexed by file name) up to date. Files whose size and
+    mtime match the catalog are trusted, otherwise their content hash decides
+    whether they are reprocessed. Tests cataloged by an older METRICS_VERSION
+    are always reprocessed. New or changed files are processed in a process pool.
+    '''
+
+    catalog = pd.read_csv(catalog_path, index_col='file') if os.path.exists(catalog_path) else pd.DataFrame()
+
+    files = sorted(f for f in os.listdir(data_dir) if f.endswith('.h5'))
+    todo = list()
+
+    for f in files:
+        path = f'{data_dir}/{f}'
+        stat = os.stat(path)
+
+        if f in catalog.index and catalog.loc[f].get('metrics_version') == METRICS_VERSION:
+            known = catalog.loc[f]
+            if known['size'] == stat.st_size and known['mtime'] == stat.st_mtime:
+                continue
+            if known['content_hash'] == content_hash(path):
+                catalog.loc[f, ['size', 'mtime']] = [stat.st_size, stat.st_mtime]
+                continue
+
+        todo.append(f)
+
+    rows = dict()
+    if todo:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {f: pool.submit(_process, f'{data_dir}/{f}', fuel_mass) for f in todo}
+            for f, future in futures.items():
+                row = future.result()
+                stat = os.stat(f'{data_dir}/{f}')
+                row['size'] = stat.st_size
+                row['mtime'] = stat.st_mtime
+                rows[f] = row
+
+    if rows:
+        new = pd.DataFrame.from_dict(rows, orient='index')
+        catalog = pd.concat([catalog.drop(index=[f for f in rows if f in catalog.index]), new])
+
+    # Forget files that were removed
+    catalog = catalog.loc[[f for f in catalog.index if f in files]]
+    catalog.index.name = 'file'
+    catalog = catalog.sort_index()
+
+    out_dir = os.path.dirname(catalog_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    catalog.to_csv(catalog_path)
+
+    print(f'Catalog: {len(catalog)} tests, {len(rows)} (re)processed')
+
+    return catalog
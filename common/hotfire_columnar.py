@@ -0,0 +1,223 @@
+import json
+import os
+
+import h5py
+import numpy as np
+
+from common.hotfire_dataset import HotfireDataset
+
+MANIFEST = 'manifest.json'
+COPY_CHUNK = 1 << 20
+
+
+def _write_npy(path: str, dataset, chunk=COPY_CHUNK):
+    '''
+    Copies an h5py dataset into a .npy file chunk by chunk
+    '''
+
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=dataset.dtype, shape=dataset.shape)
+    for i in range(0, dataset.shape[0], chunk):
+        out[i:i + chunk] = dataset[i:i + chunk]
+    out.flush()
+    del out
+
+
+def _write_levels(out_dir: str, name: str, data: np.ndarray, factor: int, min_samples: int) -> list[dict]:
+    '''
+    Min/max pyramid: level k holds the min and max of every factor**k samples
+    '''
+
+    levels = list()
+    current_min = current_max = data
+    level = 1
+
+    while len(current_min)//factor >= min_samples:
+
+        n = len(current_min)//factor*factor
+        current_min = current_min[:n].reshape(-1, factor).min(axis=1)
+        current_max = current_max[:n].reshape(-1, factor).max(axis=1)
+
+        file = f'{name}.L{level}.npy'
+        np.save(f'{out_dir}/{file}', np.column_stack([current_min, current_max]))
+        levels.append({'factor': factor**level, 'file': file, 'samples': len(current_min)})
+        level += 1
+
+    return levels
+
+
+def convert_hotfire(h5_path: str, out_dir: str, pyramid_factor=8, min_level_samples=256) -> dict:
+    '''
+    Converts a hotfire HDF5 file into a directory with one .npy per channel,
+    the shared time base(s) and min/max pyramid levels, described by a JSON
+    manifest with units and sample rates. Returns the manifest.
+    '''
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = {
+        'source': os.path.abspath(h5_path),
+        'source_mtime': os.path.getmtime(h5_path),
+        'pyramid_factor': pyramid_factor,
+        'attrs': dict(),
+        'time_bases': dict(),
+        'channels': dict(),
+    }
+
+    with h5py.File(h5_path, 'r') as file:
+
+        for k, v in file.attrs.items():
+            manifest['attrs'][k] = v.item() if isinstance(v, np.generic) else v
+
+        # Channels sharing a time base share one time file
+        time_bases: list[tuple[str, np.ndarray]] = list()
+
+        for name, channel in file['channels'].items():
+
+            time = channel['time'][()]
+
+            time_file = None
+            for f, t in time_bases:
+                if len(t) == len(time) and np.array_equal(t, time):
+                    time_file = f
+                    break
+
+            if time_file is None:
+                time_file = f'time_{len(time_bases)}.npy'
+                np.save(f'{out_dir}/{time_file}', time)
+                time_bases.append((time_file, time))
+                manifest['time_bases'][time_file] = {'samples': len(time)}
+
+            _write_npy(f'{out_dir}/{name}.npy', channel['data'])
+            data = np.load(f'{out_dir}/{name}.npy', mmap_mode='r')
+
+            manifest['channels'][name] = {
+                'file': f'{name}.npy',
+                'time': time_file,
+                'description': channel.attrs.get('name', name),
+                'units': channel.attrs.get('units', ''),
+                'samples': len(data),
+                'sample_rate': float(1/np.median(np.diff(time))) if len(time) > 1 else 0.0,
+                'levels': _write_levels(out_dir, name, data, pyramid_factor, min_level_samples),
+            }
+
+    with open(f'{out_dir}/{MANIFEST}', 'w') as f:
+        json.dump(manifest, f, indent=1, default=str)
+
+    return manifest
+
+
+class ColumnarHotfire():
+    '''
+    Read access to a directory written by convert_hotfire, with the same
+    interface as HotfireDataset. Channels are memory-mapped .npy files, so
+    channel() and time are zero-copy views.
+    '''
+
+    def __init__(self, path: str, index_channel: str | None = None):
+        self.path = path
+
+        with open(f'{path}/{MANIFEST}') as f:
+            self.manifest = json.load(f)
+
+        self.channels = list(self.manifest['channels'].keys())
+        self.index_channel = index_channel if index_channel is not None else self.channels[0]
+
+        self._maps: dict[str, np.ndarray] = dict()
+
+    def close(self):
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _load(self, file: str) -> np.ndarray:
+        if file not in self._maps:
+            self._maps[file] = np.load(f'{self.path}/{file}', mmap_mode='r')
+        return self._maps[file]
+
+    @property
+    def attrs(self):
+        return self.manifest['attrs']
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.own_time(self.index_channel)
+
+    def own_time(self, name: str) -> np.ndarray:
+        return self._load(self.manifest['channels'][name]['time'])
+
+    def units(self, name: str) -> str:
+        return self.manifest['channels'][name]['units']
+
+    def description(self, name: str) -> str:
+        return self.manifest['channels'][name]['description']
+
+    def sample_rate(self, name: str) -> float:
+        return self.manifest['channels'][name]['sample_rate']
+
+    def index(self, t: float) -> int:
+        return int(np.searchsorted(self.time, t, side='right'))
+
+    def index_range(self, t_start: float, t_end: float) -> tuple[int, int]:
+        return self.index(t_start), self.index(t_end)
+
+    def channel(self, name: str, start: int | None = None, end: int | None = None) -> np.ndarray:
+
+        if self.manifest['channels'][name]['time'] != self.manifest['channels'][self.index_channel]['time']:
+            raise Exception(f'Channel {name} is not sampled on the time base of {self.index_channel}, resample it first')
+
+        return self._load(self.manifest['channels'][name]['file'])[start:end]
+
+    def samples(self, name: str, start: int, end: int) -> np.ndarray:
+        return self._load(self.manifest['channels'][name]['file'])[start:end]
+
+    def window(self, t_start: float, t_end: float, channels: list[str]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+
+        start, end = self.index_range(t_start, t_end)
+
+        return self.time[start:end], {c: self.channel(c, start, end) for c in channels}
+
+    def level(self, name: str, level: int) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Time of each block and the (blocks, 2) min/max array of pyramid level
+        level (0 is the raw channel, returned as min == max)
+        '''
+
+        time = self.own_time(name)
+
+        if level == 0:
+            data = self.samples(name, 0, None)
+            return time, np.column_stack([data, data])
+
+        info = self.manifest['channels'][name]['levels'][level - 1]
+
+        return time[::info['factor']][:info['samples']], self._load(info['file'])
+
+    def coarsest_level_for(self, name: str, t_start: float, t_end: float, max_points: int) -> int:
+        '''
+        Coarsest level that still gives at least max_points blocks between t_start and t_end
+        '''
+
+        start, end = self.index_range(t_start, t_end)
+        level = 0
+
+        for i, info in enumerate(self.manifest['channels'][name]['levels']):
+            if (end - start)//info['factor'] < max_points:
+                break
+            level = i + 1
+
+        return level
+
+
+def open_hotfire(path: str):
+    '''
+    HotfireDataset for an HDF5 file, ColumnarHotfire for a converted directory
+    '''
+
+    if os.path.isdir(path):
+        return ColumnarHotfire(path)
+
+    return HotfireDataset(path)
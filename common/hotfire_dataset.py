@@ -0,0 +1,110 @@
+import h5py
+import numpy as np
+
+
+class HotfireDataset():
+    '''
+    Read access to a DAQ hotfire HDF5 file (channels/<name>/time, channels/<name>/data).
+    The time base of index_channel (default: the first channel) is read once
+    and used to turn times into sample indices, channels are then read as
+    hyperslabs so only the samples of the window come off disk.
+    '''
+
+    def __init__(self, path: str, index_channel: str | None = None, check_time_base=True):
+        self.path = path
+        self.check_time_base = check_time_base
+        self.file = h5py.File(path, 'r')
+
+        self.channels = list(self.file['channels'].keys())
+        self.index_channel = index_channel if index_channel is not None else self.channels[0]
+
+        self._time = None
+        self._channel_times: dict[str, np.ndarray] = dict()
+        self._checked = set()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def time(self) -> np.ndarray:
+        if self._time is None:
+            self._time = self.file['channels'][self.index_channel]['time'][()]
+        return self._time
+
+    @property
+    def attrs(self):
+        return self.file.attrs
+
+    def units(self, name: str) -> str:
+        return self.file['channels'][name].attrs.get('units', '')
+
+    def description(self, name: str) -> str:
+        return self.file['channels'][name].attrs.get('name', name)
+
+    def index(self, t: float) -> int:
+        '''
+        Index of the first sample after time t
+        '''
+        return int(np.searchsorted(self.time, t, side='right'))
+
+    def index_range(self, t_start: float, t_end: float) -> tuple[int, int]:
+        return self.index(t_start), self.index(t_end)
+
+    def _check(self, name: str, start: int, end: int):
+        '''
+        Makes sure the channel is sampled on the index time base within [start, end)
+        '''
+
+        if not self.check_time_base or name == self.index_channel or (name, start, end) in self._checked:
+            return
+
+        channel_time = self.file['channels'][name]['time']
+
+        if channel_time.shape != self.time.shape or not np.array_equal(channel_time[start:end], self.time[start:end]):
+            raise Exception(f'Channel {name} is not sampled on the time base of {self.index_channel}, resample it first')
+
+        self._checked.add((name, start, end))
+
+    def channel(self, name: str, start: int | None = None, end: int | None = None) -> np.ndarray:
+        '''
+        Samples [start, end) of a channel
+        '''
+
+        start = 0 if start is None else start
+        end = len(self.time) if end is None else end
+
+        self._check(name, start, end)
+
+        return self.file['channels'][name]['data'][start:end]
+
+    def channel_time(self, name: str, start: int | None = None, end: int | None = None) -> np.ndarray:
+        return self.file['channels'][name]['time'][start:end]
+
+    def own_time(self, name: str) -> np.ndarray:
+        '''
+        Full (cached) time base of a channel, for channels not sampled on the index time base
+        '''
+        if name not in self._channel_times:
+            self._channel_times[name] = self.file['channels'][name]['time'][()]
+        return self._channel_times[name]
+
+    def samples(self, name: str, start: int, end: int) -> np.ndarray:
+        '''
+        Samples [start, end) of a channel indexed on its own time base, no time base check
+        '''
+        return self.file['channels'][name]['data'][start:end]
+
+    def window(self, t_start: float, t_end: float, channels: list[str]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        '''
+        Time and the given channels between t_start and t_end
+        '''
+
+        start, end = self.index_range(t_start, t_end)
+
+        return self.time[start:end], {c: self.channel(c, start, end) for c in channels}
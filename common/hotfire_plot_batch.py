@@ -0,0 +1,121 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from common.hotfire_dataset import HotfireDataset
+
+CACHE_FILE = '.plot_cache.json'
+
+
+def minmax_decimate(time: np.ndarray, values: np.ndarray, bins: int) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Reduces a trace to the min and max of each of bins equal sample ranges, in
+    the order they occur. Drawn as a line this looks the same as the full
+    trace at bins pixels width, including every spike.
+    '''
+
+    n = len(values)
+    if n <= 2*bins:
+        return time, values
+
+    per_bin = n//bins
+    used = per_bin*bins
+
+    v = values[:used].reshape(bins, per_bin)
+    lo = np.argmin(v, axis=1)
+    hi = np.argmax(v, axis=1)
+
+    first = np.minimum(lo, hi) + np.arange(bins)*per_bin
+    second = np.maximum(lo, hi) + np.arange(bins)*per_bin
+
+    i = np.column_stack([first, second]).ravel()
+
+    # Remainder that didn't fill a whole bin
+    i = np.concatenate([i, np.arange(used, n)])
+
+    return time[i], values[i]
+
+
+def _plot_key(time: np.ndarray, values: np.ndarray, settings: dict) -> str:
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(time).tobytes())
+    h.update(np.ascontiguousarray(values).tobytes())
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _render_channel(path: str, channel: str, out_dir: str, t_start: float, t_end: float, settings: dict, previous_key: str | None) -> tuple[str, str, bool]:
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    # Each channel on its own time base, so channels off the index time base plot too
+    with HotfireDataset(path) as dataset:
+        channel_time = dataset.own_time(channel)
+        start, end = np.searchsorted(channel_time, [t_start, t_end], side='right')
+        time = channel_time[start:end]
+        values = dataset.samples(channel, start, end)
+
+    key = _plot_key(time, values, settings)
+    out_file = f'{out_dir}/{channel}.png'
+
+    if key == previous_key and os.path.exists(out_file):
+        return channel, key, False
+
+    width_px = int(settings['figsize'][0]*settings['dpi'])
+    time, values = minmax_decimate(time, values, width_px)
+
+    fig = plt.figure(figsize=settings['figsize'])
+    plt.title(channel)
+    plt.plot(time, values)
+    plt.xlabel('Time (s)')
+
+    fig.savefig(out_file, dpi=settings['dpi'])
+    plt.close(fig)
+
+    return channel, key, True
+
+
+def render_channels(path: str, out_dir: str, t_start: float, t_end: float, channels: list[str] | None = None, dpi=500, figsize=(6.4, 4.8), processes: int | None = None) -> list[str]:
+    '''
+    Renders one figure per channel of a hotfire file in parallel worker
+    processes. Each trace is min/max decimated to the figure's pixel width
+    before plotting. Figures whose data, time base and settings hash matches the one
+    recorded in out_dir/.plot_cache.json are skipped.
+
+    Returns the channels that were (re)rendered.
+    '''
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    if channels is None:
+        with HotfireDataset(path) as dataset:
+            channels = dataset.channels
+
+    cache_path = f'{out_dir}/{CACHE_FILE}'
+    cache = dict()
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    settings = {'dpi': dpi, 'figsize': list(figsize)}
+
+    rendered = list()
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_render_channel, path, c, out_dir, t_start, t_end, settings, cache.get(c)) for c in channels]
+
+        for f in futures:
+            channel, key, was_rendered = f.result()
+            cache[channel] = key
+            if was_rendered:
+                rendered.append(channel)
+
+    with open(cache_path, 'w') as f:
+        json.dump(cache, f, indent=1)
+
+    return rendered
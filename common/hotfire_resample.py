@@ -0,0 +1,99 @@
+import numpy as np
+import scipy.signal
+
+from common.hotfire_dataset import HotfireDataset
+
+CHUNK_SAMPLES = 1 << 16
+
+
+def time_grid(t_start: float, t_end: float, rate: float) -> np.ndarray:
+    return t_start + np.arange(int(np.floor((t_end - t_start)*rate)) + 1)/rate
+
+
+def _source_rate(time: np.ndarray) -> float:
+    return 1/np.median(np.diff(time[:min(len(time), 10000)]))
+
+
+def _decimation_filter(source_rate: float, target_rate: float, numtaps=63) -> np.ndarray | None:
+    '''
+    Symmetric low-pass FIR with its cutoff at 80% of the target Nyquist frequency,
+    None if the target rate doesn't need anti-aliasing
+    '''
+
+    if target_rate >= source_rate:
+        return None
+
+    return scipy.signal.firwin(numtaps, 0.8*target_rate/source_rate)
+
+
+def _resample_chunk(t: np.ndarray, x: np.ndarray, grid: np.ndarray, method: str) -> np.ndarray:
+
+    if method == 'zoh':
+        i = np.searchsorted(t, grid, side='right') - 1
+        return x[np.clip(i, 0, len(x) - 1)]
+
+    return np.interp(grid, t, x)
+
+
+def resample_channels(dataset: HotfireDataset, channels: list[str], grid: np.ndarray, method='linear', chunk_samples=CHUNK_SAMPLES) -> np.ndarray:
+    '''
+    Puts channels onto one time grid, each channel is read on its own time
+    base so differing sample rates are handled. Returns a (len(grid), len(channels)) array.
+
+    method:
+        'linear' - linear interpolation
+        'zoh' - zero-order hold, the last sample at or before each grid time
+        'decimate' - zero-phase low-pass filter at the grid rate, then linear
+                     interpolation (plain 'linear' when the grid is not coarser)
+
+    The grid is processed chunk_samples points at a time, and for every chunk only
+    the source samples it covers (plus the filter overlap) are read.
+    '''
+
+    if method not in ('linear', 'zoh', 'decimate'):
+        raise Exception(f'Unknown resampling method {method}')
+
+    out = np.empty((len(grid), len(channels)))
+
+    target_rate = 1/np.median(np.diff(grid)) if len(grid) > 1 else np.inf
+
+    times = [dataset.own_time(c) for c in channels]
+    filters = [_decimation_filter(_source_rate(t), target_rate) if method == 'decimate' else None for t in times]
+
+    for g0 in range(0, len(grid), chunk_samples):
+
+        g = grid[g0:g0 + chunk_samples]
+
+        for j, (c, t, taps) in enumerate(zip(channels, times, filters)):
+
+            # Source samples bracketing the chunk
+            lo = max(int(np.searchsorted(t, g[0], side='right')) - 1, 0)
+            hi = min(int(np.searchsorted(t, g[-1], side='left')) + 1, len(t))
+
+            if taps is None:
+                out[g0:g0 + len(g), j] = _resample_chunk(t[lo:hi], dataset.samples(c, lo, hi), g, method)
+                continue
+
+            # Read half a filter length either side so the chunk edges are filtered
+            # exactly as they would be in one pass over the whole recording
+            halo = len(taps)//2
+            read_lo = max(lo - halo, 0)
+            read_hi = min(hi + halo, len(t))
+            x = dataset.samples(c, read_lo, read_hi)
+
+            padded = np.pad(x, (halo - (lo - read_lo), halo - (read_hi - hi)), mode='edge')
+            filtered = np.convolve(padded, taps, mode='valid')
+
+            out[g0:g0 + len(g), j] = np.interp(g, t[lo:hi], filtered)
+
+    return out
+
+
+def resample_window(dataset: HotfireDataset, channels: list[str], t_start: float, t_end: float, rate: float, method='linear') -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Grid between t_start and t_end at rate (Hz) and the channels resampled onto it
+    '''
+
+    grid = time_grid(t_start, t_end, rate)
+
+    return grid, resample_channels(dataset, channels, grid, method)
@@ -0,0 +1,251 @@
+from dataclasses import dataclass
+import socket
+import time as clock
+from typing import Iterator, TextIO
+
+import h5py
+import numpy as np
+
+from common.constants import G0
+
+
+@dataclass
+class LiveMetrics():
+
+    time: float = 0
+
+    thrust: float = 0
+
+    chamber_pressure: float = 0
+
+    total_impulse: float = 0
+
+    ox_mass: float = 0
+
+    isp: float = 0
+
+    ignited: bool = False
+
+    burnt_out: bool = False
+    '''
+    Latched once the burn has ended, impulse, oxidizer mass, burn time and Isp are final from then on
+    '''
+
+    burn_time: float = 0
+
+    predicted_thrust: float = float('nan')
+
+    deviating: bool = False
+
+
+class StreamingHotfireAnalyzer():
+    '''
+    Incremental hotfire metrics, one update() per sample with a fixed cost and
+    fixed memory (the last history samples are kept in ring buffers for plotting).
+
+    The load cell is tared on the mean of the samples before ignition. Once
+    thrust rises above ignition_thrust the running impulse, oxidizer mass and
+    Isp are integrated (trapezoid). Burnout is latched with the hysteresis of
+    burn_window.detect_burn_events, on thrust smoothed over smooth_time and
+    relative to its peak so far: the burn goes off below off_level, back on
+    above on_level, and ends at the first sample below start_level after it
+    went off. Nothing is integrated after that.
+
+    If a prediction (time since ignition, thrust) is given, it is resampled
+    once onto a uniform prediction_dt grid, and the test is flagged as
+    deviating while the measured thrust differs from it by more than
+    deviation_tolerance of the predicted peak for longer than deviation_hold seconds.
+    '''
+
+    def __init__(self, prediction: tuple[np.ndarray, np.ndarray] | None = None, ignition_thrust=10.0, fuel_mass=0.0,
+                 deviation_tolerance=0.2, deviation_hold=0.2, history=10000, smooth_time=0.05, on_level=0.3,
+                 off_level=0.1, start_level=0.05, prediction_dt=0.01):
+
+        self.ignition_thrust = ignition_thrust
+        self.fuel_mass = fuel_mass
+        self.deviation_tolerance = deviation_tolerance
+        self.deviation_hold = deviation_hold
+        self.smooth_time = smooth_time
+        self.on_level = on_level
+        self.off_level = off_level
+        self.start_level = start_level
+
+        self.prediction = None
+        if prediction is not None:
+            pt, pf = np.asarray(prediction[0], dtype=float), np.asarray(prediction[1], dtype=float)
+            grid = np.arange(pt[0], pt[-1] + prediction_dt, prediction_dt)
+            self.prediction = (pt[0], prediction_dt, np.interp(grid, pt, pf).tolist())
+            self._deviation_limit = deviation_tolerance*np.max(pf)
+
+        self.metrics = LiveMetrics()
+
+        self._tare_sum = 0.0
+        self._tare_count = 0
+        self._ignition_time = 0.0
+        self._last = None
+        self._deviating_since = None
+
+        self._smoothed = 0.0
+        self._peak = 0.0
+        self._on = False
+
+        self.history = np.full((history, 4), np.nan)
+        self._head = 0
+
+    @property
+    def tare(self):
+        return self._tare_sum/self._tare_count if self._tare_count else 0.0
+
+    def _predicted(self, t: float) -> float:
+        '''
+        Linear interpolation of the resampled prediction, the cell found by arithmetic
+        '''
+
+        t0, dt, pf = self.prediction
+        x = (t - t0)/dt
+
+        if x <= 0:
+            return pf[0]
+        i = int(x)
+        if i + 1 >= len(pf):
+            return pf[-1]
+
+        return pf[i] + (pf[i + 1] - pf[i])*(x - i)
+
+    def _update_burnout(self, dt: float, thrust: float):
+        '''
+        Smoothed thrust hysteresis, latches burnt_out
+        '''
+
+        alpha = min(dt/self.smooth_time, 1.0) if self.smooth_time > 0 else 1.0
+        self._smoothed += alpha*(thrust - self._smoothed)
+        self._peak = max(self._peak, self._smoothed)
+
+        level = self._smoothed/self._peak if self._peak > 0 else 0
+        if level > self.on_level:
+            self._on = True
+        elif level < self.off_level:
+            self._on = False
+
+        if not self._on and level < self.start_level:
+            self.metrics.burnt_out = True
+
+    def update(self, t: float, thrust: float, chamber_pressure: float, ox_flow: float) -> LiveMetrics:
+
+        m = self.metrics
+
+        if not m.ignited:
+            if thrust - self.tare > self.ignition_thrust and self._tare_count > 0:
+                m.ignited = True
+                self._ignition_time = t
+            else:
+                self._tare_sum += thrust
+                self._tare_count += 1
+
+        thrust -= self.tare
+
+        if m.ignited and not m.burnt_out and self._last is not None:
+            last_t, last_thrust, last_flow = self._last
+            dt = t - last_t
+            m.total_impulse += (thrust + last_thrust)/2*dt
+            m.ox_mass += (max(ox_flow, 0) + max(last_flow, 0))/2*dt
+
+            propellant = m.ox_mass + self.fuel_mass
+            m.isp = m.total_impulse/(propellant*G0) if propellant > 0 else 0
+            m.burn_time = t - self._ignition_time
+
+            self._update_burnout(dt, thrust)
+
+        if m.ignited:
+            self._last = (t, thrust, ox_flow)
+
+        m.time = t
+        m.thrust = thrust
+        m.chamber_pressure = chamber_pressure
+
+        if self.prediction is not None and m.ignited and not m.burnt_out:
+            m.predicted_thrust = self._predicted(m.burn_time)
+
+            if abs(thrust - m.predicted_thrust) > self._deviation_limit:
+                if self._deviating_since is None:
+                    self._deviating_since = t
+                m.deviating = t - self._deviating_since >= self.deviation_hold
+            else:
+                self._deviating_since = None
+                m.deviating = False
+
+        h = self.history[self._head]
+        h[0] = t
+        h[1] = thrust
+        h[2] = chamber_pressure
+        h[3] = ox_flow
+        self._head = (self._head + 1) % len(self.history)
+
+        return m
+
+    def recent(self) -> np.ndarray:
+        '''
+        Buffered (time, thrust, chamber pressure, ox flow) rows, oldest first
+        '''
+
+        rows = np.roll(self.history, -self._head, axis=0)
+        return rows[~np.isnan(rows[:, 0])]
+
+
+def follow_hdf5(path: str, channels: list[str], poll_interval=0.05, timeout=5.0) -> Iterator[tuple]:
+    '''
+    Yields (time, *channel values) for every new sample of a hotfire HDF5 file
+    that is still being written (SWMR), reading only the rows appended since
+    the last poll. Stops once the file hasn't grown for timeout seconds.
+    '''
+
+    with h5py.File(path, 'r', libver='latest', swmr=True) as file:
+
+        time_ds = file['channels'][channels[0]]['time']
+        data_ds = [file['channels'][c]['data'] for c in channels]
+
+        read = 0
+        last_growth = clock.monotonic()
+
+        while True:
+
+            time_ds.refresh()
+            for d in data_ds:
+                d.refresh()
+
+            # Channels can lag each other by a few samples while being written
+            available = min([time_ds.shape[0]] + [d.shape[0] for d in data_ds])
+
+            if available > read:
+                t = time_ds[read:available]
+                values = [d[read:available] for d in data_ds]
+                for i in range(available - read):
+                    yield (t[i], *(v[i] for v in values))
+                read = available
+                last_growth = clock.monotonic()
+            elif clock.monotonic() - last_growth > timeout:
+                return
+            else:
+                clock.sleep(poll_interval)
+
+
+def follow_lines(stream: TextIO) -> Iterator[tuple]:
+    '''
+    Yields samples from a text stream (pipe, stdin, socket file) with one
+    comma separated sample per line: time, thrust, chamber pressure, ox flow
+    '''
+
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield tuple(float(v) for v in line.split(','))
+
+
+def follow_socket(host: str, port: int) -> Iterator[tuple]:
+    '''
+    follow_lines over a TCP connection, a stand-in for the DAQ stream
+    '''
+
+    with socket.create_connection((host, port)) as s:
+        yield from follow_lines(s.makefile('r'))
@@ -0,0 +1,196 @@
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from common.cea_tables import CeaTable, FIELDS
+from common.constants import G0
+from common.hybrid_pressure_model import HybridDesign, port_flows
+
+
+@dataclass
+class BatchResult():
+    '''
+    Per design summary of simulate_batch, chamber pressure in Pa
+    '''
+
+    burn_time: np.ndarray
+
+    total_impulse: np.ndarray
+
+    peak_pressure: np.ndarray
+
+    peak_thrust: np.ndarray
+
+    average_of: np.ndarray
+
+    final_port_radius: np.ndarray
+
+    fuel_mass: np.ndarray
+
+    isp: np.ndarray
+
+    depleted: np.ndarray
+    '''
+    False for designs still burning at t_max
+    '''
+
+
+class _GasTable():
+    '''
+    The table reduced to what the pressure equation needs at the single area
+    ratio the batch runs at, resampled onto a finer uniform (Pc, O/F) grid
+    so lookups find their cell by arithmetic instead of a search
+    '''
+
+    def __init__(self, table: CeaTable, eps: float, refine=4):
+
+        self.pc = np.linspace(table.pc[0], table.pc[-1], refine*len(table.pc))
+        self.mr = np.linspace(table.mr[0], table.mr[-1], refine*len(table.mr))
+
+        data = table.lookup_many(self.pc[:, None], self.mr[None, :], eps)
+
+        cstar = data[..., FIELDS.index('cstar')]
+        tc = data[..., FIELDS.index('tc')]
+        gamma = data[..., FIELDS.index('gamma')]
+        cp = data[..., FIELDS.index('cp')]
+
+        R = cp - cp/gamma
+        rt = R*tc
+        # Nozzle mass flow per unit throat area and pressure, see pressure_terms
+        flow = gamma/np.sqrt(gamma*rt)*(2/(gamma + 1))**((gamma + 1)/(2*(gamma - 1)))
+
+        # One flat array per quantity, gathered with np.take which is much
+        # faster than fancy indexing rows of a 2D table
+        self.values = [np.ascontiguousarray(v).ravel() for v in (cstar, rt, flow)]
+
+    def __call__(self, pc_bar: np.ndarray, of: np.ndarray) -> list[np.ndarray]:
+
+        pc, mr = self.pc, self.mr
+
+        x = (np.clip(pc_bar, pc[0], pc[-1]) - pc[0])/(pc[1] - pc[0])
+        i = np.minimum(x.astype(np.intp), len(pc) - 2)
+        wi = x - i
+
+        y = (np.clip(of, mr[0], mr[-1]) - mr[0])/(mr[1] - mr[0])
+        j = np.minimum(y.astype(np.intp), len(mr) - 2)
+        wj = y - j
+
+        f00 = i*len(mr) + j
+        f10 = f00 + len(mr)
+
+        out = list()
+        for v in self.values:
+            a = v.take(f00)
+            a += wj*(v.take(f00 + 1) - a)
+            b = v.take(f10)
+            b += wj*(v.take(f10 + 1) - b)
+            a += wi*(b - a)
+            out.append(a)
+
+        return out
+
+
+class _View():
+    '''
+    Attribute access to a dict of parameter arrays, so port_flows can take it as a design
+    '''
+
+    def __init__(self, params: dict):
+        self.__dict__.update(params)
+
+
+def simulate_batch(designs: HybridDesign, table: CeaTable, dt=0.02, t_max=120.0) -> BatchResult:
+    '''
+    Runs the reduced order hybrid model for many designs at once. Any field
+    of designs can be an array (all broadcast together), e.g. throat_radius,
+    initial_port_radius, fuel_length, ox_mass_flow, a_0 and n of every
+    candidate. expansion_ratio has to be the same for the whole batch.
+
+    Chamber pressure takes a linearly implicit Euler step (it is stiff, the
+    chamber fills in milliseconds), so dt only has to resolve the port
+    growth. Each design stops exactly when its oxidizer runs out. Finished
+    designs take zero length steps, which leaves them unchanged, and are
+    dropped from the working arrays once they are a quarter of them.
+    '''
+
+    if np.ndim(designs.expansion_ratio) != 0:
+        raise Exception('simulate_batch needs a single expansion ratio for the batch')
+
+    gas = _GasTable(table, float(designs.expansion_ratio))
+
+    names = [f.name for f in fields(HybridDesign) if f.name != 'expansion_ratio']
+    columns = np.broadcast_arrays(*[np.asarray(getattr(designs, n), dtype=float) for n in names])
+    count = columns[0].size
+    p = {n: c.ravel().copy() for n, c in zip(names, columns)}
+
+    throat_area = np.pi*p['throat_radius']**2
+
+    out = BatchResult(*[np.zeros(count) for _ in range(8)], np.zeros(count, dtype=bool))
+
+    # Parameters and running totals of the designs still burning, compacted
+    # in batches as designs finish. idx maps them back to the batch.
+    q = dict(p, throat_area=throat_area)
+    idx = np.arange(count)
+    pc = p['initial_pressure'].copy()
+    r = p['initial_port_radius'].copy()
+    m_ox = p['ox_mass'].copy()
+    totals = {n: np.zeros(count) for n in ('total_impulse', 'peak_pressure', 'peak_thrust', 'of_time', 'burn_time')}
+    t = 0.0
+    live = np.ones(count, dtype=bool)
+
+    def retire(mask):
+        out.final_port_radius[idx[mask]] = r[mask]
+        for n, v in totals.items():
+            if n == 'of_time':
+                out.average_of[idx[mask]] = v[mask]/np.maximum(totals['burn_time'][mask], 1e-12)
+            else:
+                getattr(out, n)[idx[mask]] = v[mask]
+
+    while len(idx) and t < t_max:
+
+        mdot = q['ox_mass_flow']
+        step = np.minimum(dt, m_ox/mdot)*live
+
+        r_dot, burn_area, _, of, volume = port_flows(_View(q), r, mdot)
+        cstar, rt, flow = gas(pc/1e5, of)
+
+        # dPc/dt = c0 - c1*Pc with nozzle mass flow k*Pc
+        k = flow*q['discharge_coefficient']*q['throat_area']/q['combustion_efficiency']
+        c0 = rt/volume*(burn_area*r_dot*q['fuel_density'] + mdot)
+        c1 = (burn_area*r_dot + rt*k)/volume
+        pc = (pc + step*c0)/(1 + step*c1)
+
+        thrust = k*pc*cstar*q['combustion_efficiency']*q['discharge_coefficient']*q['nozzle_efficiency']
+
+        totals['total_impulse'] += thrust*step
+        np.maximum(totals['peak_pressure'], pc, out=totals['peak_pressure'], where=live)
+        np.maximum(totals['peak_thrust'], thrust, out=totals['peak_thrust'], where=live)
+        totals['of_time'] += of*step
+        totals['burn_time'] += step
+
+        r = r + r_dot*step
+        m_ox = m_ox - mdot*step
+        t += dt
+
+        live = m_ox > 1e-12*q['ox_mass']
+        if not live.any():
+            break
+
+        if 4*np.count_nonzero(live) < 3*len(idx):
+            done = ~live
+            out.depleted[idx[done]] = True
+            retire(done)
+
+            idx, pc, r, m_ox = idx[live], pc[live], r[live], m_ox[live]
+            q = {n: v[live] for n, v in q.items()}
+            totals = {n: v[live] for n, v in totals.items()}
+            live = live[live]
+
+    out.depleted[idx[~live]] = True
+    retire(np.ones(len(idx), dtype=bool))
+
+    out.fuel_mass = np.pi*(out.final_port_radius**2 - p['initial_port_radius']**2)*p['fuel_length']*p['fuel_density']
+    burnt_ox = p['ox_mass_flow']*out.burn_time
+    out.isp = out.total_impulse/((burnt_ox + out.fuel_mass)*G0)
+
+    return out
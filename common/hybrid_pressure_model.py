@@ -0,0 +1,266 @@
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.integrate
+
+# Atmospheric pressure (Pa)
+ATMOSPHERE = 101325
+
+
+@dataclass
+class HybridDesign():
+    '''
+    Inputs of the reduced order (chamber filling) hybrid model of
+    Hybrid Calculations Using Pressure.py, SI units throughout
+    '''
+
+    ox_mass: float = 2.0
+    '''
+    Oxidizer loaded (kg)
+    '''
+
+    ox_mass_flow: float = 0.059
+    '''
+    Constant oxidizer mass flow (kg/s)
+    '''
+
+    a_0: float = 0.000116
+    '''
+    Regression coefficient of rdot = a_0*(ox mass flux)**n
+    '''
+
+    n: float = 0.331
+
+    fuel_density: float = 960
+
+    fuel_length: float = 0.15
+
+    initial_port_radius: float = 0.01
+
+    throat_radius: float = 0.003
+
+    pre_volume: float = 0.00005
+    '''
+    Pre combustion chamber volume (m^3)
+    '''
+
+    post_volume: float = 0.000025
+
+    expansion_ratio: float = 5
+
+    combustion_efficiency: float = 0.9
+
+    discharge_coefficient: float = 1
+
+    nozzle_efficiency: float = 1
+
+    initial_pressure: float = ATMOSPHERE
+
+
+@dataclass
+class HybridResult():
+    '''
+    Model outputs on a regular output grid, chamber pressure in Pa
+    '''
+
+    time: np.ndarray
+
+    chamber_pressure: np.ndarray
+
+    port_radius: np.ndarray
+
+    ox_mass: np.ndarray
+
+    of_ratio: np.ndarray
+
+    thrust: np.ndarray
+
+    prop_mass_flow: np.ndarray
+
+    chamber_temperature: np.ndarray
+
+    burn_time: float = 0
+
+    depleted: bool = False
+    '''
+    True if the burn ended by the oxidizer running out rather than at t_max
+    '''
+
+    solver_steps: int = 0
+
+    rhs_evaluations: int = 0
+
+    @property
+    def total_impulse(self) -> float:
+        return float(scipy.integrate.trapezoid(self.thrust, self.time))
+
+
+def port_flows(design: HybridDesign, port_radius, ox_mass_flow):
+    '''
+    Regression rate, burning area, fuel mass flow, O/F and chamber volume.
+    Works on scalars and on arrays of designs alike.
+
+    The script computed a = a_0/(1 + mdot_fuel/mdot_ox)**n and
+    rdot = a*(mdot_prop/A_port)**n, which with mdot_prop = mdot_ox + mdot_fuel
+    is exactly rdot = a_0*(mdot_ox/A_port)**n.
+    '''
+
+    port_area = np.pi*port_radius**2
+    r_dot = design.a_0*(ox_mass_flow/port_area)**design.n
+    burn_area = 2*np.pi*port_radius*design.fuel_length
+    fuel_mass_flow = design.fuel_density*burn_area*r_dot
+    volume = port_area*design.fuel_length + design.pre_volume + design.post_volume
+
+    return r_dot, burn_area, fuel_mass_flow, ox_mass_flow/fuel_mass_flow, volume
+
+
+def pressure_terms(design: HybridDesign, r_dot, burn_area, ox_mass_flow, volume, tc, gamma, cp):
+    '''
+    The chamber pressure equation written as dPc/dt = c0 - c1*Pc (for fixed
+    thermochemistry), and k with nozzle mass flow = k*Pc
+    '''
+
+    R = cp - cp/gamma
+    throat_area = np.pi*design.throat_radius**2
+
+    k = (gamma*design.discharge_coefficient*throat_area/(design.combustion_efficiency*np.sqrt(gamma*R*tc))
+         *(2/(gamma + 1))**((gamma + 1)/(2*(gamma - 1))))
+
+    c0 = R*tc/volume*(burn_area*r_dot*design.fuel_density + ox_mass_flow)
+    c1 = (burn_area*r_dot + R*tc*k)/volume
+
+    return c0, c1, k
+
+
+def thrust(design: HybridDesign, nozzle_mass_flow, cstar):
+    return nozzle_mass_flow*cstar*design.combustion_efficiency*design.discharge_coefficient*design.nozzle_efficiency
+
+
+def _thermo(thermo, pc_bar, of, eps):
+    '''
+    (c*, Tc, gamma, Cp) arrays, vectorised for a CeaTable and point by point
+    for anything else with the CEA_Obj methods
+    '''
+
+    if hasattr(thermo, 'lookup_many'):
+        t = thermo.lookup_many(pc_bar, of, eps)
+        return t[..., 1], t[..., 2], t[..., 4], t[..., 5]
+
+    out = np.empty((len(pc_bar), 4))
+    for i, (p, m) in enumerate(zip(pc_bar, of)):
+        _, cstar, tc, _, gamma = thermo.get_IvacCstrTc_ChmMwGam(Pc=p, MR=m, eps=eps)
+        out[i] = (cstar, tc, gamma, thermo.get_Chamber_Cp(Pc=p, MR=m, eps=eps, frozen=0))
+    return out.T
+
+
+class SmoothCEA():
+    '''
+    Bilinear interpolation in (Pc, MR) between the grid points a CachedCEA
+    snaps to. The snapped results alone are piecewise constant, which makes
+    a stiff solver crawl through every step in the cached values.
+    '''
+
+    def __init__(self, cached):
+        self.cached = cached
+        self.pc_tol, self.mr_tol, _ = cached.tolerances
+
+    def _blend(self, method: str, Pc: float, MR: float, eps: float, **kwargs):
+
+        x, y = Pc/self.pc_tol, MR/self.mr_tol
+        i, j = int(np.floor(x)), int(np.floor(y))
+        wx, wy = x - i, y - j
+
+        out = None
+        for di, w_i in ((0, 1 - wx), (1, wx)):
+            for dj, w_j in ((0, 1 - wy), (1, wy)):
+                w = w_i*w_j
+                if w == 0:
+                    continue
+                value = np.asarray(self.cached.call(method, (i + di)*self.pc_tol, (j + dj)*self.mr_tol, eps, **kwargs), dtype=float)
+                out = w*value if out is None else out + w*value
+
+        return out
+
+    def get_IvacCstrTc_ChmMwGam(self, Pc: float, MR: float, eps: float) -> tuple[float, float, float, float, float]:
+        return tuple(self._blend('get_IvacCstrTc_ChmMwGam', Pc, MR, eps))
+
+    def get_Chamber_Cp(self, Pc: float, MR: float, eps: float, frozen=0) -> float:
+        return float(self._blend('get_Chamber_Cp', Pc, MR, eps, frozen=frozen))
+
+
+def derivatives(t: float, y: np.ndarray, design: HybridDesign, thermo) -> list[float]:
+    '''
+    d/dt of the state (chamber pressure (Pa), port radius (m), oxidizer mass (kg)).
+    thermo is anything with the CEA_Obj get_IvacCstrTc_ChmMwGam and
+    get_Chamber_Cp methods in bar units (CEA_Obj, CachedCEA, CeaTable).
+    '''
+
+    pc, r, m_ox = y
+    ox_mass_flow = design.ox_mass_flow if m_ox > 0 else 0.0
+
+    if ox_mass_flow == 0:
+        return [0.0, 0.0, 0.0]
+
+    r_dot, burn_area, _, of, volume = port_flows(design, r, ox_mass_flow)
+
+    _, _, tc, _, gamma = thermo.get_IvacCstrTc_ChmMwGam(Pc=pc/1e5, MR=of, eps=design.expansion_ratio)
+    cp = thermo.get_Chamber_Cp(Pc=pc/1e5, MR=of, eps=design.expansion_ratio, frozen=0)
+
+    c0, c1, _ = pressure_terms(design, r_dot, burn_area, ox_mass_flow, volume, tc, gamma, cp)
+
+    return [c0 - c1*pc, r_dot, -ox_mass_flow]
+
+
+def _depleted(t, y, design, thermo):
+    return y[2]
+
+
+_depleted.terminal = True
+_depleted.direction = -1
+
+
+def simulate(design: HybridDesign, thermo, t_max=120.0, output_dt=0.01, method='LSODA', rtol=1e-6) -> HybridResult:
+    '''
+    Integrates the model with an implicit / stiffness switching solver
+    until the oxidizer runs out (terminal event) or t_max. The solution is
+    sampled every output_dt into preallocated arrays.
+
+    thermo is best a CeaTable, whose interpolation is smooth and cheap. A
+    plain CEA_Obj works but runs CEA on every evaluation. A CachedCEA snaps
+    to its tolerance grid, so it is wrapped in SmoothCEA here to interpolate
+    between the cached points.
+    '''
+
+    if hasattr(thermo, 'tolerances'):
+        thermo = SmoothCEA(thermo)
+
+    y0 = [design.initial_pressure, design.initial_port_radius, design.ox_mass]
+    atol = [1.0, 1e-8, 1e-7]
+
+    sol = scipy.integrate.solve_ivp(derivatives, (0, t_max), y0, method=method, args=(design, thermo), events=_depleted,
+                                    dense_output=True, rtol=rtol, atol=atol)
+
+    if sol.status == -1:
+        raise Exception(f'Hybrid model integration failed: {sol.message}')
+
+    depleted = len(sol.t_events[0]) > 0
+    burn_time = float(sol.t_events[0][0]) if depleted else float(sol.t[-1])
+
+    samples = max(int(np.ceil(burn_time/output_dt)), 1)
+    time = np.empty(samples + 1)
+    time[:samples] = np.arange(samples)*output_dt
+    time[samples] = burn_time
+
+    state = np.empty((3, len(time)))
+    state[:] = sol.sol(time)
+
+    pc, r, m_ox = state
+    m_ox = np.maximum(m_ox, 0)
+
+    ox_mass_flow = np.full(len(time), design.ox_mass_flow)
+    r_dot, burn_area, fuel_mass_flow, of, volume = port_flows(design, r, ox_mass_flow)
+    cstar, tc, gamma, cp = _thermo(thermo, pc/1e5, of, design.expansion_ratio)
+    _, _, k = pressure_terms(design, r_dot, burn_area, ox_mass_flow, volume, tc, gamma, cp)
+
+    return HybridResult(time, pc, r, m_ox, of, thrust(design, k*pc, cstar), ox_mass_flow + fuel_mass_flow, tc,
+                        burn_time, depleted, len(sol.t) - 1, sol.nfev)
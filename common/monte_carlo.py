@@ -0,0 +1,277 @@
+from bisect import insort
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import os
+from typing import Callable
+
+import numpy as np
+import scipy.stats
+
+from common.regression_laws import RegressionLaw
+
+
+@dataclass
+class Inputs():
+    '''
+    Uncertain burn inputs: (regression_a, regression_n) drawn from the law's
+    bootstrap samples when given, else from a normal in (ln a, n) with the
+    law's fit covariance, tank temperature (C) and fill pressure (bar) normal
+    and independent, each given as (mean, standard deviation)
+    '''
+
+    law: RegressionLaw
+
+    tank_temp_C: tuple[float, float] = (20, 0)
+
+    fill_pressure_bar: tuple[float, float] = (62.5, 0)
+
+    law_samples: np.ndarray | None = None
+    '''
+    Bootstrap (a, n) samples of the law, (resamples, 2), see load_samples. A
+    normal fitted to a bootstrap of a handful of points can put a good part of
+    its draws at n <= 0, the samples keep the bootstrap's shape.
+    '''
+
+    def _mean_and_root(self) -> tuple[np.ndarray, np.ndarray]:
+
+        cov = np.zeros((4, 4))
+        if self.law.cov is not None and self.law_samples is None:
+            cov[:2, :2] = self.law.cov
+        cov[2, 2] = self.tank_temp_C[1]**2
+        cov[3, 3] = self.fill_pressure_bar[1]**2
+
+        # Symmetric square root, unlike Cholesky it copes with fixed (zero variance) inputs
+        values, vectors = np.linalg.eigh(cov)
+        root = vectors*np.sqrt(np.clip(values, 0, None))
+
+        mean = np.array([np.log(self.law.a), self.law.n, self.tank_temp_C[0], self.fill_pressure_bar[0]])
+        return mean, root
+
+    def transform(self, u: np.ndarray) -> list[dict[str, float]]:
+        '''
+        Burn parameters for points u of the unit hypercube, (samples, 4). With
+        law_samples the first coordinate picks the (a, n) sample, the second is unused.
+        '''
+
+        mean, root = self._mean_and_root()
+        z = scipy.stats.norm.ppf(np.clip(u, 1e-12, 1 - 1e-12))
+        x = mean + z@root.T
+
+        if self.law_samples is not None:
+            k = np.minimum((u[:, 0]*len(self.law_samples)).astype(int), len(self.law_samples) - 1)
+            x[:, 0] = np.log(self.law_samples[k, 0])
+            x[:, 1] = self.law_samples[k, 1]
+
+        return [{'regression_a': float(np.exp(v[0])), 'regression_n': float(v[1]),
+                 'ox_initial_temp_C': float(v[2]), 'ox_initial_tank_pressure_bar': float(v[3])} for v in x]
+
+    @staticmethod
+    def physical(params: dict[str, float]) -> bool:
+        '''
+        False for draws no burn can be run with, a regression exponent n <= 0
+        '''
+
+        return params['regression_n'] > 0
+
+
+class Reducer():
+    '''
+    Running statistics of one burn output: Welford mean and variance, and the
+    sorted values for quantiles with distribution free confidence intervals
+    '''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._values = list()
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta/self.count
+        self._m2 += delta*(value - self.mean)
+
+        insort(self._values, value)
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2/(self.count - 1))) if self.count > 1 else 0.0
+
+    def quantile(self, q: float, level=0.95) -> tuple[float, float, float]:
+        '''
+        (estimate, low, high), the interval from the binomial distribution of
+        the number of samples below the true quantile
+        '''
+
+        x = self._values
+        n = len(x)
+        alpha = 1 - level
+
+        if n == 0:
+            return np.nan, np.nan, np.nan
+
+        low = int(scipy.stats.binom.ppf(alpha/2, n, q)) - 1
+        high = int(scipy.stats.binom.ppf(1 - alpha/2, n, q))
+
+        return float(np.quantile(x, q)), x[max(low, 0)], x[min(high, n - 1)]
+
+
+@dataclass
+class MonteCarloResult():
+
+    runs: int
+
+    failures: int
+
+    converged: bool
+
+    rejected: int = 0
+    '''
+    Input draws left out before running as not physical, see Inputs.physical
+    '''
+
+    quantiles: dict[str, dict[float, tuple[float, float, float]]] = field(default_factory=dict)
+    '''
+    metric -> quantile -> (estimate, low, high)
+    '''
+
+    mean: dict[str, float] = field(default_factory=dict)
+
+    std: dict[str, float] = field(default_factory=dict)
+
+    samples: list[tuple[dict[str, float], dict[str, float] | None]] = field(default_factory=list)
+    '''
+    (burn parameters, outputs) of every burn, outputs None where it failed
+    '''
+
+
+def _run(simulate: Callable[[dict[str, float]], dict[str, float]], params: dict[str, float]) -> dict[str, float] | None:
+    try:
+        return simulate(params)
+    except Exception as e:
+        print(f'Burn failed for {params}: {e}')
+        return None
+
+
+class MonteCarlo():
+    '''
+    Propagates Inputs through burns until the quantile confidence intervals
+    of every metric converge.
+
+    simulate(params) runs one burn for a {engine attribute: value} dict and
+    returns its outputs, e.g. {'total_impulse': ..., 'isp': ..., 'burn_time': ...}.
+    It has to be picklable (a module level function) as burns run in a process pool.
+
+    Inputs are drawn from a scrambled Sobol sequence rather than independently,
+    which covers the input space evenly and settles the quantiles in fewer
+    burns. The intervals assume independent samples, so they are conservative.
+    '''
+
+    def __init__(self, simulate: Callable[[dict[str, float]], dict[str, float]], inputs: Inputs, metrics: list[str],
+                 quantiles=(0.05, 0.5, 0.95), level=0.95, rel_tol=0.01, min_runs=64, max_runs=4096,
+                 processes: int | None = None, seed=0):
+
+        self.simulate = simulate
+        self.inputs = inputs
+        self.metrics = metrics
+        self.quantiles = quantiles
+        self.level = level
+        self.rel_tol = rel_tol
+        self.min_runs = min_runs
+        self.max_runs = max_runs
+        self.processes = processes
+
+        self.sobol = scipy.stats.qmc.Sobol(4, scramble=True, seed=seed)
+        self._params: list[dict[str, float]] = list()
+        self._drawn = 0
+
+        self.reducers = {m: Reducer() for m in metrics}
+        self.samples: list[tuple[dict[str, float], dict[str, float] | None]] = list()
+        self.failures = 0
+        self.rejected = 0
+
+    def _next_params(self) -> dict[str, float]:
+        while not self._params:
+            # Sobol points keep their balance in powers of two, each block doubles the points drawn
+            block = self._drawn if self._drawn else 16
+            params = self.inputs.transform(self.sobol.random(block))
+            self._drawn += block
+
+            self._params = [p for p in params if self.inputs.physical(p)]
+            self.rejected += len(params) - len(self._params)
+            if not self._params:
+                raise Exception(f'All {block} input draws were rejected as not physical, check the regression law')
+        return self._params.pop(0)
+
+    def add(self, params: dict[str, float], outputs: dict[str, float] | None):
+        self.samples.append((params, outputs))
+
+        if outputs is None or not all(np.isfinite(outputs.get(m, np.nan)) for m in self.metrics):
+            self.failures += 1
+            return
+
+        for m in self.metrics:
+            self.reducers[m].add(float(outputs[m]))
+
+    def converged(self) -> bool:
+        '''
+        True once every quantile interval is within rel_tol of the metric's median
+        '''
+
+        if self.reducers[self.metrics[0]].count < self.min_runs:
+            return False
+
+        for reducer in self.reducers.values():
+            scale = abs(reducer.quantile(0.5, self.level)[0])
+            for q in self.quantiles:
+                _, low, high = reducer.quantile(q, self.level)
+                if (high - low)/2 > self.rel_tol*scale:
+                    return False
+
+        return True
+
+    def result(self) -> MonteCarloResult:
+        return MonteCarloResult(
+            len(self.samples), self.failures, self.converged(), self.rejected,
+            {m: {q: r.quantile(q, self.level) for q in self.quantiles} for m, r in self.reducers.items()},
+            {m: r.mean for m, r in self.reducers.items()},
+            {m: r.std for m, r in self.reducers.items()},
+            self.samples,
+        )
+
+    def run(self, progress: Callable[[MonteCarloResult], None] | None = None, progress_period=32) -> MonteCarloResult:
+        '''
+        Keeps the pool busy with burns, folding each into the reducers as it
+        finishes, and stops submitting once converged or at max_runs
+        '''
+
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+
+            window = 2*(self.processes or os.cpu_count() or 1)
+            pending = dict()
+            submitted = 0
+
+            def submit():
+                nonlocal submitted
+                params = self._next_params()
+                pending[pool.submit(_run, self.simulate, params)] = params
+                submitted += 1
+
+            while submitted < min(window, self.max_runs):
+                submit()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    self.add(pending.pop(future), future.result())
+
+                    if progress is not None and len(self.samples) % progress_period == 0:
+                        progress(self.result())
+
+                stop = self.converged()
+                while not stop and submitted < self.max_runs and len(pending) < window:
+                    submit()
+
+        return self.result()
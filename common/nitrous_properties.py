@@ -0,0 +1,37 @@
+from typing import TypeVar, cast
+
+import numpy as np
+
+# Saturated nitrous oxide correlations, ESDU 91022 (as used in
+# "Modelling the nitrous run tank emptying", Aspire Space)
+T_CRIT = 309.57 # K
+P_CRIT = 72.51 # bar
+RHO_CRIT = 452.0 # kg/m^3
+
+T = TypeVar('T', float, np.ndarray)
+
+
+def _reduced_temp(temp_C):
+    return np.minimum((np.asarray(temp_C) + 273.15)/T_CRIT, 0.9999)
+
+
+def vapour_pressure_bar(temp_C: T) -> T:
+
+    tr = _reduced_temp(temp_C)
+    x = 1 - tr
+
+    return cast(T, P_CRIT*np.exp((-6.71893*x + 1.35966*x**1.5 - 1.3779*x**2.5 - 4.051*x**5)/tr))
+
+
+def liquid_density(temp_C: T) -> T:
+
+    x = 1 - _reduced_temp(temp_C)
+
+    return cast(T, RHO_CRIT*np.exp(1.72328*x**(1/3) - 0.83950*x**(2/3) + 0.51060*x - 0.10412*x**(4/3)))
+
+
+def vapour_density(temp_C: T) -> T:
+
+    x = 1/_reduced_temp(temp_C) - 1
+
+    return cast(T, RHO_CRIT*np.exp(-1.00900*x**(1/3) - 6.28792*x**(2/3) + 7.50332*x - 7.90463*x**(4/3) + 0.629427*x**(5/3)))
@@ -0,0 +1,301 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from common.cea_tables import make_cea
+from common.constants import G0
+
+# rocketcea cards of the blend components, wt% is filled in per blend. Paraffin
+# and PE wax are the paraffin and polyethylene cards of Hybrid Calculations Using Pressure.py
+COMPONENT_CARDS = {
+    'paraffin': '''
+fuel paraffin   C 32 H 66   wt%={wt}
+h,cal=-224200     t(k)=298.15   rho=.924
+''',
+    'pe_wax': '''
+fuel pe_wax   C 20 H 40   wt%={wt}
+h,cal=-12700     t(k)=298.15   rho=.96
+''',
+    # Taken as its main ester, myricyl palmitate, heat of formation estimated
+    'beeswax': '''
+fuel beeswax   C 46 H 92 O 2   wt%={wt}
+h,cal=-346000     t(k)=298.15   rho=.96
+''',
+}
+
+OX_NAME = 'N20'
+OX_CARD = '''
+oxid N20   N 2 O 1   wt%=100
+h,cal=15500     t(k)=298.15    rho=.793
+'''
+
+PSI = 0.0689476
+FT = 3.28084
+# Universal gas constant, J/(kmol K)
+R_U = 8314.462618
+
+REFERENCE = 'data/L_Nitrous_S_Paraffin.propep'
+# The grid of the reference, 1305 to 55 psi and 2 to 69.4 % fuel
+PRESSURES = np.arange(1305, 54, -50)*PSI
+FUEL_PERCENTAGES = np.linspace(2, 69.407, 27)
+
+# Units of the reference, worked out from its rows: A*M is c*/(Pc (psi)*G0*1000),
+# the density Isp column is Isp*DISP_FACTOR*(propellant mass/fuel mass) and the
+# third value on the Tc line is R_U/(moles of gas per 100 g), i.e. R_U*M/100
+# with M the chamber's mass per mole of gas (CEA's 'M, (1/n)')
+DISP_FACTOR = 2.758e-4
+
+# Bumped whenever write_propep changes what it writes, so older files are regenerated
+FILE_VERSION = 3
+
+PERFORMANCE_COLUMNS = ['isp', 'gamma', 't_throat', 'p_throat', 'cstar', 'eps', 'density_isp', 'a_star_m', 't_exit']
+
+
+@dataclass
+class Blend():
+
+    name: str
+
+    components: dict[str, float]
+    '''
+    Weight fraction of each COMPONENT_CARDS entry, normalised when the card is made
+    '''
+
+    @property
+    def card(self) -> str:
+        total = sum(self.components.values())
+        return ''.join(COMPONENT_CARDS[c].format(wt=f'{100*w/total:.3f}') for c, w in self.components.items())
+
+
+def _performance(cea, pc: float, mr: float, frozen: int) -> list[float]:
+    '''
+    One performance line, expanded to 1 atm: Isp (s), isentropic exponent,
+    throat T (K) and P (bar), c* (m/s), optimum area ratio and exit T (K)
+    '''
+
+    eps = cea.get_eps_at_PcOvPe(Pc=pc, MR=mr, PcOvPe=pc/1.01325, frozen=frozen)
+    isp = cea.get_Isp(Pc=pc, MR=mr, eps=eps, frozen=frozen)
+    _, t_throat, t_exit = cea.get_Temperatures(Pc=pc, MR=mr, eps=eps, frozen=frozen)
+    if frozen:
+        _, gamma = cea.get_Chamber_MolWt_gamma(Pc=pc, MR=mr, eps=eps)
+    else:
+        _, gamma = cea.get_Throat_MolWt_gamma(Pc=pc, MR=mr, eps=eps, frozen=0)
+    cstar = cea.get_Cstar(Pc=pc, MR=mr)
+
+    return [isp, gamma, t_throat, pc/cea.get_Throat_PcOvPe(Pc=pc, MR=mr), cstar, eps, t_exit]
+
+
+def _valid(values: list[float]) -> bool:
+    '''
+    rocketcea gives 0 (or NaN) instead of raising where a point doesn't converge
+    '''
+
+    return all(np.isfinite(v) and v != 0 for v in values)
+
+
+def _chamber_gas_molar_mass(cea, pc: float, mr: float) -> float:
+    '''
+    Mass per mole of gas in the chamber (kg/kmol). get_Chamber_MolWt_gamma
+    gives 1/(all moles), which counts condensed carbon in fuel rich mixtures,
+    CEA's M (1/n) is left in its output arrays by the same call.
+    '''
+
+    from rocketcea.cea_obj import py_cea
+
+    cea.get_Chamber_MolWt_gamma(Pc=pc, MR=mr)
+    return float(py_cea.prtout.wm[cea.cea_obj.i_chm])
+
+
+def _pc_rows(blend: Blend, pc: float, fuel_percentages: np.ndarray) -> tuple[list[list[float] | None], list[bool]]:
+    '''
+    One row per fuel percentage, None where CEA has no shifting equilibrium
+    result. Frozen flow fails to converge at high fuel fractions and high
+    pressure, the frozen line takes the shifting values there. Also returns
+    which rows that happened to.
+    '''
+
+    cea = make_cea(OX_NAME, blend.name, OX_CARD, blend.card)
+
+    rows = list()
+    frozen_failed = list()
+    for fuel in fuel_percentages:
+        mr = (100 - fuel)/fuel
+
+        chamber = [cea.get_Tcomb(Pc=pc, MR=mr), R_U*_chamber_gas_molar_mass(cea, pc, mr)/100]
+        shifting = _performance(cea, pc, mr, 0)
+        if not _valid(chamber + shifting):
+            rows.append(None)
+            frozen_failed.append(False)
+            continue
+
+        frozen = _performance(cea, pc, mr, 1)
+        frozen_failed.append(not _valid(frozen))
+        if frozen_failed[-1]:
+            frozen = shifting
+
+        rows.append(chamber + frozen + shifting)
+
+    return rows, frozen_failed
+
+
+def write_propep(path: str, pressures: np.ndarray, fuel_percentages: np.ndarray, rows: np.ndarray):
+    '''
+    Writes rows (pressure, fuel %, 16 values from _pc_rows) in the layout and
+    units of REFERENCE. Like there, the shifting line's c* is in m/s divided
+    by FT and both lines are given the one (equilibrium) c*.
+    '''
+
+    ox = 100 - fuel_percentages
+
+    lines = [f'PRESSURE_RANGE {len(pressures)} {min(pressures):.4f} {max(pressures):.4f}',
+             f'FUEL_OX_RANGE {len(fuel_percentages)} {min(fuel_percentages):.4f} {max(fuel_percentages):.4f} {min(ox):.4f} {max(ox):.4f}',
+             '',
+             'DATA_START']
+
+    def performance(v, pc, fuel, cstar_scale):
+        isp, gamma, t_throat, p_throat, cstar, eps, t_exit = v
+        density_isp = isp*DISP_FACTOR*100/fuel
+        a_star_m = cstar/(pc/PSI*G0*1000)
+        return (f'{isp:.4f} {gamma:.4f} {t_throat:.4f} {p_throat:.2f} {cstar*cstar_scale:.4f} {eps:.4f} '
+                f'{density_isp:.4f} {a_star_m:.8f} {t_exit:.4f}')
+
+    for pc, block in zip(pressures, rows):
+        lines.append(f'**** {pc:.4f}')
+        for fuel, row in zip(fuel_percentages, block):
+            lines.append(f'{fuel:.4f} {100 - fuel:.4f}')
+            lines.append(f'{row[0]:.4f} {pc:.4f} {row[1]}')
+            lines.append(performance(row[2:9], pc, fuel, 1))
+            lines.append(performance(row[9:16], pc, fuel, 1/FT))
+
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _blend_key(blend: Blend, pressures: np.ndarray, fuel_percentages: np.ndarray) -> str:
+    h = hashlib.sha1()
+    h.update(json.dumps([FILE_VERSION, OX_CARD, blend.card]).encode())
+    for axis in (pressures, fuel_percentages):
+        h.update(np.asarray(axis, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def generate_tables(blends: list[Blend], out_dir: str, pressures: np.ndarray = PRESSURES,
+                    fuel_percentages: np.ndarray = FUEL_PERCENTAGES, processes: int | None = None) -> dict[str, str]:
+    '''
+    Writes out_dir/L_Nitrous_S_<blend name>.propep for every blend, one chamber
+    pressure of one blend per process pool task. A blend is skipped when its
+    file was written from the same cards and grid (recorded in out_dir/blends.json).
+    Returns the path of every blend's file.
+    '''
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = f'{out_dir}/blends.json'
+
+    manifest = dict()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    paths = {b.name: f'{out_dir}/L_Nitrous_S_{b.name}.propep' for b in blends}
+    keys = {b.name: _blend_key(b, pressures, fuel_percentages) for b in blends}
+    stale = [b for b in blends if manifest.get(b.name) != keys[b.name] or not os.path.exists(paths[b.name])]
+
+    tasks = [(b, pc) for b in stale for pc in pressures]
+
+    if processes == 1:
+        results = [_pc_rows(b, pc, fuel_percentages) for b, pc in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_pc_rows, [b for b, _ in tasks], [pc for _, pc in tasks], [fuel_percentages]*len(tasks)))
+
+    for n, blend in enumerate(stale):
+        block = [rows for rows, _ in results[n*len(pressures):(n + 1)*len(pressures)]]
+        frozen_failed = [failed for _, failed in results[n*len(pressures):(n + 1)*len(pressures)]]
+
+        # The file is a full grid, fuel percentages without a result at every pressure are left out
+        keep = [j for j in range(len(fuel_percentages)) if all(r[j] is not None for r in block)]
+        if not keep:
+            raise Exception(f'CEA gave no result for any fuel percentage of blend {blend.name}')
+        if len(keep) < len(fuel_percentages):
+            print(f'{blend.name}: no CEA result at {len(fuel_percentages) - len(keep)} fuel percentages, left out')
+
+        copied = sum(failed[j] for failed in frozen_failed for j in keep)
+        if copied:
+            print(f'{blend.name}: frozen CEA failed at {copied} of {len(keep)*len(pressures)} points, '
+                  'the shifting values are written on their frozen line')
+
+        write_propep(paths[blend.name], pressures, np.asarray(fuel_percentages)[keep],
+                     np.array([[r[j] for j in keep] for r in block]))
+        manifest[blend.name] = keys[blend.name]
+
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=4)
+
+    return paths
+
+
+def read_propep(path: str) -> np.ndarray:
+    '''
+    Rows of a file in the layout of REFERENCE: pressure, fuel %, Tc, R_U*M/100
+    (the third Tc line value), then the frozen and the shifting PERFORMANCE_COLUMNS
+    '''
+
+    with open(path) as f:
+        lines = [l.split() for l in f.read().split('DATA_START')[1].splitlines() if l.strip()]
+
+    rows = list()
+    i = 0
+    while i < len(lines):
+        if lines[i][0] == '****':
+            pc = float(lines[i][1])
+            i += 1
+            continue
+
+        tc = lines[i + 1]
+        rows.append([pc, float(lines[i][0]), float(tc[0]), float(tc[2])]
+                    + [float(v) for v in lines[i + 2]] + [float(v) for v in lines[i + 3]])
+        i += 4
+
+    return np.array(rows)
+
+
+def compare_to_reference(reference: str = REFERENCE, tolerance=0.2, processes: int | None = None) -> dict[str, float]:
+    '''
+    Regenerates pure paraffin on the grid of reference and raises if the median
+    ratio of any column to the reference is off by more than tolerance. PROPEP
+    and CEA differ by up to ~10 % in Tc for the same cards, so this catches
+    unit and layout mistakes rather than checking the thermochemistry.
+    Returns the median ratio of every column.
+    '''
+
+    expected = read_propep(reference)
+    pressures = np.unique(expected[:, 0])[::-1]
+    fuel_percentages = np.unique(expected[:, 1])
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = generate_tables([Blend('paraffin', {'paraffin': 1.0})], out_dir, pressures, fuel_percentages,
+                               processes)['paraffin']
+        actual = read_propep(path)
+
+    # Rows left out of the generated file for lack of a CEA result are skipped
+    index = {(pc, fuel): n for n, (pc, fuel) in enumerate(expected[:, :2])}
+    expected = expected[[index[(pc, fuel)] for pc, fuel in actual[:, :2]]]
+
+    names = (['tc', 'r_m'] + [f'frozen_{c}' for c in PERFORMANCE_COLUMNS] + [f'shifting_{c}' for c in PERFORMANCE_COLUMNS])
+    columns = list(range(2, 4 + 2*len(PERFORMANCE_COLUMNS)))
+
+    ratios = dict()
+    for name, c in zip(names, columns):
+        valid = expected[:, c] != 0
+        ratios[name] = float(np.median(actual[valid, c]/expected[valid, c]))
+
+    off = {name: ratio for name, ratio in ratios.items() if abs(ratio - 1) > tolerance}
+    if off:
+        raise Exception(f'Generated paraffin table differs from {reference}, median ratios: {off}')
+
+    return ratios
@@ -0,0 +1,137 @@
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_KEY = '__manifest__'
+
+
+def _parse(path: str) -> pd.DataFrame:
+    from nitrous_engine_sim.propep_3_parser import import_simulation_results
+
+    return import_simulation_results(path, 0)
+
+
+def _save_columns(path: str, df: pd.DataFrame, manifest: dict):
+    '''
+    One array per column in an npz. Object columns are stored as strings with
+    a mask of their missing values, so loading never needs pickle.
+    '''
+
+    columns = dict()
+    nulls = list()
+    for c in df.columns:
+        values = df[c].to_numpy()
+        if values.dtype == object:
+            missing = pd.isna(values)
+            columns[str(c)] = np.where(missing, '', values).astype(str)
+            columns[f'__null__{c}'] = missing
+            nulls.append(str(c))
+        else:
+            columns[str(c)] = values
+
+    manifest = dict(manifest, columns=[str(c) for c in df.columns], nulls=nulls,
+                    dtypes={str(c): str(df[c].dtype) for c in df.columns})
+
+    tmp = f'{path}.tmp.npz'
+    np.savez(tmp, **columns, **{MANIFEST_KEY: np.array(json.dumps(manifest))})
+    os.replace(tmp, path)
+
+
+def _load_columns(path: str) -> tuple[pd.DataFrame, dict]:
+    with np.load(path) as f:
+        manifest = json.loads(str(f[MANIFEST_KEY]))
+
+        columns = dict()
+        for c in manifest['columns']:
+            values = f[c]
+            if c in manifest.get('nulls', []):
+                values = values.astype(object)
+                values[f[f'__null__{c}']] = np.nan
+            columns[c] = values
+
+    df = pd.DataFrame(columns).astype(manifest.get('dtypes', {}))
+    return df, manifest
+
+
+def check_cache_roundtrip(df: pd.DataFrame, cache_file: str):
+    '''
+    Raises if loading cache_file doesn't give back exactly df
+    '''
+
+    cached, _ = _load_columns(cache_file)
+    if not cached.equals(df):
+        differing = [c for c in df.columns if c not in cached.columns or not cached[c].equals(df[c])]
+        raise Exception(f'Cache {cache_file} does not reproduce its parse, columns differ: {differing}')
+
+
+def _file_key(path: str) -> dict:
+    stat = os.stat(path)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def _parse_cached(path: str, cache_file: str) -> pd.DataFrame:
+    '''
+    Parse of one PROPEP file, from its cache entry if path and mtime still match.
+    A fresh parse is checked against its cache entry once written.
+    '''
+
+    key = dict(_file_key(path), path=os.path.abspath(path))
+
+    if os.path.exists(cache_file):
+        df, manifest = _load_columns(cache_file)
+        if manifest.get('key') == key:
+            return df
+
+    df = _parse(path).reset_index(drop=True)
+    _save_columns(cache_file, df, {'key': key})
+    check_cache_roundtrip(df, cache_file)
+
+    return df
+
+
+def ingest_propep(run_dir: str, cache_dir: str, processes: int | None = None) -> pd.DataFrame:
+    '''
+    Parses every PROPEP output file in run_dir into one table, as if each
+    file were imported with import_simulation_results and concatenated in
+    file name order.
+
+    Each file's parse is cached in cache_dir keyed by path and mtime, only
+    new or changed files are parsed, in a process pool. The consolidated
+    table is written as a columnar npz next to them. When nothing changed it
+    is loaded straight from there.
+    '''
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    files = sorted(f for f in os.listdir(run_dir) if os.path.isfile(f'{run_dir}/{f}'))
+    keys = {f: _file_key(f'{run_dir}/{f}') for f in files}
+
+    consolidated = f'{cache_dir}/consolidated.npz'
+    if os.path.exists(consolidated):
+        df, manifest = _load_columns(consolidated)
+        if manifest.get('files') == keys:
+            return df
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_parse_cached, f'{run_dir}/{f}', f'{cache_dir}/{f}.npz') for f in files]
+        parsed = [future.result() for future in futures]
+
+    # Run ids continue from file to file, like passing start_index to the parser
+    dfs = list()
+    start_index = 0
+    for df in parsed:
+        df = df.copy()
+        if 'run_id' in df.columns:
+            df['run_id'] = df['run_id'] + start_index
+        df.index = pd.RangeIndex(start_index, start_index + len(df))
+        start_index += len(df)
+        dfs.append(df)
+
+    propep_data = (pd.concat(dfs) if dfs else pd.DataFrame()).reset_index(drop=True)
+    _save_columns(consolidated, propep_data, {'files': keys})
+    check_cache_roundtrip(propep_data, consolidated)
+
+    return propep_data
@@ -0,0 +1,237 @@
+from dataclasses import asdict, dataclass
+import json
+
+import numpy as np
+
+# (oxidizer mass flux (kg/(m^2 s)), regression rate (m/s)) measurements
+DATASETS = {
+    # Lin-lin liu et. al., their fit: a=0.0876 n=0.3953 (mm/s)
+    'lin_lin_liu': np.array([
+        [91, 0.00045],
+        [96.22, 0.00054],
+        [138.56, 0.00056],
+        [171.72, 0.00059],
+        [241.74, 0.00078],
+    ]),
+    'stanford': np.array([
+        [100, 0.00219],
+        [100, 0.00253],
+        [104, 0.00215],
+        [150, 0.00289],
+        [194, 0.00295],
+        [198, 0.00246],
+    ]),
+}
+
+
+@dataclass
+class RegressionLaw():
+    '''
+    rdot = a*G_ox**n (m/s, G_ox in kg/(m^2 s)), as set on Cengines by
+    regression_a and regression_n
+    '''
+
+    a: float
+
+    n: float
+
+    a_ci: tuple[float, float] | None = None
+    '''
+    Bootstrap confidence interval of a, None for published laws
+    '''
+
+    n_ci: tuple[float, float] | None = None
+
+    cov: list[list[float]] | None = None
+    '''
+    Bootstrap covariance of (ln a, n). Taken in ln a as the bootstrap spread
+    of a is far from normal, the samples themselves are kept by save_samples.
+    '''
+
+    points: int = 0
+
+    source: str = 'published'
+
+    def rate(self, G) -> np.ndarray:
+        return self.a*np.asarray(G, dtype=float)**self.n
+
+    def apply(self, engine):
+        engine.regression_a = self.a
+        engine.regression_n = self.n
+        engine.regression_m = 0
+
+
+# Laws used in the r2s_2026 scripts without data behind them in this repo
+PUBLISHED_LAWS = {
+    'shani_sisi': RegressionLaw(0.000104, 0.67),
+    'stanford_claimed': RegressionLaw(0.000155, 0.5),
+    # 'stanford_c calculated' of r2s_2026_paraffin.py and r2s_2026_optimize_charge_len.py
+    'stanford_c_calculated': RegressionLaw(0.00021, 0.5),
+    'lin_lin_liu_own_fit': RegressionLaw(0.0000548, 0.47692),
+    'f3_paraffin_pe_wax_90_10': RegressionLaw(0.0003526, 0.537),
+    'f5_paraffin_pe_wax_80_20': RegressionLaw(0.000299, 0.551),
+    'b70_beeswax': RegressionLaw(0.000096, 0.54),
+    # 'Magic Paraffin + PE wax combination' of r2s_2026_paraffin.py
+    'magic_paraffin_pe_wax': RegressionLaw(0.00015, 0.65),
+    'polyethylene': RegressionLaw(0.000116, 0.331),
+}
+
+
+def hotfire_point(ox_mass_flow: float, burn_time: float, initial_port_radius: float, final_port_radius: float) -> tuple[float, float]:
+    '''
+    Burn averaged (G_ox, rdot) of a single port test, G_ox at the mean port radius
+    '''
+
+    mean_radius = (initial_port_radius + final_port_radius)/2
+    return ox_mass_flow/(np.pi*mean_radius**2), (final_port_radius - initial_port_radius)/burn_time
+
+
+def fit_power_laws(G: np.ndarray, r: np.ndarray, weights: np.ndarray, n: float | None = None, iterations=30) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Least squares fits of r = a*G**n (the objective of curve_fit) for every
+    row of weights at once. G, r and weights are (fits, points), weights are
+    resample counts with 0 for padding. Returns a and n per fit, NaN where the
+    points can't determine the law.
+    '''
+
+    x = np.log(G)
+    y = np.log(r)
+
+    if n is not None:
+        m = G**n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a = np.sum(weights*r*m, axis=1)/np.sum(weights*m*m, axis=1)
+        return a, np.full(len(a), float(n))
+
+    def solve(s0, s1, s2, b0, b1):
+        det = s0*s2 - s1*s1
+        ok = det > 1e-12*np.maximum(s0*s2, 1e-300)
+        det = np.where(ok, det, 1.0)
+        return np.where(ok, (s2*b0 - s1*b1)/det, np.nan), np.where(ok, (s0*b1 - s1*b0)/det, np.nan)
+
+    # Straight line in log space to start from, then Gauss-Newton on (log a, n)
+    w = weights
+    log_a, b = solve(w.sum(axis=1), (w*x).sum(axis=1), (w*x*x).sum(axis=1), (w*y).sum(axis=1), (w*x*y).sum(axis=1))
+
+    for _ in range(iterations):
+        m = np.exp(log_a[:, None] + b[:, None]*x)
+        res = r - m
+        wm2 = w*m*m
+        d0, d1 = solve(wm2.sum(axis=1), (wm2*x).sum(axis=1), (wm2*x*x).sum(axis=1),
+                       (w*m*res).sum(axis=1), (w*m*x*res).sum(axis=1))
+        log_a, b = log_a + d0, b + d1
+
+    return np.exp(log_a), b
+
+
+def _padded(datasets: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+
+    size = max(len(d) for d in datasets.values())
+    G = np.ones((len(datasets), size))
+    r = np.ones((len(datasets), size))
+    mask = np.zeros((len(datasets), size))
+
+    for i, d in enumerate(datasets.values()):
+        G[i, :len(d)], r[i, :len(d)], mask[i, :len(d)] = d[:, 0], d[:, 1], 1
+
+    return G, r, mask
+
+
+def fit_laws(datasets: dict[str, np.ndarray] = DATASETS, n: float | None = None, resamples=5000, level=0.95,
+             seed=0) -> tuple[dict[str, RegressionLaw], dict[str, np.ndarray]]:
+    '''
+    Fits every dataset, with n fixed if given, and bootstraps each fit with
+    resamples resamples of its points, all solved as one batch. Returns the
+    laws and the bootstrap (a, n) samples of each, (resamples, 2), for rate_band.
+    '''
+
+    rng = np.random.default_rng(seed)
+    G, r, mask = _padded(datasets)
+    D, size = G.shape
+
+    weights = np.zeros((D, resamples + 1, size))
+    weights[:, 0] = mask
+    for i, d in enumerate(datasets.values()):
+        weights[i, 1:, :len(d)] = rng.multinomial(len(d), np.full(len(d), 1/len(d)), resamples)
+
+    a, b = fit_power_laws(np.repeat(G, resamples + 1, axis=0), np.repeat(r, resamples + 1, axis=0),
+                          weights.reshape(-1, size), n)
+    a, b = a.reshape(D, -1), b.reshape(D, -1)
+
+    q = [(1 - level)/2*100, (1 + level)/2*100]
+    laws = dict()
+    samples = dict()
+
+    for i, (name, d) in enumerate(datasets.items()):
+        s = np.stack([a[i, 1:], b[i, 1:]], axis=1)
+        s = s[np.isfinite(s).all(axis=1)]
+        samples[name] = s
+
+        a_ci = tuple(float(v) for v in np.percentile(s[:, 0], q))
+        n_ci = tuple(float(v) for v in np.percentile(s[:, 1], q)) if n is None else None
+        log_a = np.log(s[:, 0])
+        cov = np.cov(log_a, s[:, 1]) if n is None else np.array([[np.var(log_a, ddof=1), 0.0], [0.0, 0.0]])
+
+        laws[name] = RegressionLaw(float(a[i, 0]), float(b[i, 0]), a_ci, n_ci, cov.tolist(), len(d),
+                                   'fit' if n is None else f'fit n={n}')
+
+    return laws, samples
+
+
+def rate_band(samples: np.ndarray, G: np.ndarray, level=0.95) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Pointwise (low, high) regression rate over G from bootstrap (a, n) samples
+    '''
+
+    G = np.asarray(G, dtype=float)
+    rates = samples[:, 0, None]*G[None, :]**samples[:, 1, None]
+    low, high = np.percentile(rates, [(1 - level)/2*100, (1 + level)/2*100], axis=0)
+    return low, high
+
+
+def save_laws(path: str, laws: dict[str, RegressionLaw]):
+    with open(path, 'w') as f:
+        json.dump({name: asdict(law) for name, law in laws.items()}, f, indent=4)
+
+
+def load_laws(path: str) -> dict[str, RegressionLaw]:
+    with open(path) as f:
+        table = json.load(f)
+
+    laws = dict()
+    for name, values in table.items():
+        for ci in ('a_ci', 'n_ci'):
+            if values[ci] is not None:
+                values[ci] = tuple(values[ci])
+        laws[name] = RegressionLaw(**values)
+
+    return laws
+
+
+def save_samples(path: str, samples: dict[str, np.ndarray]):
+    '''
+    Bootstrap (a, n) samples of every fitted law, by the name of its law in the table
+    '''
+
+    np.savez_compressed(path, **samples)
+
+
+def load_samples(path: str, name: str) -> np.ndarray | None:
+    '''
+    The (resamples, 2) bootstrap (a, n) samples saved for law name, None for
+    laws without any (published laws)
+    '''
+
+    with np.load(path) as samples:
+        return samples[name] if name in samples.files else None
+
+
+def load_law(path: str, name: str) -> RegressionLaw:
+    '''
+    One law of a table written by save_laws, e.g. load_law(LAWS, 'stanford').apply(engine)
+    '''
+
+    laws = load_laws(path)
+    if name not in laws:
+        raise Exception(f'No regression law {name} in {path}, have {", ".join(laws)}')
+    return laws[name]
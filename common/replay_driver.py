@@ -0,0 +1,112 @@
+from typing import Callable
+
+import numpy as np
+
+import nitrous_engine_sim
+from nitrous_engine_sim.result_helper import get_running_results
+
+from common.engine_harness import BurnResult, MAX_ITERATIONS
+
+
+def replay_grid(duration: float, dt: float) -> np.ndarray:
+    '''
+    Burn times k*dt of every simulation step starting before duration
+    '''
+
+    return np.arange(int(np.ceil(duration/dt - 1e-9)))*dt
+
+
+class ReplayDriver():
+    '''
+    Drives an engine with measured boundary conditions at a fixed time step.
+    Every boundary condition is interpolated onto the simulation grid once,
+    stepping then only sets plain Python floats on the engine by step index.
+
+    boundary maps engine attribute names to (time, values) of the measurement,
+    time starting at 0 with the burn. Several attributes can share one series.
+    '''
+
+    def __init__(self, boundary: dict[str, tuple[np.ndarray, np.ndarray]], dt: float, duration: float | None = None):
+
+        self.dt = dt
+
+        if duration is None:
+            duration = min(float(np.max(t)) for t, _ in boundary.values())
+
+        self.time = replay_grid(duration, dt)
+
+        # Python lists, indexing them is much cheaper than indexing numpy scalars out of an array
+        self.values: dict[str, list[float]] = {
+            name: np.interp(self.time, t, v).tolist() for name, (t, v) in boundary.items()
+        }
+
+    def __len__(self):
+        return len(self.time)
+
+    def run(self, engine, on_result: Callable[[dict, int], None] | None = None, max_iterations=MAX_ITERATIONS, result_period=1, report_faults=True) -> BurnResult:
+        '''
+        Steps a prepared engine (burn time 0) over the replay grid, or until
+        max_iterations. Result rows are passed to on_result(row, step index)
+        if given, e.g. to add columns and stream them to a trace, otherwise
+        they are collected in the returned BurnResult.
+        '''
+
+        res = BurnResult()
+        last_fault = 0
+
+        dt = self.dt
+        engine.delta_time = dt
+        inputs = list(self.values.items())
+
+        steps = min(len(self.time), max_iterations)
+
+        for i in range(steps):
+
+            for name, values in inputs:
+                setattr(engine, name, values[i])
+
+            engine.simulate_engine()
+
+            thrust = engine.thrust
+            res.total_impulse += thrust*dt
+            res.total_thrust += thrust
+
+            if i % result_period == 0:
+                rr = get_running_results(engine)
+                if on_result is not None:
+                    on_result(rr, i)
+                else:
+                    res.results.append(rr)
+
+            if report_faults and engine._fault != last_fault:
+                if engine._fault > 0:
+                    print(f'New engine fault at {engine.burn_time:.3f}s: {nitrous_engine_sim.get_error_msg(engine._fault)}')
+                else:
+                    print(f'All faults cleared at {engine.burn_time:.3f}s')
+                last_fault = engine._fault
+
+        res.iterations = steps
+
+        return res
+
+
+def pressure_replay(time: np.ndarray, tank_pressure: np.ndarray, tank_temp: np.ndarray, density: tuple[np.ndarray, np.ndarray], dt: float) -> ReplayDriver:
+    '''
+    Replay driven by the measured tank pressure (bar) and temperature (C), with
+    the nitrous density given as a (time, density) curve for both phases
+    '''
+
+    return ReplayDriver({
+        'ox_tank_pressure_bar': (time, tank_pressure),
+        'ox_initial_temp_C': (time, tank_temp),
+        'ox_tank_vapour_density': density,
+        'ox_tank_liquid_density': density,
+    }, dt, duration=float(np.max(time)))
+
+
+def mdot_replay(time: np.ndarray, ox_mdot: np.ndarray, dt: float) -> ReplayDriver:
+    '''
+    Replay driven by the measured oxidizer mass flow (kg/s)
+    '''
+
+    return ReplayDriver({'ox_mdot_tank_outflow': (time, ox_mdot)}, dt)
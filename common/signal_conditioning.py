@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import numpy as np
+import scipy.signal
+
+CHUNK_SAMPLES = 1 << 16
+
+
+def fir_lowpass(sample_rate: float, cutoff: float, numtaps=101) -> np.ndarray:
+    '''
+    Symmetric (linear phase) low-pass FIR, cutoff in Hz
+    '''
+    return scipy.signal.firwin(numtaps | 1, cutoff, fs=sample_rate)
+
+
+def savgol(window: int, polyorder=3) -> np.ndarray:
+    '''
+    Savitzky-Golay smoothing kernel, window in samples
+    '''
+    return scipy.signal.savgol_coeffs(window | 1, polyorder, use='conv')
+
+
+def zero_phase_chunks(read: Callable[[int, int], np.ndarray], n: int, taps: np.ndarray, chunk=CHUNK_SAMPLES) -> Iterator[tuple[int, np.ndarray]]:
+    '''
+    Applies a symmetric FIR centred on each sample (so without phase shift) to
+    a signal of n samples that is read piece by piece with read(start, end).
+    Each chunk is read with half a filter length of overlap either side, so
+    the output is identical to filtering the whole signal at once. The signal
+    is extended with its edge values at the very start and end.
+
+    Yields (start index, filtered chunk).
+    '''
+
+    if len(taps) % 2 == 0:
+        raise Exception('Zero phase filtering needs an odd number of taps')
+
+    halo = len(taps)//2
+
+    for start in range(0, n, chunk):
+
+        end = min(start + chunk, n)
+        read_start = max(start - halo, 0)
+        read_end = min(end + halo, n)
+
+        x = np.asarray(read(read_start, read_end), dtype=float)
+        x = np.pad(x, (halo - (start - read_start), halo - (read_end - end)), mode='edge')
+
+        yield start, np.convolve(x, taps, mode='valid')
+
+
+def zero_phase_filter(x: np.ndarray, taps: np.ndarray, chunk=CHUNK_SAMPLES, out: np.ndarray | None = None) -> np.ndarray:
+    '''
+    zero_phase_chunks over an array (or memmap), written into out (e.g. an output memmap) if given
+    '''
+
+    out = np.empty(len(x)) if out is None else out
+
+    for start, y in zero_phase_chunks(lambda a, b: x[a:b], len(x), taps, chunk):
+        out[start:start + len(y)] = y
+
+    return out
+
+
+def _window_median(time: np.ndarray, read: Callable[[int, int], np.ndarray], window: tuple[float, float]) -> float:
+
+    start, end = np.searchsorted(time, window, side='right')
+    if end <= start:
+        raise Exception(f'No samples between {window[0]}s and {window[1]}s to tare on')
+
+    return float(np.median(read(start, end)))
+
+
+def estimate_tare(time: np.ndarray, x: np.ndarray, t_start: float, t_end: float) -> float:
+    '''
+    Median of x between t_start and t_end, e.g. a window before the fire
+    '''
+    return _window_median(time, lambda a, b: x[a:b], (t_start, t_end))
+
+
+@dataclass
+class Conditioning():
+    '''
+    Signal conditioning of one hotfire channel, applied as
+    tare -> drift removal -> zero phase filter -> clipping.
+    '''
+
+    tare_window: tuple[float, float] | None = None
+    '''
+    (start, end) time of a quiet window before the fire to zero the channel on
+    '''
+
+    drift_window: tuple[float, float] | None = None
+    '''
+    (start, end) time of a quiet window after the burn. With a tare window the
+    offset is interpolated linearly between the two, removing sensor drift.
+    '''
+
+    taps: np.ndarray | None = None
+    '''
+    Symmetric FIR kernel (fir_lowpass or savgol), None to leave the signal unfiltered
+    '''
+
+    clip_min: float | None = None
+
+    clip_max: float | None = None
+
+    def apply(self, time: np.ndarray, read: Callable[[int, int], np.ndarray], n: int, chunk=CHUNK_SAMPLES, out: np.ndarray | None = None) -> np.ndarray:
+        '''
+        Conditions n samples that are read chunk by chunk with read(start, end),
+        time has to cover all n samples. The result goes into out if given,
+        so long recordings can be processed into a memmap.
+        '''
+
+        if self.drift_window is not None and self.tare_window is None:
+            raise Exception('A drift window needs a tare window to interpolate the offset from')
+
+        out = np.empty(n) if out is None else out
+
+        tare_time, tare = 0.0, 0.0
+        drift = 0.0
+
+        if self.tare_window is not None:
+            tare = _window_median(time, read, self.tare_window)
+            tare_time = (self.tare_window[0] + self.tare_window[1])/2
+
+            if self.drift_window is not None:
+                post = _window_median(time, read, self.drift_window)
+                drift = (post - tare)/((self.drift_window[0] + self.drift_window[1])/2 - tare_time)
+
+        def read_zeroed(a: int, b: int) -> np.ndarray:
+            return np.asarray(read(a, b), dtype=float) - tare - drift*(time[a:b] - tare_time)
+
+        if self.taps is not None:
+            chunks = zero_phase_chunks(read_zeroed, n, self.taps, chunk)
+        else:
+            chunks = ((s, read_zeroed(s, min(s + chunk, n))) for s in range(0, n, chunk))
+
+        for start, y in chunks:
+            if self.clip_min is not None or self.clip_max is not None:
+                y = np.clip(y, self.clip_min, self.clip_max)
+            out[start:start + len(y)] = y
+
+        return out
+
+    def apply_channel(self, dataset, name: str, t_start: float | None = None, t_end: float | None = None,
+                      chunk=CHUNK_SAMPLES) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Conditions a channel of a HotfireDataset / ColumnarHotfire on its own
+        time base and returns (time, values) of its samples between t_start
+        and t_end (the whole channel by default). The whole channel is
+        conditioned so the tare and drift windows can lie outside the range.
+        '''
+
+        time = dataset.own_time(name)
+        values = self.apply(time, lambda a, b: dataset.samples(name, a, b), len(time), chunk)
+
+        start = 0 if t_start is None else int(np.searchsorted(time, t_start, side='right'))
+        end = len(time) if t_end is None else int(np.searchsorted(time, t_end, side='right'))
+
+        return time[start:end], values[start:end]
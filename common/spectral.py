@@ -0,0 +1,207 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import numpy as np
+import scipy.signal
+
+from common.hotfire_dataset import HotfireDataset
+
+SEGMENTS_PER_READ = 256
+
+# Channels screened for combustion oscillations
+INSTABILITY_CHANNELS = ['R2S_PT_1', 'THRUST_STAND_LC1_CALIBRATED']
+
+
+@dataclass
+class Spectrum():
+    '''
+    One sided power spectral density (units²/Hz)
+    '''
+
+    freqs: np.ndarray
+
+    psd: np.ndarray
+
+    segments: int = 0
+
+
+def _segment_batches(read: Callable[[int, int], np.ndarray], n: int, nperseg: int, step: int, batch=SEGMENTS_PER_READ) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    '''
+    Yields (segment start indices, (segments, nperseg) array) for every batch
+    of segments of a signal read with read(start, end). Only one batch is in
+    memory at a time, consecutive reads overlap by nperseg - step samples.
+    '''
+
+    starts = np.arange(0, n - nperseg + 1, step)
+
+    for i in range(0, len(starts), batch):
+        s = starts[i:i + batch]
+        x = np.asarray(read(int(s[0]), int(s[-1]) + nperseg), dtype=float)
+        yield s, np.lib.stride_tricks.sliding_window_view(x, nperseg)[::step]
+
+
+class _Periodogram():
+
+    def __init__(self, sample_rate: float, nperseg: int, window='hann', detrend='constant'):
+        self.detrend = detrend
+        self.window = scipy.signal.get_window(window, nperseg)
+        self.freqs = np.fft.rfftfreq(nperseg, 1/sample_rate)
+
+        # Density scaling as scipy.signal.welch, one sided
+        self.scale = np.full(len(self.freqs), 2/(sample_rate*np.sum(self.window**2)))
+        self.scale[0] /= 2
+        if nperseg % 2 == 0:
+            self.scale[-1] /= 2
+
+    def __call__(self, segments: np.ndarray) -> np.ndarray:
+        segments = scipy.signal.detrend(segments, axis=1, type=self.detrend)
+        return np.abs(np.fft.rfft(segments*self.window, axis=1))**2*self.scale
+
+
+def welch(read: Callable[[int, int], np.ndarray], n: int, sample_rate: float, nperseg=256, overlap=0.5, window='hann', detrend='constant') -> Spectrum:
+    '''
+    Welch PSD of n samples read chunk by chunk with read(start, end), same
+    result as scipy.signal.welch (density scaling, detrend 'constant' or
+    'linear') but with memory independent of the signal length.
+    '''
+
+    nperseg = min(nperseg, n)
+    step = max(int(nperseg*(1 - overlap)), 1)
+    periodogram = _Periodogram(sample_rate, nperseg, window, detrend)
+
+    total = np.zeros(len(periodogram.freqs))
+    count = 0
+
+    for _, segments in _segment_batches(read, n, nperseg, step):
+        total += periodogram(segments).sum(axis=0)
+        count += len(segments)
+
+    return Spectrum(periodogram.freqs, total/max(count, 1), count)
+
+
+def spectrogram(read: Callable[[int, int], np.ndarray], n: int, sample_rate: float, nperseg=256, overlap=0.5, window='hann', detrend='constant') -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    '''
+    Short time FFT of n samples read chunk by chunk, yields
+    (segment centre sample indices, frequencies, (segments, frequencies) PSD)
+    per batch of segments so a whole recording never has to be held.
+    '''
+
+    nperseg = min(nperseg, n)
+    step = max(int(nperseg*(1 - overlap)), 1)
+    periodogram = _Periodogram(sample_rate, nperseg, window, detrend)
+
+    for starts, segments in _segment_batches(read, n, nperseg, step):
+        yield starts + nperseg//2, periodogram.freqs, periodogram(segments)
+
+
+def band(freqs: np.ndarray, f_min: float, f_max: float) -> np.ndarray:
+    return (freqs >= f_min) & (freqs <= f_max)
+
+
+def spectral_peaks(spectrum: Spectrum, f_min=1.0, f_max=np.inf, count=3, prominence=3.0) -> list[tuple[float, float]]:
+    '''
+    Up to count (frequency, PSD) peaks between f_min and f_max that stand
+    out by prominence times the median PSD of that band, strongest first
+    '''
+
+    mask = band(spectrum.freqs, f_min, f_max)
+    freqs, psd = spectrum.freqs[mask], spectrum.psd[mask]
+    if len(psd) < 3:
+        return list()
+
+    peaks, props = scipy.signal.find_peaks(psd, prominence=prominence*np.median(psd))
+    order = np.argsort(props['prominences'])[::-1][:count]
+
+    return [(float(freqs[peaks[i]]), float(psd[peaks[i]])) for i in order]
+
+
+def dominant_frequency(freqs: np.ndarray, power: np.ndarray, f_min=1.0, f_max=np.inf) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Frequency of the largest PSD bin between f_min and f_max in every row of
+    a spectrogram, and how far it stands out over the median of that band.
+    Only a local maximum inside the band counts as a peak: where the band's
+    largest bin is at its edge (leakage from below f_min or above f_max) the
+    frequency is NaN and the ratio 0.
+    '''
+
+    mask = band(freqs, f_min, f_max)
+    power = power[:, mask]
+    i = np.argmax(power, axis=1)
+    peak = power[np.arange(len(power)), i]
+    floor = np.median(power, axis=1)
+
+    interior = (i > 0) & (i < power.shape[1] - 1)
+    ratio = np.divide(peak, floor, out=np.full(len(peak), np.inf), where=floor > 0)
+
+    return np.where(interior, freqs[mask][i], np.nan), np.where(interior, ratio, 0.0)
+
+
+def channel_spectral_metrics(dataset, name: str, t_start: float, t_end: float, segment_time=1.0, f_min=2.0, f_max=np.inf) -> dict:
+    '''
+    Oscillation summary of one channel between t_start and t_end: the dominant
+    peak of its Welch PSD, the RMS in the band and the strongest peak over
+    the windows of a short time FFT (segment_time long, half overlapping).
+    Segments are linearly detrended so the start up and tail off ramps
+    don't show up as low frequency content.
+    '''
+
+    time = dataset.own_time(name)
+    start, end = np.searchsorted(time, [t_start, t_end], side='right')
+    sample_rate = 1/np.median(np.diff(time[:min(len(time), 1000)]))
+    nperseg = max(int(segment_time*sample_rate), 8)
+
+    def read(a: int, b: int) -> np.ndarray:
+        return dataset.samples(name, start + a, start + b)
+
+    n = end - start
+    row = dict()
+    if n < nperseg:
+        return row
+
+    spectrum = welch(read, n, sample_rate, nperseg, detrend='linear')
+    mask = band(spectrum.freqs, f_min, f_max)
+    peaks = spectral_peaks(spectrum, f_min, f_max)
+
+    row[f'{name}_peak_freq'] = peaks[0][0] if peaks else np.nan
+    row[f'{name}_peak_psd'] = peaks[0][1] if peaks else np.nan
+    row[f'{name}_band_rms'] = float(np.sqrt(np.sum(spectrum.psd[mask])*(spectrum.freqs[1] - spectrum.freqs[0])))
+
+    window_freq, window_ratio, window_time = np.nan, 0.0, np.nan
+    for centres, freqs, power in spectrogram(read, n, sample_rate, nperseg, detrend='linear'):
+        f, ratio = dominant_frequency(freqs, power, f_min, f_max)
+        i = np.argmax(ratio)
+        if ratio[i] > window_ratio:
+            window_freq, window_ratio, window_time = float(f[i]), float(ratio[i]), float(time[start + centres[i]])
+
+    row[f'{name}_window_peak_freq'] = window_freq
+    row[f'{name}_window_peak_ratio'] = window_ratio
+    row[f'{name}_window_peak_time'] = window_time
+
+    return row
+
+
+def spectral_metrics(dataset, t_start: float, t_end: float, channels: list[str] | None = None, **kwargs) -> dict:
+    '''
+    channel_spectral_metrics for every channel (default the combustion instability channels)
+    '''
+
+    row = dict()
+    for name in (channels if channels is not None else INSTABILITY_CHANNELS):
+        row.update(channel_spectral_metrics(dataset, name, t_start, t_end, **kwargs))
+    return row
+
+
+def _file_spectral_metrics(path: str, t_start: float, t_end: float, channels: list[str] | None, kwargs: dict) -> dict:
+    with HotfireDataset(path, check_time_base=False) as dataset:
+        return spectral_metrics(dataset, t_start, t_end, channels, **kwargs)
+
+
+def screen_files(paths: list[str], t_start: float, t_end: float, channels: list[str] | None = None, processes: int | None = None, **kwargs) -> dict[str, dict]:
+    '''
+    spectral_metrics over the same time window of many hotfire files, in a process pool
+    '''
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {p: pool.submit(_file_spectral_metrics, p, t_start, t_end, channels, kwargs) for p in paths}
+        return {p: f.result() for p, f in futures.items()}
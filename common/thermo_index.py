@@ -0,0 +1,167 @@
+from dataclasses import dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class ThermoColumns():
+    '''
+    Where each quantity lives in a parsed PROPEP table (import_simulation_results
+    followed by add_nes_units). Fields set to None are left out of the index,
+    every other column has to be in the table.
+    '''
+
+    pc: str = 'P_CHAMBER_BAR'
+
+    ox: str = 'ox_percentage'
+    '''
+    O/F is ox/fuel of the ingredient weight percentages
+    '''
+
+    fuel: str = 'fuel_percentage'
+
+    frozen_isp: str | None = 'FROZEN_IMPULSE'
+    '''
+    IMPULSE of the first (frozen) performance line
+    '''
+
+    shifting_isp: str | None = 'SHIFTING_IMPULSE'
+    '''
+    IMPULSE of the second (shifting) performance line
+    '''
+
+    tc: str | None = 'T_CHAMBER_K'
+
+    gamma: str | None = 'CP_CV_CHAMBER'
+    '''
+    CP/CV of the chamber results
+    '''
+
+    mw: str | None = 'MOLECULAR_WEIGHT_CHAMBER'
+    '''
+    Molecular weight of the mixture in the chamber
+    '''
+
+    @property
+    def quantities(self) -> dict[str, str]:
+        return {f.name: getattr(self, f.name) for f in fields(self)
+                if f.name not in ('pc', 'ox', 'fuel') and getattr(self, f.name) is not None}
+
+
+def _fill_line(values: np.ndarray, axis: np.ndarray, max_gap: int):
+    '''
+    Linearly fills runs of at most max_gap NaNs with valid points on both sides, in place
+    '''
+
+    valid = np.flatnonzero(~np.isnan(values))
+    for a, b in zip(valid[:-1], valid[1:]):
+        if 1 < b - a <= max_gap + 1:
+            values[a + 1:b] = np.interp(axis[a + 1:b], axis[[a, b]], values[[a, b]])
+
+
+class ThermoIndex():
+    '''
+    PROPEP results on a regular (chamber pressure (bar), O/F) grid, one
+    array per quantity (see ThermoColumns), interpolated bilinearly. Queries
+    outside the grid are clamped to its edges, cells PROPEP gave no result for
+    come back as NaN.
+    '''
+
+    def __init__(self, pc: np.ndarray, of: np.ndarray, data: dict[str, np.ndarray]):
+        self.pc = np.asarray(pc, dtype=float)
+        self.of = np.asarray(of, dtype=float)
+        self.data = {k: np.asarray(v, dtype=float) for k, v in data.items()}
+
+    @property
+    def fields(self) -> list[str]:
+        return list(self.data)
+
+    @classmethod
+    def from_frame(cls, propep_data: pd.DataFrame, columns: ThermoColumns | None = None, max_gap=2,
+                   pc_decimals=3, of_decimals=3) -> 'ThermoIndex':
+        '''
+        Grid axes are the distinct chamber pressures and O/F ratios of the
+        runs after rounding. Runs of up to max_gap missing cells are filled
+        linearly along O/F, then along pressure. columns defaults to
+        ThermoColumns(), set a field of it to None to leave that quantity out.
+        '''
+
+        columns = ThermoColumns() if columns is None else columns
+
+        required = {'pc': columns.pc, 'ox': columns.ox, 'fuel': columns.fuel, **columns.quantities}
+        missing = {name: column for name, column in required.items() if column not in propep_data.columns}
+        if missing:
+            raise Exception(f'PROPEP table is missing columns {missing}, it has {list(propep_data.columns)}. '
+                            'Set the ThermoColumns field to None to leave a quantity out.')
+
+        pc = propep_data[columns.pc].to_numpy(dtype=float).round(pc_decimals)
+        of = (propep_data[columns.ox].to_numpy(dtype=float)/propep_data[columns.fuel].to_numpy(dtype=float)).round(of_decimals)
+
+        pc_axis, i = np.unique(pc, return_inverse=True)
+        of_axis, j = np.unique(of, return_inverse=True)
+
+        data = dict()
+        for name, column in columns.quantities.items():
+            grid = np.full((len(pc_axis), len(of_axis)), np.nan)
+            grid[i, j] = propep_data[column].to_numpy(dtype=float)
+
+            for row in grid:
+                _fill_line(row, of_axis, max_gap)
+            for col in grid.T:
+                _fill_line(col, pc_axis, max_gap)
+
+            data[name] = grid
+
+        return cls(pc_axis, of_axis, data)
+
+    def save(self, path: str):
+        np.savez(path, pc=self.pc, of=self.of, fields=self.fields, **{f'data_{k}': v for k, v in self.data.items()})
+
+    @classmethod
+    def load(cls, path: str) -> 'ThermoIndex':
+        with np.load(path) as f:
+            return cls(f['pc'], f['of'], {str(k): f[f'data_{k}'] for k in f['fields']})
+
+    def _cells(self, axis: np.ndarray, x: np.ndarray):
+
+        if len(axis) == 1:
+            i = np.zeros(len(x), dtype=int)
+            return i, i, np.zeros(len(x))
+
+        x = np.clip(x, axis[0], axis[-1])
+        i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+        return i, i + 1, (x - axis[i])/(axis[i + 1] - axis[i])
+
+    def lookup_many(self, pc, of, names: list[str] | None = None) -> np.ndarray:
+        '''
+        Vectorised lookup of names (default all fields), returns (points..., names)
+        '''
+
+        names = self.fields if names is None else names
+        pc, of = np.broadcast_arrays(np.asarray(pc, dtype=float), np.asarray(of, dtype=float))
+
+        i0, i1, wi = self._cells(self.pc, pc.ravel())
+        j0, j1, wj = self._cells(self.of, of.ravel())
+
+        out = np.empty((len(wi), len(names)))
+        for n, name in enumerate(names):
+            grid = self.data[name]
+            out[:, n] = ((1 - wi)*((1 - wj)*grid[i0, j0] + wj*grid[i0, j1])
+                         + wi*((1 - wj)*grid[i1, j0] + wj*grid[i1, j1]))
+
+        return out.reshape(pc.shape + (len(names),))
+
+    def field(self, name: str, pc, of) -> np.ndarray:
+        return self.lookup_many(pc, of, [name])[..., 0]
+
+    def isp(self, pc, of, frozen=False) -> np.ndarray:
+        return self.field('frozen_isp' if frozen else 'shifting_isp', pc, of)
+
+    def curve(self, name: str, pc: float) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        (O/F, values) along the grid row at the grid pressure nearest pc, for plotting
+        '''
+
+        i = int(np.abs(self.pc - pc).argmin())
+        return self.of, self.data[name][i]
@@ -0,0 +1,185 @@
+import json
+import numbers
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'HRTRACE1'
+HEADER_LEN = struct.Struct('<I')
+CHUNK_LEN = struct.Struct('<I')
+
+
+class TraceWriter():
+    '''
+    Streams result rows to disk as a chunked columnar file, so a run only ever
+    holds one chunk of rows in memory.
+
+    Layout: MAGIC, uint32 header length, JSON header (channel names, dtypes,
+    chunk size), then chunks of uint32 row count followed by every channel's
+    column for those rows.
+
+    channels maps channel name to dtype ('f4' or 'f8'). If None the channels
+    are taken from the numeric values of the first appended row, stored as
+    default_dtype.
+    '''
+
+    def __init__(self, path: str, channels: dict[str, str] | None = None, chunk_rows=4096, default_dtype='f8'):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.default_dtype = default_dtype
+        self.rows = 0
+
+        self._file = None
+        self._buffers: dict[str, np.ndarray] = dict()
+        self._fill = 0
+
+        if channels is not None:
+            self._open(channels)
+
+    def _open(self, channels: dict[str, str]):
+
+        self._buffers = {name: np.zeros(self.chunk_rows, dtype=np.dtype(dtype).newbyteorder('<')) for name, dtype in channels.items()}
+
+        header = json.dumps({
+            'channels': [{'name': name, 'dtype': b.dtype.str} for name, b in self._buffers.items()],
+            'chunk_rows': self.chunk_rows,
+        }).encode()
+
+        out_dir = os.path.dirname(self.path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC)
+        self._file.write(HEADER_LEN.pack(len(header)))
+        self._file.write(header)
+
+    def append(self, row: dict):
+
+        if self._file is None:
+            self._open({k: self.default_dtype for k, v in row.items() if isinstance(v, numbers.Number)})
+
+        i = self._fill
+        for name, buffer in self._buffers.items():
+            buffer[i] = row.get(name, np.nan)
+
+        self._fill += 1
+        self.rows += 1
+
+        if self._fill == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+
+        if self._file is None or self._fill == 0:
+            return
+
+        self._file.write(CHUNK_LEN.pack(self._fill))
+        for buffer in self._buffers.values():
+            self._file.write(buffer[:self._fill].tobytes())
+
+        self._fill = 0
+
+    def close(self):
+
+        if self._file is None:
+            return
+
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TraceReader():
+    '''
+    Opens a file written by TraceWriter without loading it. Only the chunk
+    headers are read up front; channels are read from a memory map on access.
+    '''
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise Exception(f'{path} is not a trace file')
+
+            (header_len,) = HEADER_LEN.unpack(f.read(HEADER_LEN.size))
+            header = json.loads(f.read(header_len))
+
+            self.dtypes = {c['name']: np.dtype(c['dtype']) for c in header['channels']}
+            self.chunk_rows = header['chunk_rows']
+
+            # (rows, offset of first column) per chunk
+            self._chunks: list[tuple[int, int]] = list()
+            offset = f.tell()
+            size = os.path.getsize(path)
+            row_bytes = sum(d.itemsize for d in self.dtypes.values())
+
+            while offset + CHUNK_LEN.size <= size:
+                f.seek(offset)
+                (rows,) = CHUNK_LEN.unpack(f.read(CHUNK_LEN.size))
+                self._chunks.append((rows, offset + CHUNK_LEN.size))
+                offset += CHUNK_LEN.size + rows*row_bytes
+
+        # Byte offset of each channel's column inside a chunk, per row
+        self._column_offsets = dict()
+        column = 0
+        for name, dtype in self.dtypes.items():
+            self._column_offsets[name] = column
+            column += dtype.itemsize
+
+        self._map = np.memmap(path, dtype=np.uint8, mode='r') if self._chunks else None
+
+    @property
+    def channels(self):
+        return list(self.dtypes.keys())
+
+    def __len__(self):
+        return sum(rows for rows, _ in self._chunks)
+
+    def __contains__(self, name):
+        return name in self.dtypes
+
+    def channel_chunks(self, name: str):
+        '''
+        Yields zero-copy views of the channel, one per chunk
+        '''
+
+        dtype = self.dtypes[name]
+
+        for rows, offset in self._chunks:
+            start = offset + self._column_offsets[name]*rows
+            yield self._map[start:start + rows*dtype.itemsize].view(dtype)
+
+    def channel(self, name: str, start=0, stop=None) -> np.ndarray:
+        '''
+        Rows [start, stop) of one channel. Only the chunks overlapping the
+        range are touched.
+        '''
+
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        parts = list()
+        row = 0
+        for view in self.channel_chunks(name):
+            end = row + len(view)
+            if end > start and row < stop:
+                parts.append(view[max(start - row, 0):stop - row])
+            row = end
+            if row >= stop:
+                break
+
+        if len(parts) == 1:
+            return parts[0]
+
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=self.dtypes[name])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.channel(name)
@@ -0,0 +1,14 @@
+import os
+import time
+
+from common.hotfire_columnar import convert_hotfire
+
+SOURCE = 'data/Aberdeen_5_HOTFIRE.h5'
+OUT_DIR = 'data/columnar'
+
+start = time.perf_counter()
+
+name = os.path.splitext(os.path.basename(SOURCE))[0]
+manifest = convert_hotfire(SOURCE, f'{OUT_DIR}/{name}')
+
+print(f'Converted {len(manifest["channels"])} channels to {OUT_DIR}/{name} in {time.perf_counter() - start:.2f}s')
@@ -1,54 +1,72 @@
+import os
+import time
+
 import numpy as np
 import matplotlib.pyplot as plt
-import scipy
 
-# Lin-lin liu et. al.
-# their fit: a=0.0876 n=0.3953
-data = np.array([
-    [91,     0.00045],
-    [96.22,  0.00054],
-    [138.56, 0.00056],
-    [171.72, 0.00059],
-    [241.74, 0.00078]
-])
+from common.hotfire_catalog import test_metrics
+from common.regression_laws import DATASETS, PUBLISHED_LAWS, fit_laws, hotfire_point, rate_band, save_laws, save_samples
+
+OUT_DIR = './output/r2s_2026/'
+# Table of laws the engine scripts load by name, e.g. load_law(LAWS, 'stanford').apply(engine)
+LAWS = './data/regression_laws.json'
+# Bootstrap (a, n) samples of the fitted laws in LAWS, by law name, for monte_carlo_r2s.py
+LAW_SAMPLES = './data/regression_law_samples.npz'
+RESAMPLES = 5000
+LEVEL = 0.95
+FIXED_N = 0.5
+# Plot file names that predate the fitting of several datasets, the rest are <dataset>_regression_rate.png
+PLOT_NAMES = {'lin_lin_liu': 'linliu'}
 
-# stanford
-# data = np.array([
-#     [100, 0.00219],
-#     [100, 0.00253],
-#     [104, 0.00215],
-#     [150, 0.00289],
-#     [194, 0.00295],
-#     [198, 0.00246]
-# ])
+# Our hotfires with their measured port radii (m) before and after the burn:
+# path -> (initial_port_radius, final_port_radius)
+HOTFIRES = {
+    # 'data/Aberdeen_5_HOTFIRE.h5': (0.01, 0.0125),
+}
 
+datasets = dict(DATASETS)
 
-def regression_fun(x, a, n):
-    return a*x**n
+if HOTFIRES:
+    points = list()
+    for path, (initial_radius, final_radius) in HOTFIRES.items():
+        metrics = test_metrics(path)
+        points.append(hotfire_point(metrics['nitrous_mass']/metrics['burn_time'], metrics['burn_time'], initial_radius, final_radius))
+    datasets['hotfire'] = np.array(points)
 
-def regression_fun_fixed(x, a):
-    return a*x**0.5
+start = time.perf_counter()
+laws, samples = fit_laws(datasets, resamples=RESAMPLES, level=LEVEL)
+fixed_laws, fixed_samples = fit_laws(datasets, n=FIXED_N, resamples=RESAMPLES, level=LEVEL)
+print(f'Fitted and bootstrapped {len(datasets)} datasets in {time.perf_counter() - start:.2f}s')
 
-popt, pcov = scipy.optimize.curve_fit(regression_fun, data[:,0], data[:,1])
+for name, law in laws.items():
+    fixed = fixed_laws[name]
+    print(f'{name}: a={law.a:.7f} [{law.a_ci[0]:.7f}, {law.a_ci[1]:.7f}] n={law.n:.5f} [{law.n_ci[0]:.5f}, {law.n_ci[1]:.5f}]')
+    print(f'{name}: a={fixed.a:.7f} [{fixed.a_ci[0]:.7f}, {fixed.a_ci[1]:.7f}] n={FIXED_N}')
 
-print(f'a={popt[0]:.7f} n={popt[1]:.5f}')
+table = dict(PUBLISHED_LAWS)
+table.update(laws)
+table.update({f'{name}_n{FIXED_N}': law for name, law in fixed_laws.items()})
+save_laws(LAWS, table)
+save_samples(LAW_SAMPLES, dict(samples, **{f'{name}_n{FIXED_N}': s for name, s in fixed_samples.items()}))
 
+os.makedirs(OUT_DIR, exist_ok=True)
 G = np.linspace(1, 1000)
-r = regression_fun(G, popt[0], popt[1])
 
-popt_f, pcov = scipy.optimize.curve_fit(regression_fun_fixed, data[:,0], data[:,1])
+for name, data in datasets.items():
+    law, fixed = laws[name], fixed_laws[name]
+
+    plt.figure()
+    plt.plot(data[:, 0], data[:, 1], 'x', label='Experimental values')
 
-print(f'a={popt_f[0]:.7f} n=0.5')
+    plt.plot(G, law.rate(G), label=f'a={law.a:.5f} n={law.n:.5f}')
+    plt.fill_between(G, *rate_band(samples[name], G, LEVEL), alpha=0.2)
 
-G_f = np.linspace(1, 1000)
-r_f = regression_fun_fixed(G, popt_f[0])
+    plt.plot(G, fixed.rate(G), label=f'a={fixed.a:.5f} n={FIXED_N}')
+    plt.fill_between(G, *rate_band(fixed_samples[name], G, LEVEL), alpha=0.2)
 
-plt.plot(data[:, 0], data[:, 1], 'x', label='Experimental values')
-plt.plot(G, r, label=f'a={popt[0]:.5f} n={popt[1]:.5f}')
-plt.plot(G_f, r_f, label=f'a={popt_f[0]:.5f} n=0.5')
-plt.xlabel('G_ox (kg/(m^2)')
-plt.ylabel("r' (m/s)")
-plt.legend()
-# plt.(G, r)
+    plt.xlabel('G_ox (kg/(m^2)')
+    plt.ylabel("r' (m/s)")
+    plt.legend()
 
-plt.savefig('./output/r2s_2026/linliu_regression_rate.png', bbox_inches='tight')
+    plt.savefig(f'{OUT_DIR}/{PLOT_NAMES.get(name, name)}_regression_rate.png', bbox_inches='tight')
+    plt.close()
@@ -0,0 +1,37 @@
+import time
+
+from common.propellant_blends import Blend, compare_to_reference, generate_tables
+
+# Propellant files for the fuel blends in r2s_2026_paraffin.py, load with
+# engine.load_prop(path, 'L_CUSTOM_S_CUSTOM'). Blends whose cards and grid
+# haven't changed since the last run are skipped.
+
+OUT_DIR = 'data/propellants/'
+PROCESSES = None
+# Regenerate pure paraffin first and check it against data/L_Nitrous_S_Paraffin.propep
+CHECK_REFERENCE = True
+REFERENCE_TOLERANCE = 0.2
+
+BLENDS = [
+    Blend('paraffin', {'paraffin': 1.0}),
+    # F3 sample
+    Blend('paraffin_pe_wax_90_10', {'paraffin': 0.9, 'pe_wax': 0.1}),
+    # F5 sample
+    Blend('paraffin_pe_wax_80_20', {'paraffin': 0.8, 'pe_wax': 0.2}),
+    # B70 beeswax
+    Blend('beeswax_paraffin_70_30', {'beeswax': 0.7, 'paraffin': 0.3}),
+]
+
+if __name__ == '__main__':
+
+    start = time.perf_counter()
+
+    if CHECK_REFERENCE:
+        ratios = compare_to_reference(tolerance=REFERENCE_TOLERANCE, processes=PROCESSES)
+        print('Reference check passed, median ratios: ' + ', '.join(f'{k}={v:.3f}' for k, v in ratios.items()))
+
+    paths = generate_tables(BLENDS, OUT_DIR, processes=PROCESSES)
+
+    for name, path in paths.items():
+        print(f'{name}: {path}')
+    print(f'Done in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,14 @@
+from common.hotfire_catalog import update_catalog
+
+DATA_DIR = 'data'
+CATALOG = 'output/hotfire_catalog/catalog.csv'
+
+# Grain mass burnt, not measured by the DAQ (see hotfire_plots.py)
+FUEL_MASS = 0.09
+
+if __name__ == '__main__':
+
+    catalog = update_catalog(DATA_DIR, CATALOG, FUEL_MASS)
+
+    print(catalog[['burn_time', 'total_impulse', 'nitrous_mass', 'isp', 'peak_chamber_pressure', 'average_chamber_pressure']])
+    print(catalog[['R2S_PT_1_peak_freq', 'R2S_PT_1_band_rms', 'THRUST_STAND_LC1_CALIBRATED_peak_freq', 'THRUST_STAND_LC1_CALIBRATED_band_rms']])
@@ -0,0 +1,47 @@
+import sys
+import time
+
+from common.hotfire_stream import StreamingHotfireAnalyzer, follow_hdf5, follow_lines, follow_socket
+from common.trace_store import TraceReader
+
+# HDF5 file being written by the DAQ, '-' for samples piped to stdin or host:port for a socket
+SOURCE = 'data/Aberdeen_5_HOTFIRE.h5'
+CHANNELS = ['THRUST_STAND_LC1_CALIBRATED', 'R2S_PT_1', 'NITROUS_FT_1']
+
+# Simulated run to compare against (trace written by simualte_test_fire_press.py), None to disable
+PREDICTION = None
+
+FUEL_MASS = 0.09
+REPORT_PERIOD = 0.5 # s
+
+prediction = None
+if PREDICTION is not None:
+    trace = TraceReader(PREDICTION)
+    prediction = (trace['time'], trace['thrust'])
+
+analyzer = StreamingHotfireAnalyzer(prediction, fuel_mass=FUEL_MASS)
+
+if SOURCE == '-':
+    samples = follow_lines(sys.stdin)
+elif ':' in SOURCE:
+    host, port = SOURCE.rsplit(':', 1)
+    samples = follow_socket(host, int(port))
+else:
+    samples = follow_hdf5(SOURCE, CHANNELS)
+
+last_report = None
+worst_latency = 0
+
+for t, thrust, chamber_pressure, ox_flow in samples:
+
+    start = time.perf_counter()
+    m = analyzer.update(t, thrust, chamber_pressure, ox_flow)
+    worst_latency = max(worst_latency, time.perf_counter() - start)
+
+    if last_report is None or t - last_report >= REPORT_PERIOD:
+        last_report = t
+        flag = ' DEVIATING FROM PREDICTION' if m.deviating else ''
+        print(f'{t:8.2f}s F={m.thrust:7.2f}N Pc={m.chamber_pressure:6.2f}bar I={m.total_impulse:8.2f}Ns Isp={m.isp:6.1f}s{flag}')
+
+print(f'Total impulse: {analyzer.metrics.total_impulse:.2f}Ns, burn time {analyzer.metrics.burn_time:.2f}s')
+print(f'Worst update latency: {worst_latency*1e6:.1f}us')
@@ -1,43 +1,64 @@
-import h5py
 import os
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy
 import scipy.integrate
 
-OUT_DIR = 'data/hotfire_plots/'
-TIME_START = 50
-TIME_END = 70   
-NITROUS_CUTOFF = 60
-
-#Open the H5 file in read mode
-with h5py.File('data/Aberdeen_5_HOTFIRE.h5', 'r') as file:
-
-    keys = list(file['channels'].keys())
-
-    start_index     = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_START][0]
-    end_index       = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_END][0]
+from common.burn_window import detect_dataset_events
+from common.constants import G0
+from common.hotfire_columnar import open_hotfire
+from common.signal_conditioning import Conditioning, fir_lowpass
 
-
-    thrust_channel = file['channels']['THRUST_STAND_LC1_CALIBRATED']
-
-    time    = np.array(thrust_channel['time'])
+OUT_DIR = 'data/hotfire_plots/'
+# Either the HDF5 recording or its converted columnar directory (see convert_hotfire.py)
+HOTFIRE_FILE = 'data/Aberdeen_5_HOTFIRE.h5'
+# Burn window and cutoff, detected from the data when None
+TIME_START = None
+TIME_END = None
+NITROUS_CUTOFF = None
+# Time (s) kept before detected ignition and after detected burnout
+WINDOW_MARGIN = (0.5, 2.0)
+# Time (s) before the window the load cell is tared on
+TARE_TIME = 2.0
+# Quiet time (s) after the window to remove load cell drift against, None to only tare
+DRIFT_TIME = None
+# Low-pass cutoff (Hz) of the thrust filter
+THRUST_CUTOFF = 10
+
+with open_hotfire(HOTFIRE_FILE) as dataset:
+
+    events = detect_dataset_events(dataset)
+    print(f'Detected ignition {events.ignition}s, steady {events.steady}s, ox cutoff {events.ox_cutoff}s, burnout {events.burnout}s')
+
+    TIME_START = events.ignition - WINDOW_MARGIN[0] if TIME_START is None else TIME_START
+    TIME_END = events.burnout + WINDOW_MARGIN[1] if TIME_END is None else TIME_END
+    NITROUS_CUTOFF = events.ox_cutoff if NITROUS_CUTOFF is None else NITROUS_CUTOFF
+
+    start_index, end_index = dataset.index_range(TIME_START, TIME_END)
+
+    time    = dataset.time[start_index:end_index]
     dt = time[1] - time[0]
 
-    thrust_values  = np.array(thrust_channel['data'])
-    # Zero thrust values relative to start of fire
-    thrust_values -= thrust_values[start_index] 
+    # The load cell can be sampled at its own rate
+    thrust_dt = np.diff(dataset.own_time('THRUST_STAND_LC1_CALIBRATED')[:2])[0]
+
+    # Zero thrust on the quiet time before the fire and filter the load cell noise
+    thrust_conditioning = Conditioning(
+        tare_window=(TIME_START - TARE_TIME, TIME_START),
+        drift_window=(TIME_END, TIME_END + DRIFT_TIME) if DRIFT_TIME is not None else None,
+        taps=fir_lowpass(1/thrust_dt, THRUST_CUTOFF),
+    )
+    thrust_time, thrust_values = thrust_conditioning.apply_channel(dataset, 'THRUST_STAND_LC1_CALIBRATED', TIME_START, TIME_END)
 
-    nitrous_mass_flow_channel = file['channels']['NITROUS_FT_1']
-    nitrous_mass_flow_values  = np.array(nitrous_mass_flow_channel['data'])
+    nitrous_mass_flow_values  = dataset.channel('NITROUS_FT_1', start_index, end_index)
 
     # Zero nitrous flow values relative to their min value (this is an assumption as it gets us realistic isp values)
-    # nitrous_mass_flow_values -= np.min(nitrous_mass_flow_values[start_index:end_index])
+    # nitrous_mass_flow_values -= np.min(nitrous_mass_flow_values)
 
     os.makedirs(OUT_DIR, exist_ok=True)
 
     plt.title('Thrust')
-    plt.plot(time[start_index:end_index], thrust_values[start_index:end_index], 'o', color='0', ms=0.5)
+    plt.plot(thrust_time, thrust_values, 'o', color='0', ms=0.5)
     plt.axvline(NITROUS_CUTOFF, label=f'Nitrous cutoff ({NITROUS_CUTOFF:.2f}s)', ls='--', color='r')
 
     plt.xlabel('Time (s)')
@@ -47,14 +68,14 @@ with h5py.File('data/Aberdeen_5_HOTFIRE.h5', 'r') as file:
     plt.savefig(f'{OUT_DIR}/thrust.png', dpi=500)
     plt.close()
 
-    # total_thrust = scipy.integrate.trapezoid(thrust_values[start_index:end_index], time[start_index:end_index])
-    # total_nitrous_mass_flow = scipy.integrate.trapezoid(nitrous_mass_flow_values[start_index:end_index], time[start_index:end_index])
+    # total_thrust = scipy.integrate.trapezoid(thrust_values, time)
+    # total_nitrous_mass_flow = scipy.integrate.trapezoid(nitrous_mass_flow_values, time)
 
 
-    total_thrust = np.sum(thrust_values[start_index:end_index]*dt)
-    total_nitrous_mass_flow = np.sum(nitrous_mass_flow_values[start_index:end_index]*dt)
+    total_thrust = np.sum(thrust_values*thrust_dt)
+    total_nitrous_mass_flow = np.sum(nitrous_mass_flow_values*dt)
 
-    isp = total_thrust/((total_nitrous_mass_flow + 0.09)*10)
+    isp = total_thrust/((total_nitrous_mass_flow + 0.09)*G0)
 
     print(f'Total thrust: {total_thrust}Ns')
     print(f'Total nitrous: {total_nitrous_mass_flow}kg')
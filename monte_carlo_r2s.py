@@ -0,0 +1,111 @@
+import os
+
+import pandas as pd
+from nitrous_engine_sim import assign_engine_parameters, Cengines
+from nitrous_engine_sim.engine_file_reader import read_engine_file
+
+from common.engine_harness import DtSchedule, prepare_sim, run_burn
+from common.monte_carlo import Inputs, MonteCarlo
+from common.regression_laws import load_law, load_samples
+
+# Spread of total impulse, Isp and burn time of the r2s_2026_paraffin.py engine
+# under regression law, tank temperature and fill pressure uncertainty
+
+OUT_DIR = './output/r2s_2026/'
+LAWS = './data/regression_laws.json'
+LAW_SAMPLES = './data/regression_law_samples.npz'
+# Fitted laws are drawn from their bootstrap (a, n) samples, published ones are run at their fixed values
+LAW = 'lin_lin_liu'
+TANK_TEMP_C = (20, 2)
+FILL_PRESSURE_BAR = (62.5, 2)
+
+QUANTILES = (0.05, 0.5, 0.95)
+# Stop once every quantile is known to within this fraction of the median, widen
+# it or raise MAX_RUNS when the run reports how far it is from converging
+REL_TOL = 0.02
+MAX_RUNS = 2000
+PROCESSES = None
+
+MAX_ITERATIONS = 200000
+DT = 0.001
+DT_SCHEDULE = DtSchedule(ignition_dt=DT/2, steady_dt=DT*5, depletion_dt=DT, tail_off_dt=DT*2)
+
+engine_parameters = read_engine_file('data/aberdeen_r2s.engine')
+
+
+def set_engine_geometry(engine):
+    engine.ox_initial_tank_pressure_bar = 62.5
+    engine.ox_tank_volume = 30/1000
+    engine.ox_initial_temp_C = 20
+    engine.ox_orifice_number = 30
+    engine.ox_orifice_diameter = 0.0007*2
+
+    engine.ox_feed_model = 1
+
+    engine.fuel_orifice_number = 0
+
+    engine.charge_length = 0.28
+    engine.charge_radius = 0.13665/2
+
+    engine.centre_port_radius = 0.02
+    engine.port_max_radius = engine.charge_radius
+
+    engine.pre_comb_chamber_length = 0.25
+    engine.post_comb_chamber_length = 0.15
+
+    engine.nozzle_efficiency = 1
+    engine.nozzle_throat_rdot = 0
+    engine.nozzle_area_ratio = 6
+    engine.nozzle_throat_diameter = 0.011*2
+
+
+def simulate(params: dict[str, float]) -> dict[str, float]:
+    engine = Cengines()
+    engine.load_prop('./data/L_Nitrous_S_Paraffin.propep', 'L_CUSTOM_S_CUSTOM')
+    assign_engine_parameters(engine, engine_parameters)
+    set_engine_geometry(engine)
+    engine.solid_propellant_density = 900
+    engine.regression_m = 0
+
+    for name, value in params.items():
+        setattr(engine, name, value)
+
+    prepare_sim(engine, DT)
+    engine.simulate_engine()
+    burn = run_burn(engine, MAX_ITERATIONS, dt_schedule=DT_SCHEDULE, result_period=100, report_faults=False)
+
+    return {'total_impulse': burn.total_impulse, 'isp': engine.average_ISP, 'burn_time': engine.burn_time}
+
+
+def report(result):
+    print(f'{result.runs} burns ({result.failures} failed, {result.rejected} draws rejected as not physical), '
+          f'converged: {result.converged}')
+    for metric, quantiles in result.quantiles.items():
+        print(f'    {metric}: ' + ', '.join(f'P{100*q:.0f}={v:.2f} [{low:.2f}, {high:.2f}]' for q, (v, low, high) in quantiles.items()))
+
+
+def report_convergence(result):
+    if result.converged:
+        print(f'Converged: every quantile is within {100*REL_TOL:g}% of its median')
+        return
+
+    print(f'NOT converged after {result.runs} burns (MAX_RUNS={MAX_RUNS}), the quantiles above are not known to {100*REL_TOL:g}%:')
+    for metric, quantiles in result.quantiles.items():
+        median = abs(quantiles[0.5][0])
+        widest = max((high - low)/2 for _, low, high in quantiles.values())
+        print(f'    {metric}: widest interval +-{100*widest/median:.2f}% of the median')
+
+
+if __name__ == '__main__':
+
+    inputs = Inputs(load_law(LAWS, LAW), TANK_TEMP_C, FILL_PRESSURE_BAR, load_samples(LAW_SAMPLES, LAW))
+
+    mc = MonteCarlo(simulate, inputs, ['total_impulse', 'isp', 'burn_time'], QUANTILES, rel_tol=REL_TOL,
+                    max_runs=MAX_RUNS, processes=PROCESSES)
+    result = mc.run(progress=report)
+
+    report(result)
+    report_convergence(result)
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    pd.DataFrame([dict(p, **(o or {})) for p, o in result.samples]).to_csv(f'{OUT_DIR}/monte_carlo_{LAW}.csv', index=False)
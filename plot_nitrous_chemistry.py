@@ -1,51 +1,47 @@
-import os
-import pandas as pd
 import matplotlib.pyplot as plt
 
-from nitrous_engine_sim.propep_3_parser import import_simulation_results, add_nes_units, export_as_nes_propep
+from nitrous_engine_sim.propep_3_parser import add_nes_units, export_as_nes_propep
 
-dfs = list()
-start_index = 0
-for f in os.listdir('./data/nox_petrolium_runs'):
-    df = import_simulation_results(f'./data/nox_petrolium_runs/{f}', start_index)
-    start_index += len(df)
-    dfs.append(df)
+from common.propep_ingest import ingest_propep
+from common.thermo_index import ThermoIndex
 
-propep_data = pd.concat(dfs)
+RUN_DIR = './data/nox_petrolium_runs'
+# Per file parses and the consolidated table, only changed run files get parsed again
+CACHE_DIR = './data/columnar/nox_petrolium_runs'
 
-print(propep_data.head())
-# propep_data = propep_data.drop(propep_data[propep_data['P_CHAMBER_PSI'] == 0].index)
-add_nes_units(propep_data, 'nitrous_oxide', 'petroleum_jelly')
-propep_data = propep_data.dropna()
+if __name__ == '__main__':
 
-print(propep_data.columns)
-print(propep_data[propep_data['run_id'] == 30])
+    propep_data = ingest_propep(RUN_DIR, CACHE_DIR)
 
-chamber_pressures = list(set(propep_data['P_CHAMBER_BAR']))
-plotted_pressures = [x for (i, x) in enumerate(chamber_pressures) if (i % 5 == 0) and x < 60]
+    print(propep_data.head())
+    # propep_data = propep_data.drop(propep_data[propep_data['P_CHAMBER_PSI'] == 0].index)
+    add_nes_units(propep_data, 'nitrous_oxide', 'petroleum_jelly')
+    propep_data = propep_data.dropna()
 
-# for p in reversed(plotted_pressures):
+    print(propep_data.columns)
+    print(propep_data[propep_data['run_id'] == 30])
 
-#     series =  propep_data[propep_data['P_CHAMBER_BAR'] == p]
+    index = ThermoIndex.from_frame(propep_data)
+    index.save(f'{CACHE_DIR}/thermo_index.npz')
 
-#     of_ratio = series['ox_percentage']/series['fuel_percentage']
+    plotted_pressures = [x for (i, x) in enumerate(index.pc) if (i % 5 == 0) and x < 60]
 
-#     plt.plot(of_ratio, series['FROZEN_IMPULSE'], label=f'{p:.2f} bar')
+    # for p in reversed(plotted_pressures):
 
-# plt.legend()
-# plt.xlabel('O/F ratio')
-# plt.ylabel('Specific Impulse (s)')
-# plt.xlim(0, 15)
-# plt.savefig('./output/chemistry/paraffin_petrogel_OF_.png', bbox_inches='tight')
+    #     plt.plot(*index.curve('frozen_isp', p), label=f'{p:.2f} bar')
 
-for p in reversed(plotted_pressures):
+    # plt.legend()
+    # plt.xlabel('O/F ratio')
+    # plt.ylabel('Specific Impulse (s)')
+    # plt.xlim(0, 15)
+    # plt.savefig('./output/chemistry/paraffin_petrogel_OF_.png', bbox_inches='tight')
 
-    series =  propep_data[propep_data['P_CHAMBER_BAR'] == p]
-    of_ratio = series['ox_percentage']/series['fuel_percentage']
-    plt.plot(of_ratio, series['T_CHAMBER_K'], label=f'{p:.2f} bar')
+    for p in reversed(plotted_pressures):
 
-plt.legend()
-plt.xlabel('O/F ratio')
-plt.ylabel('T (K)')
-plt.xlim(0, 15)
-plt.savefig('./output/chemistry/paraffin_petrogel_OF_T.png', bbox_inches='tight')
\ No newline at end of file
+        plt.plot(*index.curve('tc', p), label=f'{p:.2f} bar')
+
+    plt.legend()
+    plt.xlabel('O/F ratio')
+    plt.ylabel('T (K)')
+    plt.xlim(0, 15)
+    plt.savefig('./output/chemistry/paraffin_petrogel_OF_T.png', bbox_inches='tight')
@@ -8,6 +8,8 @@ import matplotlib.pyplot as plt
 
 from nitrous_engine_sim.result_helper import get_running_results
 
+from common.engine_feasibility import check_feasibility
+
 def add_colorbar(z_values, cmap, label):
     ax = plt.gca()
     ax.inset_axes([0.95, 0.1, 0.05, 0.8])
@@ -30,6 +32,7 @@ thrust = np.zeros(res*res)
 isp = np.zeros(res*res)
 impulse = np.zeros(res*res)
 ox_usage = np.zeros(res*res)
+rejected = np.zeros(res*res, dtype=bool)
 burn_time = np.zeros(res*res)
 
 j = 0
@@ -73,6 +76,14 @@ for orifice_r in orifice_radii:
 
         # write_engine_file(read_engine_parameters(engine), 'aberdeen_r2s.engine')
 
+        # Skip designs that can't reach a steady burn, they are left as NaN and marked rejected
+        feasibility = check_feasibility(engine)
+        if not feasibility.feasible:
+            thrust[j] = impulse[j] = isp[j] = ox_usage[j] = burn_time[j] = float('nan')
+            rejected[j] = True
+            j += 1
+            continue
+
         # Prepare sim
         engine.delta_time = 0.01
 
@@ -134,6 +145,12 @@ for orifice_r in orifice_radii:
     impulse_reshape = impulse.reshape(res, res)
     ox_usage_reshape = ox_usage.reshape(res, res)
     burn_time_reshape = burn_time.reshape(res, res)
+    rejected_reshape = rejected.reshape(res, res)
+
+print(f'Rejected before simulating: {np.sum(rejected)}/{res*res}')
+
+def mark_rejected():
+    plt.contourf(orifice_radii*1000, nozzle_radii*1000, rejected_reshape, levels=[0.5, 1.5], colors='none', hatches=['//'])
 
 
 plt.figure(figsize=(12,18))
@@ -141,30 +158,35 @@ plt.figure(figsize=(12,18))
 plt.subplot(3, 2, 1)
 add_colorbar(thrust, 'plasma', 'Thrust (N)')
 plt.contourf(orifice_radii*1000, nozzle_radii*1000, thrust_reshape, 100, cmap='plasma')
+mark_rejected()
 plt.xlabel('Ox Orifice radius (mm)')
 plt.ylabel('Nozzle Throat radius (mm)')
 
 plt.subplot(3, 2, 2)
 add_colorbar(isp, 'cool', 'Isp (s)')
 plt.contourf(orifice_radii*1000, nozzle_radii*1000, isp_reshape, 100, cmap='cool')
+mark_rejected()
 plt.xlabel('Ox Orifice radius (mm)')
 plt.ylabel('Nozzle Throat radius (mm)')
 
 plt.subplot(3, 2, 3)
 add_colorbar(impulse, 'Wistia', 'Total impulse (Ns)')
 plt.contourf(orifice_radii*1000, nozzle_radii*1000, impulse_reshape, 100, cmap='Wistia')
+mark_rejected()
 plt.xlabel('Ox Orifice radius (mm)')
 plt.ylabel('Nozzle Throat radius (mm)')
 
 plt.subplot(3, 2, 4)
 add_colorbar(ox_usage, 'summer', 'Ox usage (kg)')
 plt.contourf(orifice_radii*1000, nozzle_radii*1000, ox_usage_reshape, 100, cmap='summer')
+mark_rejected()
 plt.xlabel('Ox Orifice radius (mm)')
 plt.ylabel('Nozzle Throat radius (mm)')
 
 plt.subplot(3, 2, 5)
 add_colorbar(burn_time, 'summer', 'Burn time (s)')
 plt.contourf(orifice_radii*1000, nozzle_radii*1000, burn_time_reshape, 100, cmap='summer')
+mark_rejected()
 plt.xlabel('Ox Orifice radius (mm)')
 plt.ylabel('Nozzle Throat radius (mm)')
 
@@ -2,12 +2,18 @@ import math
 import nitrous_engine_sim
 from nitrous_engine_sim import assign_engine_parameters, load_default_prop, Cengines
 from nitrous_engine_sim.engine_file_reader import read_engine_file
-from nitrous_engine_sim.result_helper import get_running_results
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from common.engine_harness import DtSchedule, prepare_sim, run_burn
+from common.engine_profiler import EngineProfiler
+
 MAX_ITERATIONS = 200000
 DT = 0.001
+PROFILE = False
+
+# Fine steps through ignition and liquid depletion, coarse steps while the chamber is settled
+DT_SCHEDULE = DtSchedule(ignition_dt=DT/2, steady_dt=DT*5, depletion_dt=DT, tail_off_dt=DT*2)
 
 engine_parameters = read_engine_file('data/aberdeen_r2s.engine')
 
@@ -37,61 +43,30 @@ def set_engine_geometry(engine):
     engine.nozzle_area_ratio = 6
     engine.nozzle_throat_diameter = 0.011*2
 
-# Prepare sim
-def prepare_sim(engine,dt):
-    engine.delta_time = dt
-
-    engine.burn_status = 0
-    engine.initialize_engine()
-
-    engine.burn_status = 1
-    engine.ignition = True
-
-    engine.surpress_mixture_out_of_range = True
-
 def simulate(engine, MAX_ITERATIONS):
-    i = 0
-    last_fault = 0
-    total_impulse = 0
-    total_thrust = 0
-
-    res = list()
     engine.simulate_engine()
 
-
-    while engine.burn_status == 1 and i < MAX_ITERATIONS:
-        engine.simulate_engine()
-
-        total_impulse += engine.thrust*engine.delta_time
-
-        if engine._fault != last_fault:
-            if engine._fault > 0:
-                print(f'New engine fault at {engine.burn_time:.3f}s: {nitrous_engine_sim.get_error_msg(engine._fault)}')
-            else:
-                print(f'All faults cleared at {engine.burn_time:.3f}s')
-            last_fault = engine._fault
-
-        total_thrust += engine.thrust
-        res.append(get_running_results(engine))
-        i += 1
-
-    avg_thrust = total_thrust/i
+    profiler = EngineProfiler(track_memory=True) if PROFILE else None
+    burn = run_burn(engine, MAX_ITERATIONS, dt_schedule=DT_SCHEDULE, profiler=profiler)
     
-    df = pd.DataFrame(res)
+    df = pd.DataFrame(burn.results)
     initial_radius = df['centre_port_radius'][0]
     final_radius = df['centre_port_radius'][len(df['centre_port_radius'])-1]
     fuel_volume_spent = (final_radius**2 - initial_radius**2)*2*math.pi*engine.charge_length
     fuel_mass_spent = fuel_volume_spent*engine.solid_propellant_density
 
-    print(f'    Iterations: {i}')
-    print(f'    Result data points {len(res)}')
+    print(f'    Iterations: {burn.iterations}')
+    print(f'    Result data points {len(burn.results)}')
     print(f'    Engine burn time: {engine.burn_time:.2f} s')
-    print(f'    Total impulse: {total_impulse:.2f} Ns')
+    print(f'    Total impulse: {burn.total_impulse:.2f} Ns')
     print(f'    Engine specific impulse: {engine.average_ISP:.2f} s')
     print(f'    Oxidizer spent: {(engine.ox_initial_liquid_mass - engine.ox_tank_liquid_mass):.2f} kg')
     print(f'    Fuel spent {fuel_mass_spent:.2f} kg')
 
-    return df, total_impulse, total_thrust
+    if profiler is not None:
+        profiler.print_report()
+
+    return df, burn.total_impulse, burn.total_thrust
 
 def add_ox_flux(df: pd.DataFrame):
     df['ox_flux'] = df['total_inflow']/(math.pi*df['centre_port_radius']**2) # kg/(s*m^2)
@@ -0,0 +1,71 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from common.cea_tables import CeaTable
+from common.hybrid_batch import simulate_batch
+from common.hybrid_pressure_model import HybridDesign
+
+# Screens random candidate designs with the batched reduced order model, the
+# survivors are worth full nitrous_engine_sim runs
+
+OUT_DIR = 'output/design_screening/'
+# Built by Hybrid Calculations Using Pressure.py
+CEA_TABLE = 'output/cea_tables/N20_polyethylene_eps5.npz'
+CANDIDATES = 100000
+SEED = 0
+DT = 0.05
+
+# Constraints the survivors have to meet
+MAX_CHAMBER_PRESSURE = 35e5
+MIN_AVERAGE_THRUST = 40
+MIN_TOTAL_IMPULSE = 2500
+
+rng = np.random.default_rng(SEED)
+
+candidates = HybridDesign(
+    ox_mass=2.0,
+    ox_mass_flow=rng.uniform(0.03, 0.2, CANDIDATES),
+    a_0=0.000116,
+    n=0.331,
+    fuel_length=rng.uniform(0.08, 0.3, CANDIDATES),
+    initial_port_radius=rng.uniform(0.005, 0.02, CANDIDATES),
+    throat_radius=rng.uniform(0.002, 0.006, CANDIDATES),
+    expansion_ratio=5,
+)
+
+table = CeaTable.load(CEA_TABLE)
+
+start = time.perf_counter()
+result = simulate_batch(candidates, table, dt=DT)
+elapsed = time.perf_counter() - start
+
+print(f'Simulated {CANDIDATES} designs in {elapsed:.2f}s ({CANDIDATES/elapsed:.0f} designs/s)')
+
+df = pd.DataFrame({
+    'ox_mass_flow': candidates.ox_mass_flow,
+    'fuel_length': candidates.fuel_length,
+    'initial_port_radius': candidates.initial_port_radius,
+    'throat_radius': candidates.throat_radius,
+    'burn_time': result.burn_time,
+    'total_impulse': result.total_impulse,
+    'average_thrust': result.total_impulse/result.burn_time,
+    'peak_pressure_bar': result.peak_pressure/1e5,
+    'peak_thrust': result.peak_thrust,
+    'average_of': result.average_of,
+    'fuel_mass': result.fuel_mass,
+    'isp': result.isp,
+})
+
+survivors = df[(result.depleted)
+               & (result.peak_pressure < MAX_CHAMBER_PRESSURE)
+               & (df['average_thrust'] > MIN_AVERAGE_THRUST)
+               & (df['total_impulse'] > MIN_TOTAL_IMPULSE)].sort_values('total_impulse', ascending=False)
+
+print(f'{len(survivors)} designs meet the constraints')
+print(survivors.head(10))
+
+os.makedirs(OUT_DIR, exist_ok=True)
+survivors.to_csv(f'{OUT_DIR}/survivors.csv', index=False)
@@ -1,6 +1,5 @@
 import math
 import os
-import h5py
 import nitrous_engine_sim
 from nitrous_engine_sim import assign_engine_parameters, read_engine_file, write_engine_file, read_engine_parameters
 import numpy as np
@@ -9,30 +8,32 @@ import matplotlib.pyplot as plt
 
 from nitrous_engine_sim.result_helper import get_running_results
 
+from common.constants import G0
+from common.engine_harness import prepare_sim
+from common.hotfire_columnar import open_hotfire
+from common.replay_driver import mdot_replay
+from common.signal_conditioning import Conditioning, savgol
+
 # Load the test data
 
 OUT_DIR = 'output/hotfire_sims/'
+# Either the HDF5 recording or its converted columnar directory (see convert_hotfire.py)
+HOTFIRE_FILE = 'data/Aberdeen_5_HOTFIRE.h5'
 TIME_START = 50.6
 TIME_END = 72   
 NITROUS_CUTOFF = 60
+# Savitzky-Golay window (samples) smoothing the flow meter
+FLOW_SMOOTHING = 21
 
-#Open the H5 file in read mode
-with h5py.File('data/Aberdeen_5_HOTFIRE.h5', 'r') as file:
-
-    keys = list(file['channels'].keys())
-
-    start_index     = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_START][0]
-    end_index       = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_END][0]
+with open_hotfire(HOTFIRE_FILE) as dataset:
 
-    nitrous_massflow_channel = file['channels']['NITROUS_FT_1']
+    # Smooth the flow meter and keep the smoothed flow positive for the engine
+    flow_conditioning = Conditioning(taps=savgol(FLOW_SMOOTHING), clip_min=0.001)
+    time, nitrous_massflow_values = flow_conditioning.apply_channel(dataset, 'NITROUS_FT_1', TIME_START, TIME_END)
 
-    time    = np.array(nitrous_massflow_channel['time'])
-    time = time[start_index:end_index] - time[start_index]
+    time = time - time[0]
     dt = time[1] - time[0]
 
-    nitrous_massflow_values  = np.array(nitrous_massflow_channel['data'])[start_index:end_index]
-    nitrous_massflow_values[nitrous_massflow_values < 0] = 0.001
-
 
 
 # Load a default engine to start with
@@ -79,51 +80,25 @@ engine.ox_initial_temp_C = 30
 
 
 # Prepare sim
-engine.delta_time = 0.001
-
-engine.burn_status = 0
-engine.initialize_engine()
-
-engine.burn_status = 1
-engine.ignition = True
-
-engine.surpress_mixture_out_of_range = True
+DT = 0.001
+prepare_sim(engine, DT)
 
 MAX_ITERATIONS = 200000
 RESULT_PERIOD = 1
-i = 0
 res = list()
-last_fault = 0
-total_impulse = 0
-
-while i < MAX_ITERATIONS:
-
-    if engine.burn_time < np.max(time):
-        cur_mdot = np.interp(engine.burn_time, time, nitrous_massflow_values)
-
-        engine.ox_mdot_tank_outflow = cur_mdot
-    else:
-        break
-
-    engine.simulate_engine()
-
-    total_impulse += engine.thrust*engine.delta_time
 
-    if i % RESULT_PERIOD == 0:
-        rr = nitrous_engine_sim.get_running_results(engine)
-        rr['ox_tank_pressure'] = engine.ox_tank_pressure_bar
-        rr['ox_mdot_tank_outflow'] = engine.ox_mdot_tank_outflow
-        rr['isp'] = (engine.thrust/rr['nozzle_mass_flowrate'])/10
-        res.append(rr)
+# The flow meter is resampled onto the simulation steps once
+replay = mdot_replay(time, nitrous_massflow_values, DT)
 
-    if engine._fault != last_fault:
-        if engine._fault > 0:
-            print(f'New engine fault at {engine.burn_time:.3f}s: {nitrous_engine_sim.get_error_msg(engine._fault)}')
-        else:
-            print(f'All faults cleared at {engine.burn_time:.3f}s')
-        last_fault = engine._fault
+def record(rr, i):
+    rr['ox_tank_pressure'] = engine.ox_tank_pressure_bar
+    rr['ox_mdot_tank_outflow'] = engine.ox_mdot_tank_outflow
+    rr['isp'] = engine.thrust/rr['nozzle_mass_flowrate']/G0
+    res.append(rr)
 
-    i += 1
+burn = replay.run(engine, record, MAX_ITERATIONS, RESULT_PERIOD)
+i = burn.iterations
+total_impulse = burn.total_impulse
 
 
 print(f'Iterations: {i}')
@@ -1,6 +1,5 @@
 import math
 import os
-import h5py
 import nitrous_engine_sim
 from nitrous_engine_sim import assign_engine_parameters, read_engine_file, write_engine_file, read_engine_parameters
 import numpy as np
@@ -9,43 +8,35 @@ import matplotlib.pyplot as plt
 
 from nitrous_engine_sim.result_helper import get_running_results
 
+from common.constants import G0
+from common.engine_harness import prepare_sim
+from common.hotfire_columnar import open_hotfire
+from common.replay_driver import pressure_replay
+from common.trace_store import TraceReader, TraceWriter
+
 # Load the test data
 
 OUT_DIR = 'output/hotfire_sims/'
+# Either the HDF5 recording or its converted columnar directory (see convert_hotfire.py)
+HOTFIRE_FILE = 'data/Aberdeen_5_HOTFIRE.h5'
 TYPE = 'VAPOUR' #  'LIQUID'
 TIME_START = 50.5
 TIME_END = 72   
 NITROUS_CUTOFF = 60
+TRACE_FILE = f'{OUT_DIR}/pressure_{TYPE}.trace'
 
-#Open the H5 file in read mode
-with h5py.File('data/Aberdeen_5_HOTFIRE.h5', 'r') as file:
-
-    keys = list(file['channels'].keys())
-
-    start_index     = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_START][0]
-    end_index       = [i for i, x in enumerate(file['channels'][keys[0]]['time']) if x > TIME_END][0]
+with open_hotfire(HOTFIRE_FILE) as dataset:
 
-    pressure_channel = file['channels']['NITROUS_PT_4']
+    start_index, end_index = dataset.index_range(TIME_START, TIME_END)
 
-    time    = np.array(pressure_channel['time'])
-    time = time[start_index:end_index] - time[start_index]
+    time    = dataset.time[start_index:end_index]
+    time = time - time[0]
     dt = time[1] - time[0]
 
-    pressure_values  = np.array(pressure_channel['data'])[start_index:end_index]
-    # Zero thrust values relative to start of fire
-    # pressure_values -= pressure_values[start_index] 
-
-    temp_channel = file['channels']['NITROUS_TT_4']
-    temp_values  = np.array(temp_channel['data'])[start_index:end_index]
-
-    chamber_pressure_channel = file['channels']['R2S_PT_1']
-    chamber_pressure_values  = np.array(chamber_pressure_channel['data'])[start_index:end_index]
-
-    thrust_channel = file['channels']['THRUST_STAND_LC1']
-    thrust_values  = np.array(thrust_channel['data'])
-    # Zero thrust values relative to start of fire
-    thrust_values -= thrust_values[start_index] 
-    thrust_values  = np.array(thrust_channel['data'])[start_index:end_index]
+    pressure_values  = dataset.channel('NITROUS_PT_4', start_index, end_index)
+    temp_values  = dataset.channel('NITROUS_TT_4', start_index, end_index)
+    chamber_pressure_values  = dataset.channel('R2S_PT_1', start_index, end_index)
+    thrust_values  = dataset.channel('THRUST_STAND_LC1', start_index, end_index)
 
 
 # Load a default engine to start with
@@ -95,74 +86,42 @@ fitted_nitrous_density_t = np.array([0,  7.5,  8, 9.03, 9.2, 9.5, 11, 17, 23])
 fitted_nitrous_density_v = np.array([20, 20,  55, 32,   75,  75,  12, 5,  3.5])*2.5
 
 # Prepare sim
-engine.delta_time = 0.0001
-
-engine.burn_status = 0
-engine.initialize_engine()
-
-engine.burn_status = 1
-engine.ignition = True
-
-engine.surpress_mixture_out_of_range = True
+DT = 0.0001
+prepare_sim(engine, DT)
 
 MAX_ITERATIONS = 200000
 RESULT_PERIOD = 1
-i = 0
-res = list()
-last_fault = 0
-total_impulse = 0
 
-while i < MAX_ITERATIONS:
+# Boundary conditions are resampled onto the simulation steps once
+replay = pressure_replay(time, pressure_values, temp_values, (fitted_nitrous_density_t, fitted_nitrous_density_v), DT)
+ox_density = replay.values['ox_tank_liquid_density']
 
-    if engine.burn_time < np.max(time):
-        cur_press = np.interp(engine.burn_time, time, pressure_values)
-        cur_temp = np.interp(engine.burn_time, time, temp_values)
+# Results are streamed to disk, at this step size they don't fit in memory as dicts
+with TraceWriter(TRACE_FILE) as trace:
 
-        engine.ox_tank_pressure_bar = cur_press
-        engine.ox_initial_temp_C = cur_temp
-
-        rho = np.interp(engine.burn_time, fitted_nitrous_density_t, fitted_nitrous_density_v)
-
-        engine.ox_tank_vapour_density = rho
-        engine.ox_tank_liquid_density = rho
-
-    else:
-        break
-
-
-    engine.simulate_engine()
-
-    total_impulse += engine.thrust*engine.delta_time
-
-    if i % RESULT_PERIOD == 0:
-        rr = nitrous_engine_sim.get_running_results(engine)
+    def record(rr, i):
         rr['ox_tank_pressure'] = engine.ox_tank_pressure_bar
         rr['ox_mdot_tank_outflow'] = engine.ox_mdot_tank_outflow
-        rr['isp'] = (engine.thrust/rr['nozzle_mass_flowrate'])/10
-        rr['ox_density'] = rho
-        res.append(rr)
-
-    if engine._fault != last_fault:
-        if engine._fault > 0:
-            print(f'New engine fault at {engine.burn_time:.3f}s: {nitrous_engine_sim.get_error_msg(engine._fault)}')
-        else:
-            print(f'All faults cleared at {engine.burn_time:.3f}s')
-        last_fault = engine._fault
+        rr['isp'] = engine.thrust/rr['nozzle_mass_flowrate']/G0
+        rr['ox_density'] = ox_density[i]
+        trace.append(rr)
 
-    i += 1
+    burn = replay.run(engine, record, MAX_ITERATIONS, RESULT_PERIOD)
 
+i = burn.iterations
+total_impulse = burn.total_impulse
 
 print(f'Iterations: {i}')
-print(f'Result data points {len(res)}')
+print(f'Result data points {trace.rows}')
 print(f'Engine burn time: {engine.burn_time}')
 print(f'Total impulse: {total_impulse}')
 
-df = pd.DataFrame(res)
+df = TraceReader(TRACE_FILE)
 
 total_ox_mass_spent = np.sum(df['ox_mdot_tank_outflow']) * engine.delta_time
 
-initial_radius = df['centre_port_radius'][0]
-final_radius = df['centre_port_radius'][len(df['centre_port_radius'])-1]
+initial_radius = df.channel('centre_port_radius', 0, 1)[0]
+final_radius = df.channel('centre_port_radius', len(df) - 1)[0]
 fuel_volume_spent = (final_radius**2 - initial_radius**2)*math.pi*engine.charge_length
 fuel_mass_spent = fuel_volume_spent*engine.solid_propellant_density
 